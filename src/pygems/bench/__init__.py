@@ -0,0 +1,5 @@
+"""Benchmarks for the pygems primitives.
+
+Benchmarks are registered with :func:`pygems.bench.runner.benchmark` and run
+through the ``pygems bench`` command.
+"""
@@ -0,0 +1,30 @@
+"""Store benchmark results as JSON baselines."""
+import json
+import platform
+from typing import Dict, Iterable
+
+from pygems.bench.runner import BenchmarkResult
+
+FORMAT_VERSION = 1
+
+
+def save(path: str, results: Iterable[BenchmarkResult]):
+    """Save results to a JSON file"""
+    data = {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'benchmarks': [result.asdict() for result in results],
+    }
+    with open(path, 'w') as stream:
+        json.dump(data, stream, indent=2)
+
+
+def load(path: str) -> Dict[str, BenchmarkResult]:
+    """Load results from a JSON file, mapped by benchmark name"""
+    with open(path) as stream:
+        data = json.load(stream)
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported baseline format version: {data.get('version')}")
+    return {item['name']: BenchmarkResult.fromdict(item) for item in data['benchmarks']}
@@ -0,0 +1,75 @@
+"""The ``pygems bench`` command."""
+import argparse
+import sys
+
+from pygems.bench import baseline, runner, suites  # noqa: F401 - suites register the benchmarks
+from pygems.bench.stats import Comparison
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Add ``bench`` command arguments to the parser"""
+    parser.add_argument('patterns', nargs='*', metavar='PATTERN',
+                        help='glob patterns of benchmark names to run, e.g. "timer.*"')
+    parser.add_argument('--kind', choices=[runner.MICRO, runner.MACRO],
+                        help='run only micro or macro benchmarks')
+    parser.add_argument('--rounds', type=int, default=7, help='number of rounds per benchmark (default: 7)')
+    parser.add_argument('--warmup', type=int, default=1, help='number of warmup rounds (default: 1)')
+    parser.add_argument('--min-time', type=float, default=0.01,
+                        help='minimum time of a round in seconds used to calibrate loops (default: 0.01)')
+    parser.add_argument('--cpu', type=int, help='pin the benchmark process to the given CPU')
+    parser.add_argument('--no-gc-isolation', dest='gc_isolation', action='store_false',
+                        help='keep the garbage collector enabled while measuring')
+    parser.add_argument('--isolate', action='store_true', help='run each benchmark in a separate worker process')
+    parser.add_argument('--save', metavar='FILE', help='save results as JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare results with JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as regression (default: 0.1)')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='confidence level of the reported interval of the median (default: 0.95)')
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help='significance level of the comparison (default: 0.05)')
+    parser.add_argument('--list', action='store_true', help='list benchmarks and exit')
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.3f}{unit}'
+    return f'{seconds / 1e-9:.1f}ns'
+
+
+def main(args: argparse.Namespace, out=None) -> int:
+    """Run the ``bench`` command. Returns exit code, non-zero when a benchmark regressed."""
+    out = out or sys.stdout
+    benchmarks = runner.select(args.patterns, args.kind)
+    if args.list:
+        for bench in benchmarks:
+            print(f'{bench.name} ({bench.kind})', file=out)
+        return 0
+    baselines = baseline.load(args.compare) if args.compare else {}
+    results = []
+    regressions = []
+    for bench in benchmarks:
+        result = runner.run(bench, rounds=args.rounds, isolate=args.isolate, warmup=args.warmup,
+                            min_time=args.min_time, gc_isolation=args.gc_isolation, cpu=args.cpu)
+        results.append(result)
+        lower, upper = result.ci(args.confidence)
+        line = (f'{bench.name:<36} {_format_time(result.median):>12} +- {_format_time(result.mad):<10} '
+                f'{args.confidence:.0%} CI [{_format_time(lower)}, {_format_time(upper)}]')
+        if result.outliers:
+            line += f' ({len(result.outliers)} outliers)'
+        reference = baselines.get(bench.name)
+        if reference is not None:
+            comparison = Comparison(bench.name, reference.samples, result.samples, args.threshold, args.alpha)
+            status = 'REGRESSED' if comparison.regressed else 'improved' if comparison.improved else 'ok'
+            line += f'  {comparison.ratio:6.2f}x  p={comparison.p_value:.3f}  {status}'
+            if comparison.regressed:
+                regressions.append(comparison)
+        print(line.rstrip(), file=out)
+    if args.save:
+        baseline.save(args.save, results)
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: '
+              + ', '.join(comparison.name for comparison in regressions), file=out)
+        return 1
+    return 0
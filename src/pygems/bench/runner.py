@@ -0,0 +1,207 @@
+"""Register and run benchmarks."""
+import concurrent.futures
+import contextlib
+import fnmatch
+import gc
+import os
+import statistics
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pygems.bench import stats
+from pygems.core.timer import Timer
+
+MICRO = 'micro'
+MACRO = 'macro'
+
+
+class Benchmark:
+    """Benchmark definition
+
+    Arguments:
+        name (str): Unique benchmark name, e.g. ``'timer.start_stop'``
+        factory (Callable): Function without arguments which prepares the data and
+            returns the callable to be measured.
+        kind (str): ``'micro'`` or ``'macro'``
+        loops (int): Number of times the measured callable is called per round.
+            Default: None - calibrated automatically.
+    """
+    name: str
+    factory: Callable[[], Callable]
+    kind: str
+    loops: Optional[int]
+
+    def __init__(self, name: str, factory: Callable[[], Callable], kind: str = MICRO, loops: Optional[int] = None):
+        self.name = name
+        self.factory = factory
+        self.kind = kind
+        self.loops = loops
+
+    def __repr__(self):
+        return f'<Benchmark {self.name}>'
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+"""Registered benchmarks by name"""
+
+
+def benchmark(name: str, kind: str = MICRO, loops: Optional[int] = None):
+    """Decorator to register a benchmark factory
+
+    Registering a name again replaces the previous benchmark, so suite modules can be reloaded.
+
+    >>> @benchmark('demo.sum', loops=10)
+    ... def bench_sum():
+    ...     data = list(range(100))
+    ...     return lambda: sum(data)
+    >>> BENCHMARKS['demo.sum']
+    <Benchmark demo.sum>
+    >>> del BENCHMARKS['demo.sum']
+    """
+    def register(factory):
+        BENCHMARKS[name] = Benchmark(name, factory, kind, loops)
+        return factory
+    return register
+
+
+def select(patterns: Optional[Iterable[str]] = None, kind: Optional[str] = None) -> List[Benchmark]:
+    """Select registered benchmarks by name glob patterns and kind, sorted by name"""
+    patterns = list(patterns or ['*'])
+    return [bench for name, bench in sorted(BENCHMARKS.items())
+            if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+            and (kind is None or bench.kind == kind)]
+
+
+class BenchmarkResult:
+    """Measurements of a benchmark
+
+    ``samples`` are seconds per call of the measured callable, one per round.
+    """
+    name: str
+    kind: str
+    loops: int
+    samples: List[float]
+
+    def __init__(self, name: str, kind: str, loops: int, samples: List[float]):
+        self.name = name
+        self.kind = kind
+        self.loops = loops
+        self.samples = samples
+
+    @property
+    def median(self) -> float:
+        """Median time per call in seconds"""
+        return statistics.median(self.samples)
+
+    @property
+    def mad(self) -> float:
+        """Median absolute deviation of the time per call in seconds"""
+        return stats.mad(self.samples)
+
+    def ci(self, confidence: float = 0.95) -> Tuple[float, float]:
+        """Confidence interval of the median time per call"""
+        return stats.median_ci(self.samples, confidence)
+
+    @property
+    def outliers(self) -> List[float]:
+        """Samples which deviate too much from the median"""
+        return stats.outliers(self.samples)
+
+    def asdict(self) -> dict:
+        """Get JSON serializable representation of the result"""
+        return {'name': self.name, 'kind': self.kind, 'loops': self.loops, 'samples': self.samples}
+
+    @classmethod
+    def fromdict(cls, data: dict) -> 'BenchmarkResult':
+        """Create result from :meth:`asdict` representation"""
+        return cls(data['name'], data['kind'], data['loops'], list(data['samples']))
+
+
+def calibrate(func: Callable, min_time: float = 0.01, max_loops: int = 10 ** 7) -> int:
+    """Find number of loops for which calling ``func`` takes at least ``min_time`` seconds"""
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_time or loops >= max_loops:
+            return loops
+        if elapsed > 0:
+            loops = max(loops * 2, int(loops * min_time * 1.2 / elapsed))
+        else:
+            loops *= 10
+        loops = min(loops, max_loops)
+
+
+def _time_loops(func: Callable, loops: int) -> float:
+    loop_range = range(loops)
+    with Timer() as timer:
+        for _ in loop_range:
+            func()
+    return timer.elapsed
+
+
+@contextlib.contextmanager
+def _pinned_to_cpu(cpu: Optional[int]):
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        yield
+        return
+    affinity = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, {cpu})
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, affinity)
+
+
+@contextlib.contextmanager
+def _gc_isolated(enabled: bool):
+    if not enabled:
+        yield
+        return
+    was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def measure(func: Callable, rounds: int = 7, loops: Optional[int] = None, warmup: int = 1,
+            min_time: float = 0.01, gc_isolation: bool = True, cpu: Optional[int] = None) -> Tuple[int, List[float]]:
+    """Measure time per call of ``func``. Returns the number of loops and the samples.
+
+    Arguments:
+        func (Callable): Callable without arguments to measure.
+        rounds (int): Number of measured rounds. Each round produces one sample.
+        loops (int): Calls per round. Default: None - calibrated to take at least ``min_time``
+        warmup (int): Number of rounds run before measuring, which are discarded.
+        min_time (float): Minimum time of a round in seconds used by calibration.
+        gc_isolation (bool): Collect garbage between rounds and disable the garbage
+            collector while measuring.
+        cpu (int): Pin the process to the given CPU while measuring, where supported.
+    """
+    with _pinned_to_cpu(cpu):
+        if loops is None:
+            loops = calibrate(func, min_time)
+        for _ in range(warmup):
+            _time_loops(func, loops)
+        samples = []
+        for _ in range(rounds):
+            with _gc_isolated(gc_isolation):
+                samples.append(_time_loops(func, loops) / loops)
+    return loops, samples
+
+
+def run(bench: Benchmark, rounds: int = 7, loops: Optional[int] = None, isolate: bool = False,
+        **options) -> BenchmarkResult:
+    """Run a benchmark and return the time per call for each round
+
+    With ``isolate`` the benchmark runs in a separate worker process, so state left
+    by other benchmarks, e.g. caches, allocated memory or garbage, doesn't affect the
+    measurements. Other options are passed to :func:`measure`.
+    """
+    if isolate:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(run, bench, rounds, loops, **options).result()
+    loops, samples = measure(bench.factory(), rounds, loops or bench.loops, **options)
+    return BenchmarkResult(bench.name, bench.kind, loops, samples)
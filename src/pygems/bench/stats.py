@@ -0,0 +1,127 @@
+"""Statistics for comparing benchmark runs."""
+import math
+import statistics
+from statistics import NormalDist
+from typing import List, Sequence, Tuple
+
+
+def mad(samples: Sequence[float]) -> float:
+    """Median absolute deviation
+
+    >>> mad([1, 2, 3, 4, 100])
+    1
+    """
+    center = statistics.median(samples)
+    return statistics.median(abs(sample - center) for sample in samples)
+
+
+def median_ci(samples: Sequence[float], confidence: float = 0.95) -> Tuple[float, float]:
+    """Distribution-free confidence interval of the median, based on order statistics
+
+    >>> median_ci(range(1, 101))
+    (40, 61)
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * math.sqrt(count) / 2
+    lower = max(0, int(math.floor(count / 2 - half_width)) - 1)
+    upper = min(count - 1, int(math.ceil(count / 2 + half_width)))
+    return ordered[lower], ordered[upper]
+
+
+def outliers(samples: Sequence[float], threshold: float = 3.5) -> List[float]:
+    """Samples with modified z-score, based on median and MAD, above the threshold
+
+    >>> outliers([10, 11, 10, 12, 11, 10, 50])
+    [50]
+    """
+    center = statistics.median(samples)
+    deviation = mad(samples)
+    if deviation == 0:
+        return [sample for sample in samples if sample != center]
+    return [sample for sample in samples if 0.6745 * abs(sample - center) / deviation > threshold]
+
+
+def mann_whitney_u(first: Sequence[float], second: Sequence[float]) -> float:
+    """Two-sided p-value of the Mann-Whitney U test, using normal approximation with tie correction
+
+    Small p-value means that the samples are unlikely to come from the same distribution:
+
+    >>> mann_whitney_u([1, 2, 3, 4, 5, 6], [11, 12, 13, 14, 15, 16]) < 0.01
+    True
+    >>> mann_whitney_u([1, 2, 3], [1, 2, 3])
+    1.0
+    """
+    n1, n2 = len(first), len(second)
+    ranked = sorted([(value, 0) for value in first] + [(value, 1) for value in second])
+    ranks = [0.0] * len(ranked)
+    tie_term = 0
+    start = 0
+    while start < len(ranked):
+        end = start
+        while end + 1 < len(ranked) and ranked[end + 1][0] == ranked[start][0]:
+            end += 1
+        for index in range(start, end + 1):
+            ranks[index] = (start + end) / 2 + 1
+        ties = end - start + 1
+        tie_term += ties ** 3 - ties
+        start = end + 1
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    total = n1 + n2
+    variance = n1 * n2 / 12 * ((total + 1) - tie_term / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    if z <= 0:
+        return 1.0
+    return math.erfc(z / math.sqrt(2))
+
+
+class Comparison:
+    """Comparison of a benchmark result against its baseline
+
+    Arguments:
+        name (str): Benchmark name
+        baseline (Sequence[float]): Baseline samples
+        current (Sequence[float]): Current samples
+        threshold (float): Relative slowdown tolerated before reporting regression, e.g. 0.1 for 10%
+        alpha (float): Significance level for the difference between the samples
+
+    >>> comparison = Comparison('demo', [1.0, 1.1, 0.9, 1.0, 1.0], [2.0, 2.1, 1.9, 2.0, 2.0])
+    >>> round(comparison.ratio, 2), comparison.regressed
+    (2.0, True)
+    """
+    name: str
+    baseline_median: float
+    current_median: float
+    ratio: float
+    p_value: float
+    threshold: float
+    alpha: float
+
+    def __init__(self, name: str, baseline: Sequence[float], current: Sequence[float],
+                 threshold: float = 0.1, alpha: float = 0.05):
+        self.name = name
+        self.baseline_median = statistics.median(baseline)
+        self.current_median = statistics.median(current)
+        self.ratio = self.current_median / self.baseline_median if self.baseline_median else math.inf
+        self.p_value = mann_whitney_u(baseline, current)
+        self.threshold = threshold
+        self.alpha = alpha
+
+    @property
+    def significant(self) -> bool:
+        """True if the difference between the runs is statistically significant"""
+        return self.p_value < self.alpha
+
+    @property
+    def regressed(self) -> bool:
+        """True if current run is significantly slower than the baseline by more than the threshold"""
+        return self.significant and self.ratio > 1 + self.threshold
+
+    @property
+    def improved(self) -> bool:
+        """True if current run is significantly faster than the baseline by more than the threshold"""
+        return self.significant and self.ratio < 1 - self.threshold
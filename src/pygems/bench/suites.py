@@ -0,0 +1,214 @@
+"""Micro and macro benchmarks for the hot paths of :mod:`pygems.core`.
+
+Micro benchmarks measure a single call. Macro benchmarks measure a workload
+processing many items and report time per workload.
+"""
+from pygems.bench.runner import MACRO, benchmark
+from pygems.core.functools import MultiMethod
+from pygems.core.namespace import Namespace, NamespaceTable, ShapedNamespace
+from pygems.core.plugin import BaseEventListener, PluginCollection
+from pygems.core.shortcuts import getattr_nested
+from pygems.core.timer import HotPathProfiler, Timer
+
+
+class _Obj:
+    pass
+
+
+class _Listener(BaseEventListener):
+    def on_load(self, *args, **kwargs):
+        pass
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _make_multimethod():
+    mm = MultiMethod('dispatch')
+    mm.register((int,), lambda value: value)
+    mm.register((str,), lambda value: value)
+    mm.register((int, int), lambda left, right: left)
+    return mm
+
+
+def _make_records(count, miss_ratio):
+    records = []
+    misses = int(count * miss_ratio)
+    for index in range(count):
+        record = _Obj()
+        if index >= misses:
+            record.address = _Obj()
+            record.address.city = 'Sofia'
+        records.append(record)
+    return records
+
+
+# Timer
+
+@benchmark('timer.start_stop')
+def bench_timer_start_stop():
+    timer = Timer()
+    def run():
+        timer.start()
+        timer.stop()
+    return run
+
+
+@benchmark('timer.decorator')
+def bench_timer_decorator():
+    return Timer()(_noop)
+
+
+@benchmark('timer.decorator_profiled')
+def bench_timer_decorator_profiled():
+    return Timer(profile=HotPathProfiler())(_noop)
+
+
+@benchmark('timer.decorated_workload', kind=MACRO)
+def bench_timer_decorated_workload():
+    func = Timer()(_noop)
+    def run():
+        for _ in range(10000):
+            func()
+    return run
+
+
+# PluginCollection
+
+@benchmark('plugin.notify')
+def bench_plugin_notify():
+    plugins = PluginCollection().append(*[_Listener() for _ in range(10)])
+    return lambda: plugins.notify('load', 'file.txt')
+
+
+@benchmark('plugin.notify_pipeline', kind=MACRO)
+def bench_plugin_notify_pipeline():
+    plugins = PluginCollection().append(*[_Listener() for _ in range(10)])
+    events = ['load', 'parse', 'save'] * 1000
+    def run():
+        for event in events:
+            plugins.notify(event, 'file.txt')
+    return run
+
+
+# MultiMethod
+
+@benchmark('multimethod.call')
+def bench_multimethod_call():
+    mm = _make_multimethod()
+    return lambda: mm(1)
+
+
+@benchmark('multimethod.predicates')
+def bench_multimethod_predicates():
+    mm = MultiMethod('ranges')
+    for hundreds in range(3):
+        in_hundreds = lambda value, hundreds=hundreds: value // 100 == hundreds
+        for tens in range(10):
+            mm.register((in_hundreds,), lambda value: value,
+                        when=lambda value, tens=tens: value // 10 % 10 == tens)
+    mm.register((int,), lambda value: value)
+    return lambda: mm(295)
+
+
+@benchmark('multimethod.mixed_workload', kind=MACRO)
+def bench_multimethod_mixed_workload():
+    mm = _make_multimethod()
+    values = [1, 'one'] * 5000
+    def run():
+        for value in values:
+            mm(value)
+    return run
+
+
+@benchmark('multimethod.map_workload', kind=MACRO)
+def bench_multimethod_map_workload():
+    mm = _make_multimethod()
+    values = [1, 'one'] * 5000
+    return lambda: mm.map(values)
+
+
+# Namespace
+
+@benchmark('namespace.create')
+def bench_namespace_create():
+    data = {'name': 'John', 'age': 32, 'city': 'Sofia'}
+    return lambda: Namespace(data)
+
+
+@benchmark('namespace.shaped_create')
+def bench_namespace_shaped_create():
+    data = {'name': 'John', 'age': 32, 'city': 'Sofia'}
+    return lambda: ShapedNamespace(data)
+
+
+@benchmark('namespace.asdict')
+def bench_namespace_asdict():
+    ns = Namespace(name='John', age=32, city='Sofia')
+    return ns.asdict
+
+
+@benchmark('namespace.records', kind=MACRO)
+def bench_namespace_records():
+    rows = [{'id': index, 'name': f'user{index}', 'age': index % 90} for index in range(10000)]
+    def run():
+        for row in rows:
+            Namespace(row).asdict()
+    return run
+
+
+def _make_sales(count):
+    cities = ['Sofia', 'Varna', 'Burgas', 'Plovdiv']
+    return [Namespace(city=cities[index % 4], year=2000 + index % 20, sales=float(index % 100))
+            for index in range(count)]
+
+
+@benchmark('namespace.records_groupby_sum', kind=MACRO)
+def bench_namespace_records_groupby_sum():
+    records = _make_sales(100000)
+    def run():
+        totals = {}
+        for record in records:
+            if record.year >= 2010:
+                totals[record.city] = totals.get(record.city, 0.0) + record.sales
+        return totals
+    return run
+
+
+@benchmark('namespace.table_groupby_sum', kind=MACRO)
+def bench_namespace_table_groupby_sum():
+    table = NamespaceTable(_make_sales(100000))
+    return lambda: table.where('year', '>=', 2010).groupby_sum('city', 'sales')
+
+
+# getattr_nested
+
+@benchmark('getattr_nested.hit')
+def bench_getattr_nested_hit():
+    record = _make_records(1, 0)[0]
+    return lambda: getattr_nested(record, 'address.city')
+
+
+@benchmark('getattr_nested.miss_default')
+def bench_getattr_nested_miss_default():
+    record = _make_records(1, 1)[0]
+    return lambda: getattr_nested(record, 'address.city', None)
+
+
+@benchmark('getattr_nested.hit_heavy', kind=MACRO)
+def bench_getattr_nested_hit_heavy():
+    records = _make_records(10000, 0.05)
+    def run():
+        for record in records:
+            getattr_nested(record, 'address.city', None)
+    return run
+
+
+@benchmark('getattr_nested.miss_heavy', kind=MACRO)
+def bench_getattr_nested_miss_heavy():
+    records = _make_records(10000, 0.95)
+    def run():
+        for record in records:
+            getattr_nested(record, 'address.city', None)
+    return run
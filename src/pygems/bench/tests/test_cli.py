@@ -0,0 +1,49 @@
+import io
+import json
+import pytest
+from pygems.bench import baseline, runner
+from pygems.cli import build_parser, main
+
+
+def run_bench(*argv):
+    args = build_parser().parse_args(['bench', *argv])
+    out = io.StringIO()
+    return args.handler(args, out), out.getvalue()
+
+
+class TestBenchCommand:
+    def test_lists_benchmarks(self):
+        code, output = run_bench('--list', 'timer.*')
+        assert code == 0
+        assert 'timer.start_stop (micro)' in output
+
+    def test_saves_baseline(self, tmp_path):
+        path = str(tmp_path / 'baseline.json')
+        code, output = run_bench('--rounds', '2', '--save', path, 'getattr_nested.hit')
+        assert code == 0
+        assert list(baseline.load(path)) == ['getattr_nested.hit']
+
+    def test_reports_median_and_confidence_interval(self, monkeypatch):
+        samples = [2e-6, 1e-6, 3e-6, 4e-6, 5e-6, 6e-6, 100e-6]
+        monkeypatch.setattr(runner, 'run', lambda bench, **options: runner.BenchmarkResult(bench.name, bench.kind, 1,
+                                                                                           samples))
+        code, output = run_bench('getattr_nested.hit')
+        assert code == 0
+        assert output.split() == ['getattr_nested.hit', '4.000us', '+-', '2.000us', '95%', 'CI',
+                                  '[1.000us,', '100.000us]', '(1', 'outliers)']
+
+    def test_fails_when_benchmark_regressed(self, tmp_path):
+        path = str(tmp_path / 'baseline.json')
+        baseline.save(path, [runner.BenchmarkResult('getattr_nested.hit', 'micro', 1, [1e-12] * 5)])
+        code, output = run_bench('--rounds', '5', '--compare', path, 'getattr_nested.hit')
+        assert code == 1
+        assert 'REGRESSED' in output
+
+    def test_load_rejects_unknown_version(self, tmp_path):
+        path = tmp_path / 'baseline.json'
+        path.write_text(json.dumps({'version': 0, 'benchmarks': []}))
+        with pytest.raises(ValueError):
+            baseline.load(str(path))
+
+    def test_main_returns_command_code(self, tmp_path):
+        assert main(['bench', '--list', 'nothing']) == 0
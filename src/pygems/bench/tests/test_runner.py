@@ -0,0 +1,96 @@
+import gc
+import os
+import pytest
+from pygems.bench import runner, suites
+
+
+@pytest.fixture
+def registered():
+    names = []
+
+    def register(name, **kwargs):
+        runner.benchmark(name, **kwargs)(lambda: (lambda: None))
+        names.append(name)
+        return runner.BENCHMARKS[name]
+
+    yield register
+    for name in names:
+        runner.BENCHMARKS.pop(name, None)
+
+
+class TestBenchmark:
+    def test_registers_benchmark(self, registered):
+        bench = registered('test.registered', kind=runner.MACRO, loops=3)
+        assert (bench.name, bench.kind, bench.loops) == ('test.registered', 'macro', 3)
+
+    def test_registering_again_replaces_benchmark(self, registered):
+        registered('test.duplicate')
+        bench = registered('test.duplicate', loops=7)
+        assert runner.BENCHMARKS['test.duplicate'] is bench
+
+
+class TestSelect:
+    def test_selects_by_pattern_and_kind(self, registered):
+        registered('test.select.a')
+        registered('test.select.b', kind=runner.MACRO)
+        registered('test.other')
+        assert [bench.name for bench in runner.select(['test.select.*'])] == ['test.select.a', 'test.select.b']
+        assert [bench.name for bench in runner.select(['test.*'], runner.MACRO)] == ['test.select.b']
+
+
+class TestRun:
+    def test_returns_sample_per_round(self, registered):
+        bench = registered('test.run', loops=10)
+        result = runner.run(bench, rounds=4)
+        assert (result.name, result.loops, len(result.samples)) == ('test.run', 10, 4)
+        assert result.median >= 0
+
+    def test_result_round_trips_dict(self):
+        result = runner.BenchmarkResult('name', 'micro', 5, [1.0, 2.0])
+        restored = runner.BenchmarkResult.fromdict(result.asdict())
+        assert restored.asdict() == result.asdict()
+
+    def test_calibrates_loops(self, registered):
+        bench = registered('test.calibrate')
+        result = runner.run(bench, rounds=2, min_time=0.001)
+        assert result.loops > 1
+
+    def test_runs_in_worker_process(self):
+        bench = runner.BENCHMARKS['getattr_nested.hit']
+        result = runner.run(bench, rounds=2, loops=10, isolate=True)
+        assert (result.name, result.loops, len(result.samples)) == ('getattr_nested.hit', 10, 2)
+
+
+class TestMeasure:
+    def test_returns_loops_and_samples(self):
+        loops, samples = runner.measure(lambda: None, rounds=3, loops=5, warmup=0)
+        assert (loops, len(samples)) == (5, 3)
+
+    def test_disables_gc_while_measuring(self):
+        states = []
+        runner.measure(lambda: states.append(gc.isenabled()), rounds=2, loops=1, warmup=0)
+        assert states == [False, False]
+        assert gc.isenabled()
+
+    def test_keeps_gc_enabled_without_isolation(self):
+        states = []
+        runner.measure(lambda: states.append(gc.isenabled()), rounds=1, loops=1, warmup=0, gc_isolation=False)
+        assert states == [True]
+
+    def test_warmup_calls_are_not_measured(self):
+        calls = []
+        loops, samples = runner.measure(lambda: calls.append(1), rounds=2, loops=3, warmup=2)
+        assert (len(calls), len(samples)) == (12, 2)
+
+    def test_pins_to_cpu(self):
+        cpu = min(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else 0
+        runner.measure(lambda: None, rounds=1, loops=1, cpu=cpu)
+
+
+class TestCalibrate:
+    def test_returns_loops_taking_min_time(self):
+        loops = runner.calibrate(lambda: sum(range(100)), min_time=0.002)
+        assert runner._time_loops(lambda: sum(range(100)), loops) >= 0.001
+
+    def test_respects_max_loops(self):
+        assert runner.calibrate(lambda: None, min_time=10, max_loops=1000) == 1000
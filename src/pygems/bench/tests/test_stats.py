@@ -0,0 +1,46 @@
+from pygems.bench import stats
+
+
+class TestMannWhitneyU:
+    def test_identical_samples_are_not_significant(self):
+        assert stats.mann_whitney_u([1, 1, 1], [1, 1, 1]) == 1.0
+
+    def test_separated_samples_are_significant(self):
+        assert stats.mann_whitney_u(range(10), range(100, 110)) < 0.001
+
+    def test_is_symmetric(self):
+        first, second = [1, 3, 5, 7], [2, 4, 9, 10, 11]
+        assert stats.mann_whitney_u(first, second) == stats.mann_whitney_u(second, first)
+
+
+class TestComparison:
+    def test_slower_within_threshold_is_not_regression(self):
+        comparison = stats.Comparison('name', [1.0] * 5 + [1.01] * 5, [1.05] * 10, threshold=0.1)
+        assert comparison.significant
+        assert not comparison.regressed
+
+    def test_noisy_slower_is_not_regression(self):
+        comparison = stats.Comparison('name', [1, 5, 1, 5], [2, 4, 2, 4], threshold=0.1)
+        assert not comparison.regressed
+
+    def test_faster_is_improvement(self):
+        comparison = stats.Comparison('name', [2.0] * 5, [1.0] * 5)
+        assert comparison.improved
+        assert not comparison.regressed
+
+
+class TestMedianCi:
+    def test_interval_contains_median(self):
+        lower, upper = stats.median_ci([5, 1, 4, 2, 3, 7, 6])
+        assert lower <= 4 <= upper
+
+    def test_single_sample(self):
+        assert stats.median_ci([5]) == (5, 5)
+
+
+class TestOutliers:
+    def test_no_outliers_in_constant_samples(self):
+        assert stats.outliers([1, 1, 1]) == []
+
+    def test_detects_outliers_with_zero_mad(self):
+        assert stats.outliers([1, 1, 1, 1, 9]) == [9]
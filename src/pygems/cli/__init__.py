@@ -1,3 +1,23 @@
+import argparse
 
-def main():  # pragma: no cover
-    print("Hello my gems...")
\ No newline at end of file
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='pygems')
+    subparsers = parser.add_subparsers(dest='command')
+    bench_parser = subparsers.add_parser('bench', help='run benchmarks and compare them with a baseline')
+    from pygems.bench import cli as bench_cli
+    bench_cli.add_arguments(bench_parser)
+    bench_parser.set_defaults(handler=bench_cli.main)
+    return parser
+
+
+def main(argv=None) -> int:
+    """Run the ``pygems`` command and return its exit code
+
+    The console script entry point passes the code to :func:`sys.exit`.
+    """
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        print("Hello my gems...")
+        return 0
+    return args.handler(args)
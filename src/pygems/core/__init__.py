@@ -1 +1,18 @@
 __version__ = '0.3.0.dev1'
+
+from pygems.core.lazy import lazy_getattr
+
+__getattr__, __dir__ = lazy_getattr(__name__, [
+    'contextlib',
+    'diskcache',
+    'eventlog',
+    'eventqueue',
+    'functools',
+    'jsonl',
+    'namespace',
+    'parallel',
+    'plugin',
+    'sharedmem',
+    'shortcuts',
+    'timer',
+])
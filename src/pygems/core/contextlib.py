@@ -1,6 +1,19 @@
 """A library of context-related tools."""
+import asyncio
+import collections
+import concurrent.futures
 import contextlib
-from typing import Any
+import inspect
+import threading
+import time
+from typing import Any, Callable, Optional
+
+def _get_on_exit(thing: Any, on_exit: str) -> Callable:
+    method = getattr(thing, on_exit, None)
+    if method is None or not callable(method):
+        raise AttributeError(f"Object has no '{on_exit} method.")
+    return method
+
 
 class on_exit(contextlib.AbstractContextManager):
     """Context to automatically call closing method at the end of a block.
@@ -17,12 +30,452 @@ class on_exit(contextlib.AbstractContextManager):
 
     def __init__(self, thing: Any, on_exit: str = "close"):
         self.thing = thing
-        self.on_exit = getattr(thing, on_exit, None)
-        if self.on_exit is None or not callable(self.on_exit):
-            raise AttributeError(f"Object has no '{on_exit} method.")
+        self.on_exit = _get_on_exit(thing, on_exit)
 
     def __enter__(self):
         return self.thing
 
     def __exit__(self, *exc_info):
         self.on_exit()
+
+
+class async_on_exit(contextlib.AbstractAsyncContextManager):
+    """Asynchronous context to call closing method at the end of an ``async with`` block.
+
+    The result of the method is awaited if it is awaitable, so both coroutine methods
+    like ``aclose`` and plain ``close`` methods are supported.
+
+    Arguments:
+        thing (Any): Object to close.
+        on_exit (str): Method name to call at the end of the block. Default: 'aclose'
+
+    Example::
+
+        async with async_on_exit(aiohttp.ClientSession(), "close") as session:
+            await session.get("http://igeorgiev.eu")
+    """
+
+    def __init__(self, thing: Any, on_exit: str = "aclose"):
+        self.thing = thing
+        self.on_exit = _get_on_exit(thing, on_exit)
+
+    async def __aenter__(self):
+        return self.thing
+
+    async def __aexit__(self, *exc_info):
+        result = self.on_exit()
+        if inspect.isawaitable(result):
+            await result
+
+
+class CleanupError(Exception):
+    """Raised when one or more cleanup callbacks of :class:`on_exit_group` fail.
+
+    The exceptions raised by the callbacks are available as :attr:`errors`. When the
+    cleanups ran because the ``with`` block raised, that exception is available as
+    :attr:`body_error` and is also set as ``__context__``, so tracebacks show both.
+    """
+    errors: list
+    body_error: Optional[BaseException]
+
+    def __init__(self, errors: list, body_error: Optional[BaseException] = None):
+        super().__init__(f"{len(errors)} cleanup(s) failed: " + "; ".join(repr(error) for error in errors))
+        self.errors = errors
+        self.body_error = body_error
+
+
+class on_exit_group(contextlib.AbstractContextManager, contextlib.AbstractAsyncContextManager):
+    """Group of cleanups which run concurrently at the end of a block.
+
+    Similar to :class:`contextlib.ExitStack`, but instead of running the cleanups one
+    after another, ``with`` runs them in a thread pool and ``async with`` runs them
+    with :func:`asyncio.gather`. Closing many resources takes about as long as the
+    slowest close instead of the sum of all of them. Cleanups run in no particular order.
+
+    All cleanups are run even if some fail. Failures are aggregated into
+    :class:`CleanupError`, which keeps the exception raised by the block, if any.
+
+    Arguments:
+        max_workers (int): Maximum number of threads used to run blocking cleanups.
+            Default: None - determined by :class:`concurrent.futures.ThreadPoolExecutor`
+
+    Example::
+
+        with on_exit_group() as group:
+            drivers = [group.push(webdriver.Chrome(), "quit") for _ in range(100)]
+            ...
+
+    In ``async with`` blocks coroutine cleanups are awaited and blocking ones run in the
+    thread pool::
+
+        async with on_exit_group() as group:
+            session = group.push(aiohttp.ClientSession(), "close")
+            output = group.push(open("result.txt", "w"))
+    """
+    max_workers: Optional[int]
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._callbacks = []
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except CleanupError as error:
+            raise self._with_body_error(error, exc_value)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        try:
+            await self.aclose()
+        except CleanupError as error:
+            raise self._with_body_error(error, exc_value)
+
+    @staticmethod
+    def _with_body_error(error: CleanupError, body_error: Optional[BaseException]) -> CleanupError:
+        if body_error is not None:
+            error.body_error = body_error
+            error.__context__ = body_error
+        return error
+
+    def push(self, thing: Any, on_exit: str = "close"):
+        """Register ``thing`` to be closed by calling its ``on_exit`` method. Returns ``thing``."""
+        self._callbacks.append((_get_on_exit(thing, on_exit), (), {}))
+        return thing
+
+    def callback(self, func: Callable, *args, **kwargs) -> Callable:
+        """Register ``func`` to be called with the given arguments. Returns ``func``."""
+        if not callable(func):
+            raise TypeError("Expecting func argument to be callable")
+        self._callbacks.append((func, args, kwargs))
+        return func
+
+    def _pop_callbacks(self) -> list:
+        callbacks, self._callbacks = self._callbacks, []
+        return callbacks
+
+    @staticmethod
+    def _run_blocking(func: Callable, args: tuple, kwargs: dict):
+        result = func(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = asyncio.run(_await(result))
+        return result
+
+    def close(self):
+        """Run all registered cleanups concurrently in a thread pool."""
+        callbacks = self._pop_callbacks()
+        if not callbacks:
+            return
+        errors = []
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = [executor.submit(self._run_blocking, *callback) for callback in callbacks]
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    errors.append(error)
+        if errors:
+            raise CleanupError(errors)
+
+    async def aclose(self):
+        """Run all registered cleanups concurrently with :func:`asyncio.gather`."""
+        callbacks = self._pop_callbacks()
+        if not callbacks:
+            return
+        loop = asyncio.get_running_loop()
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            awaitables = []
+            for func, args, kwargs in callbacks:
+                if inspect.iscoroutinefunction(func):
+                    awaitables.append(func(*args, **kwargs))
+                else:
+                    awaitables.append(loop.run_in_executor(executor, self._run_blocking, func, args, kwargs))
+            results = await asyncio.gather(*awaitables, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise CleanupError(errors)
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+_DISCARDED = object()
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ResourcePool(contextlib.AbstractContextManager):
+    """Pool of objects reused across ``with`` blocks and closed by calling a named method.
+
+    Pooled counterpart of :class:`on_exit`. Objects are created by ``factory`` and
+    returned to the pool at the end of each :meth:`checkout` block. The ``on_exit``
+    method is called only when an object is discarded: when it fails the health check,
+    stays idle for too long, or when the pool is closed.
+
+    Arguments:
+        factory (Callable): Function to create new objects.
+        on_exit (str): Method name to call when an object is discarded. Default: 'close'
+        min_size (int): Number of objects created upfront and never evicted as idle. Default: 0
+        max_size (int): Maximum number of objects, idle and checked out. Default: 10
+        idle_timeout (float): Seconds after which idle objects above ``min_size`` are
+            closed. Default: None - idle objects are kept.
+        health_check (Callable): Called with the object on checkout. Objects for which
+            it returns false value are closed and replaced. Default: None
+        time_func (Callable): Function to get the current time. Default: ``time.monotonic``
+
+    The pool is thread-safe. Coroutines use :meth:`acheckout` which waits for an
+    object on the event loop. Creating objects, health checks and closing run in
+    the default executor.
+
+    Example::
+
+        drivers = ResourcePool(webdriver.Chrome, "quit", max_size=4)
+        with drivers:
+            with drivers.checkout() as driver:
+                driver.get("http://igeorgiev.eu")
+            with drivers.checkout() as driver:  # same driver is reused
+                driver.get("https://python.org")
+    """
+    factory: Callable
+    on_exit: str
+    min_size: int
+    max_size: int
+    idle_timeout: Optional[float]
+    health_check: Optional[Callable]
+
+    def __init__(self, factory: Callable, on_exit: str = "close", min_size: int = 0, max_size: int = 10,
+                 idle_timeout: Optional[float] = None, health_check: Optional[Callable] = None,
+                 time_func: Callable[[], float] = None):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Expecting 0 <= min_size <= max_size and max_size >= 1")
+        self.factory = factory
+        self.on_exit = on_exit
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self._time_func = time_func or time.monotonic
+        self._condition = threading.Condition()
+        self._idle = collections.deque()
+        self._waiters = collections.deque()
+        self._size = 0
+        self._closed = False
+        for _ in range(min_size):
+            self._idle.append((self._create(), self._time_func()))
+            self._size += 1
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def size(self) -> int:
+        """Number of objects owned by the pool, idle and checked out."""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """Number of idle objects in the pool."""
+        return len(self._idle)
+
+    def _create(self):
+        thing = self.factory()
+        _get_on_exit(thing, self.on_exit)
+        return thing
+
+    def _close_all(self, things):
+        for thing in things:
+            _get_on_exit(thing, self.on_exit)()
+
+    def _pop_expired(self) -> list:
+        if self.idle_timeout is None:
+            return []
+        expired = []
+        expires_before = self._time_func() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0][1] < expires_before:
+            expired.append(self._idle.popleft()[0])
+            self._size -= 1
+        return expired
+
+    def _take(self):
+        """Take an idle object or reserve a slot for a new one. Called with the lock held.
+
+        Returns ``(taken, thing, expired)``. ``thing`` is None for a reserved slot.
+        """
+        if self._closed:
+            raise RuntimeError("Pool is closed")
+        expired = self._pop_expired()
+        if self._idle:
+            return True, self._idle.pop()[0], expired
+        if self._size < self.max_size:
+            self._size += 1
+            return True, None, expired
+        return False, None, expired
+
+    def _prepare(self, thing: Any, expired: list):
+        """Close expired objects, then create the object of a reserved slot or check the health of a taken one.
+
+        Returns ``_DISCARDED`` when the object failed the health check. When a step
+        raises, the object is discarded or the reserved slot is freed.
+        """
+        try:
+            self._close_all(expired)
+        except BaseException:
+            if thing is None:
+                self._forget()
+            else:
+                self.release(thing)
+            raise
+        if thing is None:
+            try:
+                return self._create()
+            except BaseException:
+                self._forget()
+                raise
+        try:
+            healthy = self.health_check is None or self.health_check(thing)
+        except BaseException:
+            self.discard(thing)
+            raise
+        if healthy:
+            return thing
+        self.discard(thing)
+        return _DISCARDED
+
+    def _notify(self, all_waiters: bool = False):
+        """Wake threads and coroutines waiting for an object. Called with the lock held."""
+        if all_waiters:
+            self._condition.notify_all()
+        else:
+            self._condition.notify()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            try:
+                waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:  # the loop is closed
+                continue
+            if not all_waiters:
+                break
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Take an object from the pool, creating one if needed.
+
+        Blocks until an object is available. Raises :class:`TimeoutError` if no
+        object becomes available within ``timeout`` seconds.
+        Acquired objects must be returned with :meth:`release`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                while True:
+                    taken, thing, expired = self._take()
+                    if taken:
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for pooled object")
+                    self._condition.wait(remaining)
+            thing = self._prepare(thing, expired)
+            if thing is not _DISCARDED:
+                return thing
+
+    def release(self, thing: Any):
+        """Return an object to the pool."""
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                expired = [thing]
+            else:
+                self._idle.append((thing, self._time_func()))
+                expired = self._pop_expired()
+            self._notify()
+        self._close_all(expired)
+
+    def discard(self, thing: Any):
+        """Close an acquired object instead of returning it to the pool."""
+        self._forget()
+        _get_on_exit(thing, self.on_exit)()
+
+    def _forget(self):
+        with self._condition:
+            self._size -= 1
+            self._notify()
+
+    def evict_idle(self):
+        """Close objects which are idle for more than ``idle_timeout`` seconds."""
+        with self._condition:
+            expired = self._pop_expired()
+        self._close_all(expired)
+
+    @contextlib.contextmanager
+    def checkout(self, timeout: Optional[float] = None):
+        """Context to acquire an object and return it to the pool at the end of the block."""
+        thing = self.acquire(timeout)
+        try:
+            yield thing
+        finally:
+            self.release(thing)
+
+    async def aacquire(self, timeout: Optional[float] = None):
+        """Coroutine version of :meth:`acquire` which doesn't block the event loop.
+
+        Waiting doesn't hold an executor thread. Cancelling the coroutine never loses
+        an object: objects acquired for a cancelled coroutine are returned to the pool.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self._condition:
+                taken, thing, expired = self._take()
+                if not taken:
+                    waiter = loop.create_future()
+                    self._waiters.append(waiter)
+            if not taken:
+                remaining = None if deadline is None else deadline - loop.time()
+                try:
+                    await asyncio.wait_for(waiter, remaining)
+                except BaseException as error:
+                    with self._condition:
+                        if waiter in self._waiters:
+                            self._waiters.remove(waiter)
+                        else:  # woken up, pass the wake up on
+                            self._notify()
+                    if isinstance(error, asyncio.TimeoutError):
+                        raise TimeoutError("Timed out waiting for pooled object") from None
+                    raise
+                continue
+            if thing is not None and not expired and self.health_check is None:
+                return thing
+            future = loop.run_in_executor(None, self._prepare, thing, expired)
+            try:
+                thing = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                future.add_done_callback(self._release_prepared)
+                raise
+            if thing is not _DISCARDED:
+                return thing
+
+    def _release_prepared(self, future: asyncio.Future):
+        """Return an object prepared for a cancelled :meth:`aacquire` to the pool."""
+        if not future.cancelled() and future.exception() is None and future.result() is not _DISCARDED:
+            self.release(future.result())
+
+    @contextlib.asynccontextmanager
+    async def acheckout(self, timeout: Optional[float] = None):
+        """Asynchronous version of :meth:`checkout`, used with ``async with``."""
+        thing = await self.aacquire(timeout)
+        try:
+            yield thing
+        finally:
+            self.release(thing)
+
+    def close(self):
+        """Close idle objects. Checked out objects are closed when released."""
+        with self._condition:
+            self._closed = True
+            idle = [thing for thing, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._notify(all_waiters=True)
+        self._close_all(idle)
@@ -0,0 +1,435 @@
+"""Persistent memoization cache shared between processes.
+
+Values are pickled into an append-only segment file. An open-addressing hash
+index with fixed-size slots is memory-mapped, so lookups read the index and
+unpickle the value directly from the mapped segment without copying it.
+
+Directory layout::
+
+    lock        file locked with ``fcntl.flock`` to coordinate processes
+    index       header followed by hash slots
+    data.<N>    append-only segment, replaced by compaction
+
+Readers take a shared lock and writers an exclusive lock. Access times used to
+evict the least recently used values are collected by the readers and written
+with the next exclusive lock. Files and maps are reopened in forked processes,
+so their locks exclude each other. On platforms without ``fcntl`` only threads
+within one process are coordinated.
+"""
+import contextlib
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from pygems.core.shortcuts import MISSING  # returned by DiskCache.get when key is not in the cache
+
+_MAGIC = b'PGDCIDX1'
+_HEADER = struct.Struct('<8sIIQQQQ')   # magic, version, reserved, capacity, count, used, generation
+_SLOT = struct.Struct('<16sQQd')       # digest, offset, length, access time
+_ATIME = struct.Struct('<d')           # access time within a slot
+_ATIME_OFFSET = 32
+_RECORD = struct.Struct('<16s')        # digest preceding each value in the segment
+_VERSION = 1
+_TOMBSTONE = 2 ** 64 - 1
+_MAX_LOAD = 0.7
+_MAX_PENDING_ACCESSES = 1024
+_FLOAT = struct.Struct('<d')
+
+
+def _encode(key: Any, parts: list):
+    """Append a canonical encoding of key, which depends only on the values and not on object identity"""
+    cls = key.__class__
+    if cls is str:
+        data = key.encode('utf-8', 'surrogatepass')
+        parts.append(b's%d:' % len(data))
+        parts.append(data)
+    elif cls is int:
+        parts.append(b'i%d;' % key)
+    elif cls is bytes:
+        parts.append(b'b%d:' % len(key))
+        parts.append(key)
+    elif cls is float:
+        parts.append(b'f' + _FLOAT.pack(key))
+    elif cls is bool or key is None:
+        parts.append(b'T' if key is True else b'F' if key is False else b'N')
+    elif cls is tuple or cls is list:
+        parts.append(b'%s%d:' % (b't' if cls is tuple else b'l', len(key)))
+        for item in key:
+            _encode(item, parts)
+    elif cls is frozenset or cls is set:
+        items = sorted(_canonical(item) for item in key)
+        parts.append(b'%s%d:' % (b'z' if cls is frozenset else b'e', len(items)))
+        parts.extend(b'%d:%s' % (len(item), item) for item in items)
+    else:
+        data = pickle.dumps(key, protocol=4)
+        parts.append(b'p%d:' % len(data))
+        parts.append(data)
+
+
+def _canonical(key: Any) -> bytes:
+    parts = []
+    _encode(key, parts)
+    return b''.join(parts)
+
+
+def make_digest(key: Any) -> bytes:
+    """Hash a key to a 16 bytes digest.
+
+    Strings, bytes, numbers, None and tuples, lists and sets of them are encoded
+    by value, so equal keys always have the same digest. Other keys are pickled
+    and should pickle deterministically.
+
+    >>> name = 'func'
+    >>> make_digest((name, name)) == make_digest(('func', ''.join(['fu', 'nc'])))
+    True
+    """
+    return hashlib.blake2b(_canonical(key), digest_size=16).digest()
+
+
+class DiskCache:
+    """Persistent key-value cache safe for concurrent use by multiple processes.
+
+    Arguments:
+        path (str): Directory of the cache. Created if missing.
+        max_bytes (int): Maximum size of the segment file. When exceeded, the least
+            recently used values are evicted by compaction down to 75% of the limit.
+            Default: None - unbounded.
+        initial_capacity (int): Number of index slots of a new cache. The index grows as needed.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as path:
+    ...     with DiskCache(path) as cache:
+    ...         cache.set('answer', 42)
+    ...         cache.get('answer'), cache.get('question') is MISSING
+    (42, True)
+    """
+    path: str
+    max_bytes: Optional[int]
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None, initial_capacity: int = 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+        self._open()
+        with self._locked(exclusive=True):
+            if os.fstat(self._index_fd).st_size < _HEADER.size:
+                self._write_index([], max(8, initial_capacity), 0)
+                open(self._data_path(0), 'ab').close()
+            self._refresh()
+
+    def _open(self):
+        """Open the lock and index files. Each process needs its own, so its locks exclude the others."""
+        self._pid = os.getpid()
+        self._thread_lock = threading.RLock()
+        self._index_map = None
+        self._capacity = 0
+        self._data_file = None
+        self._data_map = None
+        self._generation = None
+        self._accessed = {}
+        self._lock_file = open(os.path.join(self.path, 'lock'), 'a+b')
+        self._index_fd = os.open(os.path.join(self.path, 'index'), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Write pending access times and release memory maps and files. Could be called repeatedly."""
+        if self._pid != os.getpid():
+            self._release()
+            return
+        with self._thread_lock:
+            if self._lock_file is None:
+                return
+            if self._accessed:
+                with self._locked(exclusive=True):
+                    self._refresh()
+                    self._write_accesses()
+            self._release()
+
+    def _release(self):
+        for resource in (self._data_map, self._data_file, self._index_map, self._lock_file):
+            if resource is not None:
+                resource.close()
+        if self._index_fd is not None:
+            os.close(self._index_fd)
+        self._data_map = self._data_file = self._index_map = self._lock_file = self._index_fd = None
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool):
+        if self._pid != os.getpid():
+            # Forked process shares the open files of the parent, including their locks
+            self._release()
+            self._open()
+        with self._thread_lock:
+            if self._lock_file is None:
+                raise ValueError('Disk cache is closed')
+            if fcntl is None:  # pragma: no cover
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _data_path(self, generation: int) -> str:
+        return os.path.join(self.path, f'data.{generation}')
+
+    def _header(self):
+        magic, version, _, capacity, count, used, generation = _HEADER.unpack_from(self._index_map, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"'{self.path}' is not a disk cache")
+        return capacity, count, used, generation
+
+    def _refresh(self):
+        """Remap the index and the segment if another process has changed them"""
+        if self._index_map is None:
+            self._index_map = mmap.mmap(self._index_fd, _HEADER.size)
+        capacity, _, _, generation = self._header()
+        if capacity != self._capacity:
+            self._index_map.close()
+            self._index_map = mmap.mmap(self._index_fd, _HEADER.size + capacity * _SLOT.size)
+            self._capacity = capacity
+        if generation != self._generation:
+            self._close_data()
+            self._data_file = open(self._data_path(generation), 'a+b')
+            self._generation = generation
+
+    def _close_data(self):
+        if self._data_map is not None:
+            self._data_map.close()
+            self._data_map = None
+        if self._data_file is not None:
+            self._data_file.close()
+            self._data_file = None
+
+    def _data_view(self, end: int) -> mmap.mmap:
+        if self._data_map is None or len(self._data_map) < end:
+            if self._data_map is not None:
+                self._data_map.close()
+            self._data_map = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data_map
+
+    def _slots(self):
+        """Iterate over ``(slot_number, digest, offset, length, atime)`` of live slots"""
+        for number in range(self._capacity):
+            digest, offset, length, atime = _SLOT.unpack_from(self._index_map, _HEADER.size + number * _SLOT.size)
+            if length and offset != _TOMBSTONE:
+                yield number, digest, offset, length, atime
+
+    def _find(self, digest: bytes):
+        """Return ``(slot_number, offset, length)`` of digest or ``(free_slot_number, None, None)``"""
+        capacity = self._capacity
+        number = int.from_bytes(digest[:8], 'little') % capacity
+        free = None
+        for _ in range(capacity):
+            slot_digest, offset, length, _ = _SLOT.unpack_from(self._index_map, _HEADER.size + number * _SLOT.size)
+            if not length:
+                return (number if free is None else free), None, None
+            if offset == _TOMBSTONE:
+                free = number if free is None else free
+            elif slot_digest == digest:
+                return number, offset, length
+            number = (number + 1) % capacity
+        return free, None, None
+
+    def _write_index(self, entries, capacity: int, generation: int):
+        """Rewrite the index with the given ``(digest, offset, length, atime)`` entries"""
+        size = _HEADER.size + capacity * _SLOT.size
+        if os.fstat(self._index_fd).st_size < size:
+            os.ftruncate(self._index_fd, size)
+        if self._index_map is not None:
+            self._index_map.close()
+        self._index_map = mmap.mmap(self._index_fd, size)
+        self._capacity = capacity
+        self._index_map[_HEADER.size:size] = bytes(capacity * _SLOT.size)
+        _HEADER.pack_into(self._index_map, 0, _MAGIC, _VERSION, 0, capacity, 0, 0, generation)
+        for digest, offset, length, atime in entries:
+            number, _, _ = self._find(digest)
+            _SLOT.pack_into(self._index_map, _HEADER.size + number * _SLOT.size, digest, offset, length, atime)
+        _HEADER.pack_into(self._index_map, 0, _MAGIC, _VERSION, 0, capacity, len(entries), len(entries), generation)
+
+    def get_digest(self, digest: bytes, default: Any = MISSING) -> Any:
+        """Return value stored under a digest, see :func:`make_digest`"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            number, offset, length = self._find(digest)
+            if offset is None:
+                return default
+            self._accessed[digest] = time.time()
+            with memoryview(self._data_view(offset + length)) as view, view[offset:offset + length] as value:
+                value = pickle.loads(value)
+        if len(self._accessed) >= _MAX_PENDING_ACCESSES:
+            with self._locked(exclusive=True):
+                self._refresh()
+                self._write_accesses()
+        return value
+
+    def _write_accesses(self):
+        """Write access times collected by :meth:`get_digest`. Called with the exclusive lock."""
+        accessed, self._accessed = self._accessed, {}
+        for digest, atime in accessed.items():
+            number, offset, _ = self._find(digest)
+            if offset is not None:
+                _ATIME.pack_into(self._index_map, _HEADER.size + number * _SLOT.size + _ATIME_OFFSET, atime)
+
+    def set_digest(self, digest: bytes, value: Any):
+        """Store value under a digest, see :func:`make_digest`"""
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes is not None and _RECORD.size + len(payload) > self.max_bytes:
+            return
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._write_accesses()
+            data_file = self._data_file
+            data_file.seek(0, os.SEEK_END)
+            offset = data_file.tell() + _RECORD.size
+            data_file.write(_RECORD.pack(digest))
+            data_file.write(payload)
+            data_file.flush()
+            capacity, count, used, generation = self._header()
+            number, old_offset, _ = self._find(digest)
+            if old_offset is None:
+                count += 1
+                used += 1 if not _SLOT.unpack_from(self._index_map, _HEADER.size + number * _SLOT.size)[2] else 0
+            _SLOT.pack_into(self._index_map, _HEADER.size + number * _SLOT.size, digest, offset, len(payload), time.time())
+            _HEADER.pack_into(self._index_map, 0, _MAGIC, _VERSION, 0, capacity, count, used, generation)
+            if self.max_bytes is not None and offset + len(payload) > self.max_bytes:
+                self._compact(int(self.max_bytes * 0.75))
+            elif used > capacity * _MAX_LOAD:
+                self._write_index([slot[1:] for slot in self._slots()], capacity * 2, generation)
+
+    def delete_digest(self, digest: bytes) -> bool:
+        """Remove value stored under a digest. Returns True if value was found."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            number, offset, _ = self._find(digest)
+            if offset is None:
+                return False
+            _SLOT.pack_into(self._index_map, _HEADER.size + number * _SLOT.size, bytes(16), _TOMBSTONE, 1, 0.0)
+            capacity, count, used, generation = self._header()
+            _HEADER.pack_into(self._index_map, 0, _MAGIC, _VERSION, 0, capacity, count - 1, used, generation)
+            return True
+
+    def get(self, key: Any, default: Any = MISSING) -> Any:
+        """Return value stored under key or ``default`` if missing"""
+        return self.get_digest(make_digest(key), default)
+
+    def set(self, key: Any, value: Any):
+        """Store value under key"""
+        self.set_digest(make_digest(key), value)
+
+    def delete(self, key: Any) -> bool:
+        """Remove value stored under key. Returns True if value was found."""
+        return self.delete_digest(make_digest(key))
+
+    def __len__(self):
+        with self._locked(exclusive=False):
+            self._refresh()
+            return self._header()[1]
+
+    @property
+    def data_size(self) -> int:
+        """Size of the segment file in bytes, including values which are no longer referenced"""
+        with self._locked(exclusive=False):
+            self._refresh()
+            return os.fstat(self._data_file.fileno()).st_size
+
+    def compact(self, max_bytes: Optional[int] = None):
+        """Rewrite the segment without unreferenced values.
+
+        With ``max_bytes`` the least recently used values are evicted until the
+        segment fits the limit.
+        """
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._compact(max_bytes)
+
+    def clear(self):
+        """Remove all values"""
+        self.compact(0)
+
+    def _compact(self, max_bytes: Optional[int]):
+        self._write_accesses()
+        entries = sorted((slot[1:] for slot in self._slots()), key=lambda entry: entry[3], reverse=True)
+        capacity, _, _, generation = self._header()
+        new_generation = generation + 1
+        kept = []
+        size = 0
+        with open(self._data_path(new_generation), 'wb') as new_file:
+            if entries:
+                with memoryview(self._data_view(os.fstat(self._data_file.fileno()).st_size)) as view:
+                    for digest, offset, length, atime in entries:
+                        if max_bytes is not None and size + _RECORD.size + length > max_bytes:
+                            continue
+                        new_file.write(_RECORD.pack(digest))
+                        new_file.write(view[offset:offset + length])
+                        kept.append((digest, size + _RECORD.size, length, atime))
+                        size += _RECORD.size + length
+            new_file.flush()
+            os.fsync(new_file.fileno())
+        while len(kept) > capacity * _MAX_LOAD:
+            capacity *= 2
+        old_path = self._data_path(generation)
+        self._write_index(kept, capacity, new_generation)
+        self._refresh()
+        os.remove(old_path)
+
+
+def disk_memoize(path: str, max_bytes: Optional[int] = None, key_func: Callable = None):
+    """Decorator to cache function results on disk, across runs and processes
+
+    Arguments:
+        path (str): Cache directory. Could be shared by multiple functions.
+        max_bytes (int): Maximum size of the cache data, see :class:`DiskCache`.
+        key_func (Callable): Function which receives the call arguments and returns
+            a picklable key. Default: the function name and the arguments are used.
+
+    Results must be picklable. The :class:`DiskCache` instance, opened on first call,
+    is returned by the ``get_cache()`` attribute of the decorated function.
+
+    Example::
+
+        @disk_memoize('/var/cache/myjob')
+        def fetch_report(day: str):
+            ...
+    """
+    cache_holder = []
+
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        def get_cache():
+            if not cache_holder:
+                cache_holder.append(DiskCache(path, max_bytes))
+            return cache_holder[0]
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs) if key_func else (args, tuple(sorted(kwargs.items())))
+            digest = make_digest((name, key))
+            cache = get_cache()
+            value = cache.get_digest(digest)
+            if value is MISSING:
+                value = func(*args, **kwargs)
+                cache.set_digest(digest, value)
+            return value
+
+        wrapper.get_cache = get_cache
+        return wrapper
+    return decorator
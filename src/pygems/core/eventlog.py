@@ -0,0 +1,249 @@
+"""Record plugin notifications to a binary log and replay them.
+
+The log starts with a magic header followed by length-prefixed records::
+
+    PGEVLOG1                     magic
+    <uint32 length><payload>     pickled (timestamp, args, kwargs), repeated
+
+Logs may be gzip compressed, :func:`read_events` detects it from the first bytes.
+Compressed logs passed as file objects must be seekable.
+"""
+import gzip
+import io
+import pickle
+import struct
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from pygems.core.plugin import PluginCollection, listener_name
+from pygems.core.timer import Timer
+
+_MAGIC = b'PGEVLOG1'
+_LENGTH = struct.Struct('<I')
+_GZIP_MAGIC = b'\x1f\x8b'
+
+
+class RecordedEvent(NamedTuple):
+    """Notification read from an event log"""
+    timestamp: float
+    args: tuple
+    kwargs: dict
+
+
+class EventRecorder:
+    """Plugin which writes every notification to an event log
+
+    Arguments:
+        file (str or file): Path of the log or binary file object open for writing.
+            Files passed as objects are not closed by the recorder.
+        compress (bool): Write gzip compressed log. Default: False
+        time_func (Callable): Function returning the timestamp of a notification.
+            Default: :func:`time.time`
+
+    Insert the recorder first, so the timestamps aren't delayed by the other plugins::
+
+        with EventRecorder('events.log.gz', compress=True) as recorder:
+            plugins.insert(recorder)
+            run_application(plugins)
+
+    Arguments of the notifications must be picklable. Recording is thread safe.
+    """
+    count: int
+    """Number of recorded notifications"""
+
+    def __init__(self, file: Union[str, BinaryIO], compress: bool = False, time_func: Callable[[], float] = None):
+        self._owns_file = isinstance(file, str)
+        raw = open(file, 'wb') if self._owns_file else file
+        self._file = gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw
+        self._raw = raw
+        self._time_func = time_func or time.time
+        self._lock = threading.Lock()
+        self.count = 0
+        self._file.write(_MAGIC)
+
+    def __call__(self, *args, **kwargs):
+        payload = pickle.dumps((self._time_func(), args, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._file.write(_LENGTH.pack(len(payload)))
+            self._file.write(payload)
+            self.count += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def flush(self):
+        """Flush buffered records to the file"""
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        """Finish the log. Closes the file when the recorder opened it."""
+        with self._lock:
+            if self._file is not self._raw:
+                self._file.close()
+            if self._owns_file:
+                self._raw.close()
+            else:
+                self._raw.flush()
+
+
+def _read_exactly(file: BinaryIO, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise EOFError('Truncated event log')
+    return data
+
+
+def read_events(file: Union[str, BinaryIO]) -> Iterator[RecordedEvent]:
+    """Read notifications from an event log
+
+    >>> stream = io.BytesIO()
+    >>> with EventRecorder(stream, time_func=lambda: 1.5) as recorder:
+    ...     recorder('load', 'file.txt', mode='r')
+    >>> _ = stream.seek(0)
+    >>> list(read_events(stream))
+    [RecordedEvent(timestamp=1.5, args=('load', 'file.txt'), kwargs={'mode': 'r'})]
+    """
+    owns_file = isinstance(file, str)
+    raw = open(file, 'rb') if owns_file else file
+    try:
+        stream = raw
+        magic = stream.read(len(_MAGIC))
+        if magic[:2] == _GZIP_MAGIC:
+            raw.seek(-len(magic), io.SEEK_CUR)
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+            magic = stream.read(len(_MAGIC))
+        if magic != _MAGIC:
+            raise ValueError('Not an event log')
+        while True:
+            header = stream.read(_LENGTH.size)
+            if not header:
+                return
+            if len(header) != _LENGTH.size:
+                raise EOFError('Truncated event log')
+            (length,) = _LENGTH.unpack(header)
+            yield RecordedEvent(*pickle.loads(_read_exactly(stream, length)))
+    finally:
+        if owns_file:
+            raw.close()
+
+
+class LatencyStats:
+    """Latencies of one listener measured during a replay"""
+    count: int
+    total: float
+    max: float
+    samples: List[float]
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def __call__(self, timer: Timer, *args):
+        """Add latency of a stopped timer. Used as the ``stop_func`` of a :class:`Timer`."""
+        elapsed = timer.elapsed
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.samples.append(elapsed)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Latency below which ``percent`` of the samples fall (nearest rank)
+
+        >>> stats = LatencyStats()
+        >>> stats.samples = [4.0, 1.0, 3.0, 2.0]
+        >>> stats.percentile(50), stats.percentile(100)
+        (2.0, 4.0)
+        """
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = max(1, -(-len(ordered) * percent // 100))
+        return ordered[int(rank) - 1]
+
+
+class ReplayReport(NamedTuple):
+    """Result of :func:`replay`"""
+    events: int
+    """Number of replayed notifications"""
+    elapsed: float
+    """Duration of the replay in seconds"""
+    listeners: Dict[str, LatencyStats]
+    """Latency of each listener by :func:`~pygems.core.plugin.listener_name`"""
+
+    def format(self) -> str:
+        """Text table with latency of each listener in milliseconds"""
+        lines = [f'{self.events} events in {self.elapsed:.3f}s',
+                 f'{"listener":<40} {"calls":>8} {"mean":>10} {"p50":>10} {"p99":>10} {"max":>10}']
+        for name, stats in self.listeners.items():
+            lines.append(f'{name:<40} {stats.count:>8} {stats.mean * 1000:>10.3f} {stats.percentile(50) * 1000:>10.3f} '
+                         f'{stats.percentile(99) * 1000:>10.3f} {stats.max * 1000:>10.3f}')
+        return '\n'.join(lines)
+
+
+def _listener_names(listeners: list) -> List[str]:
+    names = []
+    for listener in listeners:
+        name = listener_name(listener)
+        if name in names:
+            name = f'{name}#{len(names)}'
+        names.append(name)
+    return names
+
+
+def replay(events: Union[str, BinaryIO, Iterable[RecordedEvent]], plugins: PluginCollection,
+           speed: Optional[float] = 1.0, time_func: Callable[[], float] = None,
+           sleep_func: Callable[[float], Any] = time.sleep) -> ReplayReport:
+    """Notify plugins with recorded events and measure latency of each listener
+
+    Arguments:
+        events: Event log path, binary file or iterable of :class:`RecordedEvent`.
+        plugins (PluginCollection): Plugins to notify. :class:`EventRecorder` plugins are skipped.
+        speed (float): Replay speed relative to the recorded timestamps, e.g. 2 replays twice
+            as fast. ``None`` replays at maximum speed. Default: 1.0
+        time_func (Callable): Clock used for pacing and latency. Default: :func:`timeit.default_timer`
+        sleep_func (Callable): Function used to wait for the next event. Default: :func:`time.sleep`
+
+    When listeners are slower than the recorded rate, events are replayed as fast as
+    possible until the replay catches up.
+
+    >>> events = [RecordedEvent(0.0, ('load', 'a.txt'), {}), RecordedEvent(0.5, ('load', 'b.txt'), {})]
+    >>> report = replay(events, PluginCollection().append(print), speed=None)
+    load a.txt
+    load b.txt
+    >>> report.events, report.listeners['print'].count
+    (2, 2)
+    """
+    if isinstance(events, str) or hasattr(events, 'read'):
+        events = read_events(events)
+    listeners = [plugin for plugin in plugins if not isinstance(plugin, EventRecorder)]
+    stats = {name: LatencyStats() for name in _listener_names(listeners)}
+    timers = [Timer(name=name, time_func=time_func, stop_func=stats[name]) for name in stats]
+    clock = timers[0].time_func if timers else (time_func or time.perf_counter)
+    count = 0
+    started_at = clock()
+    first_timestamp = None
+    for timestamp, args, kwargs in events:
+        if speed:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            delay = started_at + (timestamp - first_timestamp) / speed - clock()
+            if delay > 0:
+                sleep_func(delay)
+        for listener, timer in zip(listeners, timers):
+            timer.start()
+            listener(*args, **kwargs)
+            timer.stop()
+        count += 1
+    return ReplayReport(count, clock() - started_at, stats)
@@ -0,0 +1,212 @@
+"""Bounded event queue between producers and a plugin collection."""
+import collections
+import threading
+import time
+import traceback
+from typing import Callable, NamedTuple, Optional
+
+from pygems.core.plugin import PluginCollection
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+SAMPLE = 'sample'
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, SAMPLE)
+
+
+class QueueStats(NamedTuple):
+    """Metrics returned by :meth:`EventQueue.stats`"""
+    depth: int
+    """Number of queued events"""
+    max_depth: int
+    """Highest number of queued events seen"""
+    capacity: int
+    enqueued: int
+    """Number of accepted events"""
+    delivered: int
+    """Number of events passed to the plugins"""
+    dropped: int
+    """Number of events discarded by the overflow policy or by a blocking timeout"""
+    errors: int
+    """Number of notifications which raised an exception"""
+
+
+class EventQueue:
+    """Deliver notifications to plugins from worker threads through a bounded queue
+
+    Arguments:
+        plugins (PluginCollection): Plugins notified by the workers.
+        maxsize (int): Maximum number of queued events. Default: 1024
+        overflow (str): What :meth:`notify` does when the queue is full:
+
+            * ``'block'`` waits for free space, up to ``timeout`` seconds
+            * ``'drop_oldest'`` discards the oldest queued event
+            * ``'drop_newest'`` discards the new event
+            * ``'sample'`` keeps every ``sample_every``-th new event by discarding
+              the oldest one and discards the others, so a long burst is represented
+              by a sample instead of only its beginning or end
+
+            Default: ``'block'``
+        workers (int): Number of worker threads. Events are delivered in order only
+            with a single worker. Must be at least 1. Default: 1
+        timeout (float): Maximum time to block with the ``'block'`` policy. The event
+            is dropped when it expires. Closing the queue while waiting raises
+            :class:`RuntimeError`. Default: wait forever
+        sample_every (int): Sampling rate of the ``'sample'`` policy. Default: 10
+        error_handler (Callable): Called with exceptions raised by the plugins, e.g. an
+            :class:`~pygems.core.shortcuts.ErrorPolicy`. Errors are counted in any case and
+            the worker continues with the next event. Exceptions raised by the handler
+            are printed.
+
+    Memory use is bounded by ``maxsize`` events whatever the rate of the producers::
+
+        with EventQueue(plugins, maxsize=10000, overflow='drop_oldest', workers=2) as events:
+            for frame in frames:
+                events.notify('frame', frame)
+            print(events.stats())
+    """
+    plugins: PluginCollection
+    maxsize: int
+    overflow: str
+
+    def __init__(self, plugins: PluginCollection, maxsize: int = 1024, overflow: str = BLOCK, workers: int = 1,
+                 timeout: Optional[float] = None, sample_every: int = 10,
+                 error_handler: Optional[Callable[[Exception], None]] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'")
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.plugins = plugins
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.timeout = timeout
+        self.sample_every = sample_every
+        self.error_handler = error_handler
+        self._queue = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        self._unfinished = 0
+        self._overflows = 0
+        self._closed = False
+        self._max_depth = self._enqueued = self._delivered = self._dropped = self._errors = 0
+        self._workers = [threading.Thread(target=self._work, name=f'EventQueue-{index}', daemon=True)
+                         for index in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def depth(self) -> int:
+        """Number of queued events"""
+        return len(self._queue)
+
+    def notify(self, *args, **kwargs) -> bool:
+        """Queue notification of the plugins. Returns False when the event was dropped."""
+        event = (args, kwargs)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Event queue is closed')
+            queue = self._queue
+            if len(queue) >= self.maxsize and not self._make_room():
+                self._dropped += 1
+                return False
+            queue.append(event)
+            self._unfinished += 1
+            self._enqueued += 1
+            if len(queue) > self._max_depth:
+                self._max_depth = len(queue)
+            self._not_empty.notify()
+        return True
+
+    def _make_room(self) -> bool:
+        """Apply the overflow policy to a full queue. Called with the lock held."""
+        queue = self._queue
+        if self.overflow == BLOCK:
+            deadline = None if self.timeout is None else time.monotonic() + self.timeout
+            while True:
+                if self._closed:
+                    raise RuntimeError('Event queue is closed')
+                if len(queue) < self.maxsize:
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._not_full.wait(remaining)
+        if self.overflow == SAMPLE:
+            self._overflows += 1
+            if self._overflows % self.sample_every:
+                return False
+        elif self.overflow == DROP_NEWEST:
+            return False
+        queue.popleft()
+        self._dropped += 1
+        self._task_done()
+        return True
+
+    def _task_done(self):
+        self._unfinished -= 1
+        if not self._unfinished:
+            self._all_done.notify_all()
+
+    def _work(self):
+        queue = self._queue
+        while True:
+            with self._lock:
+                while not queue:
+                    if self._closed:
+                        return
+                    self._not_empty.wait()
+                args, kwargs = queue.popleft()
+                self._not_full.notify()
+            try:
+                self.plugins.notify(*args, **kwargs)
+            except Exception as error:
+                with self._lock:
+                    self._errors += 1
+                if self.error_handler is not None:
+                    try:
+                        self.error_handler(error)
+                    except Exception:
+                        traceback.print_exc()
+            finally:
+                with self._lock:
+                    self._delivered += 1
+                    self._task_done()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued events are delivered. Returns False on timeout."""
+        with self._lock:
+            return self._all_done.wait_for(lambda: not self._unfinished, timeout)
+
+    def close(self, drain: bool = True):
+        """Stop accepting events and stop the workers
+
+        Queued events are delivered first when ``drain`` is true, otherwise they are dropped.
+        """
+        with self._lock:
+            self._closed = True
+            if not drain:
+                self._dropped += len(self._queue)
+                for _ in range(len(self._queue)):
+                    self._task_done()
+                self._queue.clear()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
+
+    def stats(self) -> QueueStats:
+        """Snapshot of the queue metrics"""
+        with self._lock:
+            return QueueStats(len(self._queue), self._max_depth, self.maxsize, self._enqueued,
+                              self._delivered, self._dropped, self._errors)
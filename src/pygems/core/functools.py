@@ -1,32 +1,283 @@
-
+import asyncio
+import inspect
+import sys
+import threading
+import time
+import types as _types
+from collections import Counter, OrderedDict, namedtuple
 from functools import wraps, partial
-from typing import Callable
+from typing import Any, Callable, Iterable, Optional
+
+from pygems.core.shortcuts import MISSING
+
+class _Rule:
+    """Registered function with predicates, see :meth:`MultiMethod.register`"""
+    __slots__ = ('types', 'predicates', 'function')
+
+    def __init__(self, types: tuple, predicates: tuple, function: Callable):
+        self.types = types
+        self.predicates = predicates
+        self.function = function
+
+    def accepts(self, types: tuple) -> bool:
+        return len(types) == len(self.types) and all(
+            expected is None or expected is actual for expected, actual in zip(self.types, types))
+
+
+class _Node:
+    """Decision tree node testing one predicate. Branches are compiled on first use."""
+    __slots__ = ('position', 'predicate', 'rules', 'fallback', '_if_true', '_if_false')
+
+    def __init__(self, position: Optional[int], predicate: Callable, rules: list, fallback: Optional[Callable]):
+        self.position = position
+        self.predicate = predicate
+        self.rules = rules
+        self.fallback = fallback
+        self._if_true = self._if_false = None
+
+    def branch(self, result: bool):
+        if result:
+            if self._if_true is None:
+                key = (self.position, self.predicate)
+                self._if_true = _compile([(rule, pending - {key}) for rule, pending in self.rules], self.fallback)
+            return self._if_true
+        if self._if_false is None:
+            key = (self.position, self.predicate)
+            self._if_false = _compile([item for item in self.rules if key not in item[1]], self.fallback)
+        return self._if_false
+
+
+def _compile(rules: list, fallback: Optional[Callable]):
+    """Build decision tree node for ``(rule, pending predicates)`` pairs in priority order
+
+    Returns the function to call when the first rule has no pending predicates,
+    otherwise a node testing one of its pending predicates. The predicate shared by
+    most pending rules is chosen, because a false result eliminates all of them.
+    The selectivity of the predicates is not known, so the number of rules sharing
+    a predicate stands in for it.
+    """
+    if not rules:
+        return fallback
+    if not rules[0][1]:
+        return rules[0][0].function
+    shared = Counter(key for _, pending in rules for key in pending)
+    first, pending = rules[0]
+    position, predicate = max((key for key in first.predicates if key in pending), key=shared.__getitem__)
+    return _Node(position, predicate, rules, fallback)
+
 
 class MultiMethod(object):
     """Manage function versions distinguieshed by argument types
     
     Based on Guido van Rossum's `Five-minute Multimethods in Python <https://www.artima.com/weblogs/viewpost.jsp?thread=101605>`_
+
+    Besides exact argument types, functions can be registered for argument values
+    matching predicates, see :meth:`register`.
     """
     name: str
     typemap: dict
+    rules: list
+    vectorized: dict
 
     def __init__(self, name):
         self.name = name
         self.typemap = {}
+        self.rules = []
+        self.vectorized = {}
+        self._trees = {}
 
     def __call__(self, *args):
         """Finds and calls the function which matches the given signature, returning the result."""
         types = tuple(arg.__class__ for arg in args) # a generator expression!
-        function = self.typemap.get(types)
+        if self.rules:
+            function = self._resolve(types, args)
+        else:
+            function = self.typemap.get(types)
         if function is None:
-            raise TypeError("no match")
+            vector = self.vectorized.get(types)
+            if vector is None:
+                raise TypeError("no match")
+            return vector(*([arg] for arg in args))[0]
         return function(*args)
 
-    def register(self, types, function):
-        """Register function signature."""
-        if types in self.typemap:
+    def _tree(self, types: tuple):
+        """Decision tree compiled for the argument types, or the function when there are no predicates"""
+        node = self._trees.get(types, MISSING)
+        if node is MISSING:
+            rules = [(rule, frozenset(rule.predicates)) for rule in self.rules if rule.accepts(types)]
+            node = self._trees[types] = _compile(rules, self.typemap.get(types))
+        return node
+
+    @staticmethod
+    def _walk(node, args: tuple) -> Optional[Callable]:
+        while node.__class__ is _Node:
+            position = node.position
+            node = node.branch(node.predicate(*args) if position is None else node.predicate(args[position]))
+        return node
+
+    def _resolve(self, types: tuple, args: tuple) -> Optional[Callable]:
+        """Walk the decision tree compiled for the argument types"""
+        return self._walk(self._tree(types), args)
+
+    def map(self, iterable: Iterable) -> list:
+        """Call the multimethod with each item of ``iterable``, see :meth:`starmap`
+
+        >>> mm = MultiMethod('double')
+        >>> mm.register((int,), lambda value: value * 2)
+        >>> mm.register((str,), lambda value: value + value)
+        >>> mm.map([1, 'a', 2])
+        [2, 'aa', 4]
+        """
+        groups = {}
+        count = 0
+        for item in iterable:
+            cls = item.__class__
+            group = groups.get(cls)
+            if group is None:
+                group = groups[cls] = ([], [])
+            group[0].append(count)
+            group[1].append(item)
+            count += 1
+        results = [None] * count
+        for cls, (indices, items) in groups.items():
+            self._call_group((cls,), indices, [(item,) for item in items], results)
+        return results
+
+    def starmap(self, iterable: Iterable[tuple]) -> list:
+        """Call the multimethod with each tuple of arguments from ``iterable``
+
+        Calls are grouped by the classes of the arguments and the implementation is
+        resolved once per group. Groups matching a vectorized implementation, see
+        :meth:`register_vectorized`, are passed to it in a single call. Functions
+        registered with predicates are still resolved for each call, and only calls
+        which fall through to the class-only implementation are vectorized.
+
+        Returns list of results in the order of the arguments.
+        """
+        groups = {}
+        count = 0
+        for args in iterable:
+            types = tuple(arg.__class__ for arg in args)
+            group = groups.get(types)
+            if group is None:
+                group = groups[types] = ([], [])
+            group[0].append(count)
+            group[1].append(args)
+            count += 1
+        results = [None] * count
+        for types, (indices, arguments) in groups.items():
+            self._call_group(types, indices, arguments, results)
+        return results
+
+    def _call_group(self, types: tuple, indices: list, arguments: list, results: list):
+        vector = self.vectorized.get(types)
+        node = self._tree(types) if self.rules else self.typemap.get(types)
+        if node.__class__ is not _Node:
+            if vector is None and node is None:
+                raise TypeError("no match")
+            if vector is None:
+                values = map(node, *zip(*arguments)) if types else (node() for _ in indices)
+                for index, value in zip(indices, values):
+                    results[index] = value
+                return
+            batch = indices, arguments
+        else:
+            fallback = self.typemap.get(types)
+            batch = [], []
+            for index, args in zip(indices, arguments):
+                function = self._walk(node, args)
+                if function is fallback and vector is not None:
+                    batch[0].append(index)
+                    batch[1].append(args)
+                elif function is None:
+                    raise TypeError("no match")
+                else:
+                    results[index] = function(*args)
+            if not batch[0]:
+                return
+        values = vector(*(list(column) for column in zip(*batch[1])))
+        if len(values) != len(batch[0]):
+            raise ValueError(f"vectorized implementation of {self.name} returned {len(values)} results "
+                             f"for {len(batch[0])} calls")
+        for index, value in zip(batch[0], values):
+            results[index] = value
+
+    def register_vectorized(self, types, function):
+        """Register function called by :meth:`map` and :meth:`starmap` with a group of calls
+
+        The function receives a list for each positional parameter, containing its
+        arguments for all calls in the group with the argument classes ``types``, and
+        returns a sequence of results in the same order. It takes precedence over the
+        function registered for the same classes in batch calls and is used for
+        single calls when there is no such function.
+
+        >>> mm = MultiMethod('total')
+        >>> mm.register_vectorized((int, int), lambda left, right: [a + b for a, b in zip(left, right)])
+        >>> mm.starmap([(1, 2), (3, 4)])
+        [3, 7]
+        >>> mm(5, 6)
+        11
+        """
+        types = tuple(types)
+        if not all(isinstance(slot, type) and not _is_typing_construct(slot) for slot in types):
+            raise TypeError("vectorized implementations are registered for classes")
+        if types in self.vectorized:
             raise TypeError("duplicate registration")
-        self.typemap[types] = function
+        self.vectorized[types] = function
+
+    def register(self, types, function, when: Optional[Callable] = None):
+        """Register function signature.
+
+        Items of ``types`` are classes matched exactly against the classes of the
+        arguments, or predicates called with the argument at the same position. The
+        optional ``when`` guard is called with all arguments. Functions with predicates
+        or guards are tried in the order of registration before the functions matching
+        only the argument classes.
+
+        Predicates are compiled into a decision tree for each signature of argument
+        classes. Each node tests a predicate of the first remaining function, choosing
+        the one shared by most of the remaining functions, so a predicate reused by many
+        functions is evaluated once per call. Predicates are shared when the same object
+        is registered, such as a module level function. Inline lambdas are distinct
+        objects, so functions guarded only by lambdas are tried one after another.
+
+        Typing constructs such as ``List[int]`` or ``int | str`` are rejected, they are
+        neither classes nor predicates.
+        """
+        types = tuple(types)
+        for slot in types:
+            _check_slot(slot)
+        if not any(_is_predicate(slot) for slot in types) and when is None:
+            if types in self.typemap:
+                raise TypeError("duplicate registration")
+            self.typemap[types] = function
+        else:
+            rule_types = tuple(None if _is_predicate(slot) else slot for slot in types)
+            predicates = tuple((position, slot) for position, slot in enumerate(types) if _is_predicate(slot))
+            if when is not None:
+                predicates += ((None, when),)
+            if any(rule.types == rule_types and rule.predicates == predicates for rule in self.rules):
+                raise TypeError("duplicate registration")
+            self.rules.append(_Rule(rule_types, predicates, function))
+        self._trees = {}
+
+
+_TYPING_CLASSES = tuple(getattr(_types, name) for name in ('GenericAlias', 'UnionType') if hasattr(_types, name))
+
+
+def _is_typing_construct(slot) -> bool:
+    return type(slot).__module__ == 'typing' or isinstance(slot, _TYPING_CLASSES)
+
+
+def _is_predicate(slot) -> bool:
+    return callable(slot) and not isinstance(slot, type) and not _is_typing_construct(slot)
+
+
+def _check_slot(slot):
+    if _is_typing_construct(slot):
+        raise TypeError(f"typing constructs are not supported, got {slot!r}")
+    if not isinstance(slot, type) and not callable(slot):
+        raise TypeError(f"expecting class or predicate, got {slot!r}")
 
 
 
@@ -36,20 +287,31 @@ class MultiMethodRegistry(object):
     _registry = {}   # class attribute
 
     @classmethod
-    def register(cls, types:list, function: Callable) -> MultiMethod:
+    def register(cls, types:list, function: Callable, when: Optional[Callable] = None) -> MultiMethod:
         """Register a function as mutimethod."""
         name = function.__name__
         registry = cls._registry
         mm = registry.get(name)
         if mm is None:
             mm = registry[name] = MultiMethod(name)
-        mm.register(types, function)
+        mm.register(types, function, when)
         mm = wraps(function)(mm)
         return mm
 
+    @classmethod
+    def register_vectorized(cls, types:list, function: Callable) -> MultiMethod:
+        """Register a function as vectorized implementation of a multimethod."""
+        name = function.__name__
+        registry = cls._registry
+        mm = registry.get(name)
+        if mm is None:
+            mm = registry[name] = MultiMethod(name)
+        mm.register_vectorized(types, function)
+        return mm
+
 
 
-def multimethod(*types):
+def multimethod(*types, when: Optional[Callable] = None):
     """Decorator to register a multimethod signature
     
     You can specify function to be mapped to call signature.
@@ -107,7 +369,329 @@ def multimethod(*types):
     Traceback (most recent call last):
     ...
     TypeError: no match
+
+    Predicates can be used instead of classes, and a ``when`` guard receives all
+    arguments. Such functions take precedence over functions matching only classes:
+
+    >>> @multimethod(str, when=lambda name: not name)
+    ... def myfunc(name: str):
+    ...     print('Hello, stranger')
+    >>> @multimethod(lambda value: isinstance(value, list) and len(value) > 2)
+    ... def myfunc(items: list):
+    ...     print(f'{len(items)} items')
+    >>> myfunc('')
+    Hello, stranger
+    >>> myfunc('Ivan')
+    Hello, Ivan
+    >>> myfunc([1, 2, 3])
+    3 items
+    """
+    def register(function):
+        return MultiMethodRegistry.register(types, function, when)
+    return register
+
+
+def vectorized(*types):
+    """Decorator to register a vectorized implementation of a multimethod
+
+    The function has the same name as the multimethod and receives a list for
+    each positional parameter. It is used by :meth:`MultiMethod.map` and
+    :meth:`MultiMethod.starmap` for the calls with the argument classes ``types``:
+
+    >>> @multimethod(float)
+    ... def scale(value):
+    ...     return value * 10
+    >>> @vectorized(float)
+    ... def scale(values):
+    ...     print(f'{len(values)} values')
+    ...     return [value * 10 for value in values]
+    >>> scale.map([1.5, 2.5, 3.5])
+    3 values
+    [15.0, 25.0, 35.0]
+    >>> scale(1.5)
+    15.0
     """
     def register(function):
-        return MultiMethodRegistry.register(types, function)
+        return MultiMethodRegistry.register_vectorized(types, function)
     return register
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions maxsize currsize maxbytes currbytes')
+"""Cache statistics returned by :meth:`MemoCache.info`"""
+
+LRU = 'lru'
+LFU = 'lfu'
+
+_KWD_MARK = object()
+
+
+class MemoCache:
+    """Storage for :func:`memoize` with LRU or LFU eviction, per-entry TTL and size bounds.
+
+    Arguments:
+        maxsize (int): Maximum number of entries. None means unbounded. Default: 128
+        maxbytes (int): Maximum total size of the values, as measured by ``sizeof``.
+            None means unbounded. Default: None
+        ttl (float): Seconds after which an entry expires. None means never. Default: None
+        policy (str): Eviction policy, ``'lru'`` or ``'lfu'``. Default: 'lru'
+        sizeof (Callable): Function to measure value size in bytes. Default: ``sys.getsizeof``
+        time_func (Callable): Function to get the current time. Default: ``time.monotonic``
+
+    The cache is thread-safe.
+
+    >>> cache = MemoCache(maxsize=2)
+    >>> cache.set('a', 1); cache.set('b', 2); cache.set('c', 3)
+    >>> cache.get('a') is None, cache.get('c')
+    (True, 3)
+    >>> info = cache.info()
+    >>> info.hits, info.misses, info.evictions, info.currsize
+    (1, 1, 1, 2)
+    """
+
+    def __init__(self, maxsize: Optional[int] = 128, maxbytes: Optional[int] = None, ttl: Optional[float] = None,
+                 policy: str = LRU, sizeof: Callable[[Any], int] = sys.getsizeof, time_func: Callable[[], float] = None):
+        if policy not in (LRU, LFU):
+            raise ValueError(f"Unknown cache policy '{policy}'")
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.policy = policy
+        self.sizeof = sizeof
+        self._time_func = time_func or time.monotonic
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()   # key -> [value, expires_at, size, frequency]
+        self._frequencies = {}          # LFU only: frequency -> OrderedDict of keys
+        self._min_frequency = 0
+        self._bytes = 0
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return cached value for ``key`` or ``default`` if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= self._time_func():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            self._touch(key, entry)
+            return entry[0]
+
+    def set(self, key, value):
+        """Store ``value`` under ``key``, evicting entries to respect the bounds."""
+        size = self.sizeof(value)
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+        expires_at = None if self.ttl is None else self._time_func() + self.ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (
+                    (self.maxsize is not None and len(self._entries) >= self.maxsize)
+                    or (self.maxbytes is not None and self._bytes + size > self.maxbytes)):
+                self._remove(self._victim())
+                self._evictions += 1
+            if self.maxsize is not None and self.maxsize <= 0:
+                return
+            self._entries[key] = [value, expires_at, size, 1]
+            self._bytes += size
+            if self.policy == LFU:
+                self._frequencies.setdefault(1, OrderedDict())[key] = None
+                self._min_frequency = 1
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._frequencies.clear()
+            self._bytes = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def info(self) -> CacheInfo:
+        """Return cache statistics"""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self.maxsize,
+                             len(self._entries), self.maxbytes, self._bytes)
+
+    def _touch(self, key, entry):
+        if self.policy == LRU:
+            self._entries.move_to_end(key)
+            return
+        frequency = entry[3]
+        bucket = self._frequencies[frequency]
+        del bucket[key]
+        if not bucket:
+            del self._frequencies[frequency]
+            if self._min_frequency == frequency:
+                self._min_frequency = frequency + 1
+        entry[3] = frequency + 1
+        self._frequencies.setdefault(frequency + 1, OrderedDict())[key] = None
+
+    def _victim(self):
+        if self.policy == LRU:
+            return next(iter(self._entries))
+        if self._min_frequency not in self._frequencies:
+            self._min_frequency = min(self._frequencies)
+        return next(iter(self._frequencies[self._min_frequency]))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+        if self.policy == LFU:
+            bucket = self._frequencies[entry[3]]
+            del bucket[key]
+            if not bucket:
+                del self._frequencies[entry[3]]
+
+
+def _make_key(args: tuple, kwargs: dict, typed: bool):
+    key = args
+    if kwargs:
+        key += (_KWD_MARK,) + tuple(kwargs.items())
+    if typed:
+        key += tuple(type(value) for value in args) + tuple(type(value) for value in kwargs.values())
+    return key
+
+
+class _Flight:
+    __slots__ = ('event', 'result', 'error', 'owner')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.owner = threading.get_ident()
+
+
+_ABANDONED = object()
+"""Result of a computation whose caller was cancelled. Waiting callers retry."""
+
+
+def _recursive_call(func: Callable) -> RuntimeError:
+    return RuntimeError(f'{func.__qualname__} called recursively with the same arguments')
+
+
+def memoize(func: Callable = None, *, maxsize: Optional[int] = 128, maxbytes: Optional[int] = None,
+            ttl: Optional[float] = None, policy: str = LRU, sizeof: Callable[[Any], int] = sys.getsizeof,
+            typed: bool = False, time_func: Callable[[], float] = None):
+    """Decorator to cache function results
+
+    Extends :func:`functools.lru_cache` with LFU eviction, per-entry TTL, size bounds in
+    bytes and eviction statistics. See :class:`MemoCache` for the arguments. With ``typed``
+    arguments of different types are cached separately, e.g. ``f(3)`` and ``f(3.0)``.
+
+    Concurrent callers with the same arguments wait for a single computation instead of
+    computing the value each. Coroutine functions are supported, the awaited result is cached.
+    When the coroutine computing the value is cancelled, one of the waiting coroutines
+    computes it instead. Recursive calls with the same arguments raise ``RuntimeError``.
+
+    The decorated function has ``cache``, ``cache_info()`` and ``cache_clear()`` attributes.
+    Arguments must be hashable. When decorating methods, ``self`` is part of the key.
+
+    >>> @memoize(maxsize=100, ttl=60)
+    ... def square(x):
+    ...     print(f'computing {x}')
+    ...     return x * x
+    >>> square(3)
+    computing 3
+    9
+    >>> square(3)
+    9
+    >>> square.cache_info().hits
+    1
+
+    Memoized functions can be registered as multimethods, and multimethods can be memoized:
+
+    >>> @multimethod(int)
+    ... @memoize
+    ... def describe(x):
+    ...     return f'int {x}'
+    >>> describe(1)
+    'int 1'
+    """
+    if func is None:
+        return partial(memoize, maxsize=maxsize, maxbytes=maxbytes, ttl=ttl, policy=policy,
+                       sizeof=sizeof, typed=typed, time_func=time_func)
+    cache = MemoCache(maxsize, maxbytes, ttl, policy, sizeof, time_func)
+    flights = {}
+    flights_lock = threading.Lock()
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs, typed)
+            loop = asyncio.get_running_loop()
+            task = asyncio.current_task()
+            while True:
+                value = cache.get(key, MISSING)
+                if value is not MISSING:
+                    return value
+                with flights_lock:
+                    flight = flights.get(key)
+                    leader = flight is None or flight[0].get_loop() is not loop
+                    if leader:
+                        flight = flights[key] = (loop.create_future(), task)
+                future, owner = flight
+                if leader:
+                    break
+                if owner is task:
+                    raise _recursive_call(func)
+                value = await asyncio.shield(future)
+                if value is not _ABANDONED:
+                    return value
+            try:
+                value = await func(*args, **kwargs)
+                cache.set(key, value)
+                future.set_result(value)
+                return value
+            except asyncio.CancelledError:
+                future.set_result(_ABANDONED)  # let a waiting caller take over
+                raise
+            except BaseException as error:
+                future.set_exception(error)
+                future.exception()     # mark retrieved when there are no waiters
+                raise
+            finally:
+                with flights_lock:
+                    if flights.get(key) is flight:
+                        del flights[key]
+    else:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = _make_key(args, kwargs, typed)
+            value = cache.get(key, MISSING)
+            if value is not MISSING:
+                return value
+            with flights_lock:
+                flight = flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = flights[key] = _Flight()
+            if not leader:
+                if flight.owner == threading.get_ident():
+                    raise _recursive_call(func)
+                flight.event.wait()
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            try:
+                flight.result = func(*args, **kwargs)
+                cache.set(key, flight.result)
+                return flight.result
+            except BaseException as error:
+                flight.error = error
+                raise
+            finally:
+                with flights_lock:
+                    del flights[key]
+                flight.event.set()
+
+    wrapper.cache = cache
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
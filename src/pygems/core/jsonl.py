@@ -0,0 +1,269 @@
+"""Stream records from newline-delimited JSON (JSON lines) files.
+
+Files given by path are memory-mapped and split into lines without reading them
+into memory. File objects are read in chunks. Each line is parsed into a
+:class:`~pygems.core.namespace.Namespace`, or wrapped in a :class:`NamespaceView`
+which parses it on first attribute access.
+
+:func:`read_jsonl_parallel` splits a file on line boundaries into ranges which
+are parsed by worker processes, keeping a bounded number of ranges in flight.
+"""
+import functools
+import json
+import mmap
+import os
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from pygems.core.namespace import Namespace
+from pygems.core.parallel import PROCESS, parallel_map
+from pygems.core.shortcuts import drop_fields
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_RANGE_SIZE = 32 * 1024 * 1024
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+
+class _Loader:
+    """Parse a line into a projected dictionary. Picklable, so it's sent to worker processes."""
+
+    def __init__(self, fields: Optional[Iterable[str]], drop, error_handler, position_name: str = 'line',
+                 namespace_class: Callable = Namespace):
+        self.fields = None if fields is None else tuple(fields)
+        self.namespace_class = namespace_class
+        self.drop = drop
+        self.error_handler = error_handler
+        self.position_name = position_name
+
+    def parse(self, line: bytes, position: Any = None) -> dict:
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f'Invalid JSON on {self.position_name} {position}: {error}') from error
+        if not isinstance(record, dict):
+            raise ValueError(f'Expecting JSON object on {self.position_name} {position}, '
+                             f'got {type(record).__name__}')
+        if self.fields is not None:
+            record = {key: record[key] for key in self.fields if key in record}
+        if self.drop is not None:
+            drop_fields(record, self.drop, self.error_handler)
+        return record
+
+    def load(self, line: bytes, position: Any) -> Optional[Namespace]:
+        """Parse a line into a Namespace. Returns None when the error handler skips the line."""
+        if self.error_handler is None:
+            return self.namespace_class(self.parse(line, position))
+        try:
+            return self.namespace_class(self.parse(line, position))
+        except ValueError as error:
+            self.error_handler(error)
+            return None
+
+
+class NamespaceView:
+    """Namespace parsed from a JSON line on first attribute access
+
+    Holding views of skipped or filtered records costs only the raw line. Invalid
+    lines raise ``ValueError`` when the view is first accessed.
+
+    >>> view = NamespaceView(b'{"name": "John", "age": 32}')
+    >>> view.raw
+    b'{"name": "John", "age": 32}'
+    >>> view.name
+    'John'
+    >>> view.asdict(sorted_keys=True)
+    {'age': 32, 'name': 'John'}
+    """
+    __slots__ = ('_raw', '_position', '_loader', '_namespace')
+
+    def __init__(self, raw: bytes, position: Any = None, loader: Optional[_Loader] = None):
+        self._raw = raw
+        self._position = position
+        self._loader = loader or _Loader(None, None, None)
+        self._namespace = None
+
+    @property
+    def raw(self) -> bytes:
+        """The JSON line"""
+        return self._raw
+
+    @property
+    def namespace(self) -> Namespace:
+        """The parsed :class:`~pygems.core.namespace.Namespace`"""
+        namespace = self._namespace
+        if namespace is None:
+            namespace = self._namespace = self._loader.namespace_class(self._loader.parse(self._raw, self._position))
+        return namespace
+
+    def __getattr__(self, name: str):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.namespace, name)
+
+    def asdict(self, sorted_keys=False) -> dict:
+        return self.namespace.asdict(sorted_keys)
+
+    def __repr__(self):
+        state = 'parsed' if self._namespace is not None else 'not parsed'
+        return f'<NamespaceView {self._raw[:40]!r} ({state})>'
+
+
+def _mapped_lines(mapped, start: int, end: int) -> Iterator[Tuple[int, bytes]]:
+    find = mapped.find
+    while start < end:
+        stop = find(b'\n', start, end)
+        if stop < 0:
+            stop = end
+        yield start, mapped[start:stop]
+        start = stop + 1
+
+
+def _file_lines(path: Union[str, os.PathLike], start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from _mapped_lines(mapped, start, end)
+
+
+def _chunked_lines(file: BinaryIO, chunk_size: int) -> Iterator[Tuple[int, bytes]]:
+    offset = 0
+    rest = b''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            yield offset, line
+            offset += len(line) + 1
+    if rest:
+        yield offset, rest
+
+
+def _iter_lines(source: Source, chunk_size: int, use_mmap: bool) -> Iterator[Tuple[int, bytes]]:
+    if hasattr(source, 'read'):
+        return _chunked_lines(source, chunk_size)
+    if use_mmap:
+        return _file_lines(source)
+    return _open_chunked_lines(source, chunk_size)
+
+
+def _open_chunked_lines(path, chunk_size: int) -> Iterator[Tuple[int, bytes]]:
+    with open(path, 'rb') as file:
+        yield from _chunked_lines(file, chunk_size)
+
+
+def read_jsonl(source: Source, fields: Optional[Iterable[str]] = None, drop: Union[str, Iterable[str], None] = None,
+               error_handler: Optional[Callable] = None, lazy: bool = False, use_mmap: bool = True,
+               chunk_size: int = DEFAULT_CHUNK_SIZE, namespace_class: Callable = Namespace
+               ) -> Iterator[Union[Namespace, NamespaceView]]:
+    """Read JSON lines into Namespace objects one line at a time
+
+    Arguments:
+        source: Path of the file, or binary file object read in chunks.
+        fields (Iterable[str]): Keep only these keys. Missing keys are left out.
+        drop (str or Iterable[str]): Keys removed with :func:`~pygems.core.shortcuts.drop_fields`.
+        error_handler (Callable): Called with ``ValueError`` for invalid lines, which
+            are then skipped, and passed to :func:`~pygems.core.shortcuts.drop_fields`
+            for missing keys. An :class:`~pygems.core.shortcuts.ErrorPolicy` counts or
+            collects both. Default: raise the errors
+        lazy (bool): Yield :class:`NamespaceView` objects parsed on first access.
+        use_mmap (bool): Memory-map files given by path. Default: True
+        chunk_size (int): Bytes read at once from file objects. Default: 1MiB
+        namespace_class (Callable): Class of the records, e.g.
+            :class:`~pygems.core.namespace.ShapedNamespace` which shares the keys
+            between records. Default: :class:`~pygems.core.namespace.Namespace`
+
+    Blank lines are skipped.
+
+    >>> import io
+    >>> source = io.BytesIO(b'{"name": "John", "age": 32, "city": "Sofia"}\\n\\n{"name": "Jane", "age": 23}\\n')
+    >>> [record.asdict() for record in read_jsonl(source, fields=['name', 'age'], drop='age')]
+    [{'name': 'John'}, {'name': 'Jane'}]
+    """
+    loader = _Loader(fields, drop, error_handler, namespace_class=namespace_class)
+    number = 0
+    for _, line in _iter_lines(source, chunk_size, use_mmap):
+        number += 1
+        if not line or line.isspace():
+            continue
+        if lazy:
+            yield NamespaceView(line, number, loader)
+            continue
+        record = loader.load(line, number)
+        if record is not None:
+            yield record
+
+
+def split_lines(path: Union[str, os.PathLike], range_size: int = DEFAULT_RANGE_SIZE) -> Iterator[Tuple[int, int]]:
+    """Split a file into ``(start, end)`` byte ranges of about ``range_size`` bytes ending at line boundaries"""
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        start = 0
+        while start < size:
+            end = start + range_size
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            else:
+                end = size
+            yield start, end
+            start = end
+
+
+def _read_range(path: Union[str, os.PathLike], loader: _Loader, func: Optional[Callable],
+                file_range: Tuple[int, int]) -> list:
+    results = []
+    for offset, line in _file_lines(path, *file_range):
+        if not line or line.isspace():
+            continue
+        record = loader.load(line, offset)
+        if record is None:
+            continue
+        results.append(record if func is None else func(record))
+    return results
+
+
+def read_jsonl_parallel(path: Union[str, os.PathLike], func: Optional[Callable[[Namespace], Any]] = None,
+                        fields: Optional[Iterable[str]] = None, drop: Union[str, Iterable[str], None] = None,
+                        error_handler: Optional[Callable] = None, max_workers: Optional[int] = None,
+                        range_size: int = DEFAULT_RANGE_SIZE, max_inflight: Optional[int] = None,
+                        ordered: bool = True, namespace_class: Callable = Namespace) -> Iterator:
+    """Parse a JSON lines file in worker processes
+
+    The file is split by :func:`split_lines` into ranges which are memory-mapped
+    and parsed by :func:`~pygems.core.parallel.parallel_map` with the process backend.
+    Memory use is bounded by ``max_inflight`` ranges, whatever the size of the file.
+
+    Arguments:
+        path: Path of the file.
+        func (Callable): Applied to each record in the worker. Its results are yielded
+            instead of the records. Returning small results, e.g. extracted values,
+            avoids sending the whole records back to the main process. Must be picklable.
+        fields, drop: Projection, see :func:`read_jsonl`.
+        error_handler (Callable): See :func:`read_jsonl`. The handler is copied to the
+            workers, so errors counted by an :class:`~pygems.core.shortcuts.ErrorPolicy`
+            are not visible in the main process. Invalid lines are reported with
+            their byte offset.
+        max_workers (int): Number of worker processes. Default: number of CPUs
+        range_size (int): Approximate size of the ranges in bytes. Default: 32MiB
+        max_inflight (int): Maximum number of ranges parsed or waiting to be yielded.
+            Default: twice the number of workers
+        ordered (bool): Yield in file order. Otherwise ranges are yielded as they complete.
+        namespace_class (Callable): Class of the records, see :func:`read_jsonl`.
+
+    Example::
+
+        ages = read_jsonl_parallel('users.jsonl', operator.attrgetter('age'), fields=['age'])
+        print(sum(ages))
+    """
+    loader = _Loader(fields, drop, error_handler, 'byte offset', namespace_class)
+    worker = functools.partial(_read_range, path, loader, func)
+    for results in parallel_map(worker, split_lines(path, range_size), backend=PROCESS, max_workers=max_workers,
+                                chunksize=1, ordered=ordered, max_inflight=max_inflight):
+        yield from results
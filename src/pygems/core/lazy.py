@@ -0,0 +1,211 @@
+"""Defer imports until the imported names are used.
+
+Two styles are supported:
+
+* :func:`lazy_import` returns a module proxy which imports the module on first
+  attribute access. Useful for heavy dependencies of plugins.
+* :func:`lazy_getattr` builds module level ``__getattr__`` and ``__dir__``
+  functions (:pep:`562`) which import submodules or attributes of a package on
+  first access.
+
+Every lazy import is registered, so :func:`lazy_report` shows which ones were
+actually triggered in a run and how long they took.
+
+This module imports only modules which are loaded at interpreter startup, so
+packages can use it in their ``__init__`` without paying for other imports. For
+the same reason annotations name the :mod:`typing` types as strings.
+"""
+import _thread
+import sys
+
+_ModuleType = type(sys)
+
+
+class LazyImportRecord:
+    """State of a registered lazy import
+
+    Fields are the imported ``target`` module or ``module:attribute``, the ``importer``
+    module which registered the lazy import, ``triggered`` flag, the ``trigger``
+    attribute whose access performed the import and the import time in ``seconds``.
+    Records are not modified, triggering an import registers a new record.
+    """
+    __slots__ = ('target', 'importer', 'triggered', 'trigger', 'seconds')
+
+    def __init__(self, target: str, importer: 'Optional[str]', triggered: bool = False,
+                 trigger: 'Optional[str]' = None, seconds: 'Optional[float]' = None):
+        self.target = target
+        self.importer = importer
+        self.triggered = triggered
+        self.trigger = trigger
+        self.seconds = seconds
+
+    def __repr__(self):
+        return (f'LazyImportRecord(target={self.target!r}, importer={self.importer!r}, triggered={self.triggered!r}, '
+                f'trigger={self.trigger!r}, seconds={self.seconds!r})')
+
+
+_records = {}
+_lock = _thread.allocate_lock()
+
+
+def _register(target: str, importer: 'Optional[str]'):
+    with _lock:
+        if target not in _records:
+            _records[target] = LazyImportRecord(target, importer)
+
+
+def _import(target: str, trigger: str):
+    """Import ``module`` or ``module:attribute`` and record it as triggered"""
+    import importlib
+    import time
+    module_name, _, attribute = target.partition(':')
+    started_at = time.perf_counter()
+    value = importlib.import_module(module_name)
+    if attribute:
+        value = getattr(value, attribute)
+    seconds = time.perf_counter() - started_at
+    with _lock:
+        record = _records.get(target)
+        if record is not None and not record.triggered:
+            _records[target] = LazyImportRecord(target, record.importer, True, trigger, seconds)
+    return value
+
+
+class _Forwarded:
+    """Descriptor forwarding a module attribute set by ``ModuleType`` to the real module
+
+    ``ModuleType`` stores ``__doc__``, ``__spec__``, ``__loader__`` and ``__package__``
+    in the proxy itself, so ``__getattr__`` is not called for them.
+    """
+
+    def __init__(self, name: str, doc: 'Optional[str]' = None):
+        self.name = name
+        self.doc = doc
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self.doc
+        return getattr(instance._load(self.name), self.name)
+
+    def __set__(self, instance, value):
+        setattr(instance._load(self.name), self.name, value)
+
+
+class LazyModule(_ModuleType):
+    """Module proxy which imports the real module on first attribute access
+
+    Attribute access is forwarded to the real module, including ``__doc__`` and
+    ``__spec__``. In hot loops bind the used attributes to local names instead of
+    accessing them through the proxy.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        object.__setattr__(self, '_lazy_module', None)
+
+    def _load(self, trigger: str) -> _ModuleType:
+        module = self._lazy_module
+        if module is None:
+            module = _import(self.__name__, trigger)
+            object.__setattr__(self, '_lazy_module', module)
+        return module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(name), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(self._load(name), name, value)
+
+    def __dir__(self):
+        return dir(self._load('__dir__'))
+
+    def __repr__(self):
+        state = 'loaded' if self._lazy_module is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+LazyModule.__doc__ = _Forwarded('__doc__', LazyModule.__doc__)
+for _name in ('__spec__', '__loader__', '__package__'):
+    setattr(LazyModule, _name, _Forwarded(_name))
+del _name
+
+
+def lazy_import(name: str) -> _ModuleType:
+    """Return a proxy which imports module ``name`` on first attribute access
+
+    Modules which are already imported are returned as they are.
+
+    >>> colorsys = lazy_import('colorsys')
+    >>> colorsys
+    <lazy module 'colorsys' (not loaded)>
+    >>> colorsys.rgb_to_hsv(1, 0, 0)
+    (0.0, 1.0, 1)
+    >>> colorsys
+    <lazy module 'colorsys' (loaded)>
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    _register(name, sys._getframe(1).f_globals.get('__name__'))
+    return LazyModule(name)
+
+
+def lazy_getattr(package: str, submodules: 'Iterable[str]' = (),
+                 attributes: 'Optional[Dict[str, str]]' = None) -> 'Tuple[Callable, Callable]':
+    """Build module level ``__getattr__`` and ``__dir__`` which import names on first access
+
+    Arguments:
+        package (str): Name of the module defining the functions, usually ``__name__``.
+        submodules (Iterable[str]): Submodules of ``package`` to import on access.
+        attributes (Dict[str, str]): Attribute names mapped to ``'module:attribute'``
+            or ``'module'`` to import on access.
+
+    Imported values are stored in the module, so the next access doesn't call
+    ``__getattr__``.
+
+    Example::
+
+        # mypackage/__init__.py
+        from pygems.core.lazy import lazy_getattr
+
+        __getattr__, __dir__ = lazy_getattr(__name__, ['io', 'plotting'], {'Frame': 'pandas:DataFrame'})
+    """
+    targets = {name: f'{package}.{name}' for name in submodules}
+    targets.update(attributes or {})
+    for target in targets.values():
+        _register(target, package)
+
+    def __getattr__(name: str):
+        target = targets.get(name)
+        if target is None:
+            raise AttributeError(f"module '{package}' has no attribute '{name}'")
+        value = _import(target, name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> 'List[str]':
+        return sorted(set(vars(sys.modules[package])) | set(targets))
+
+    return __getattr__, __dir__
+
+
+def lazy_report(triggered: 'Optional[bool]' = None) -> 'List[LazyImportRecord]':
+    """Registered lazy imports in registration order
+
+    Pass ``triggered=True`` to get only the performed imports or ``False`` to get
+    only the imports which were avoided.
+    """
+    with _lock:
+        return [record for record in _records.values() if triggered is None or record.triggered == triggered]
+
+
+def format_lazy_report() -> str:
+    """Text report of the registered lazy imports"""
+    lines = []
+    for record in lazy_report():
+        if record.triggered:
+            status = f'imported on .{record.trigger} in {record.seconds * 1000:.2f}ms'
+        else:
+            status = 'not imported'
+        lines.append(f'{record.target:<40} {status} (from {record.importer})')
+    return '\n'.join(lines)
@@ -0,0 +1,132 @@
+"""Parallel map over thread or process pools."""
+import collections
+import concurrent.futures
+import itertools
+import os
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from pygems.core.timer import Timer
+
+THREAD = 'thread'
+PROCESS = 'process'
+
+_EXECUTORS = {
+    THREAD: concurrent.futures.ThreadPoolExecutor,
+    PROCESS: concurrent.futures.ProcessPoolExecutor,
+}
+
+
+def _run_chunk(func: Callable, chunk: list, index: int):
+    with Timer(name=f'chunk-{index}') as timer:
+        results = [func(item) for item in chunk]
+    return timer, results
+
+
+def _chunks(iterable: Iterable, chunksize: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def auto_chunksize(length: Optional[int], workers: int, backend: str = PROCESS) -> int:
+    """Choose chunk size which amortizes the per-task overhead
+
+    Process pools get about four chunks per worker, which keeps the workers busy
+    while sending few large messages. Thread pools don't pay for serialization, so
+    they get single items unless the length is known.
+
+    >>> auto_chunksize(10000, 4)
+    625
+    >>> auto_chunksize(None, 4)
+    64
+    >>> auto_chunksize(None, 4, THREAD)
+    1
+    """
+    if length is None:
+        return 64 if backend == PROCESS else 1
+    return max(1, -(-length // (workers * 4)))
+
+
+def parallel_map(func: Callable[[Any], Any], iterable: Iterable, backend: str = THREAD,
+                 max_workers: Optional[int] = None, chunksize: Optional[int] = None, ordered: bool = True,
+                 max_inflight: Optional[int] = None, stop_func: Optional[Callable] = None,
+                 executor: Optional[concurrent.futures.Executor] = None) -> Iterator:
+    """Apply ``func`` to each item of ``iterable`` in a thread or process pool
+
+    Arguments:
+        func (Callable): Function of one argument. Must be picklable for the process backend.
+        iterable (Iterable): Items to process. Consumed lazily, so it could be a generator.
+        backend (str): ``'thread'`` or ``'process'``. Default: 'thread'
+        max_workers (int): Number of workers. Default: number of CPUs
+        chunksize (int): Number of items sent to a worker at once. Default: chosen
+            by :func:`auto_chunksize`
+        ordered (bool): Yield results in the order of the items. Otherwise results
+            are yielded chunk by chunk as they complete. Default: True
+        max_inflight (int): Maximum number of chunks submitted and not yet yielded.
+            Bounds memory use when the consumer is slower than the workers.
+            Default: twice the number of workers
+        stop_func (Callable): Called for each completed chunk as ``stop_func(timer, message)``
+            with the stopped :class:`~pygems.core.timer.Timer` which measured the chunk
+            in the worker and a message like ``'100 items'``. The timer is named after
+            the chunk, e.g. ``'chunk-0'``. Compatible with
+            :class:`~pygems.core.timer.StringMessageCallback`.
+        executor (Executor): Existing executor to use instead of creating one. It is
+            not shut down at the end.
+
+    Returns generator of results.
+
+    >>> list(parallel_map(abs, [-1, 2, -3], chunksize=2))
+    [1, 2, 3]
+
+    Report timing of each chunk:
+
+    >>> from pygems.core.timer import StringMessageCallback
+    >>> stop_func = StringMessageCallback('{timer.name}: {args_str}')
+    >>> list(parallel_map(abs, [-1, 2, -3], chunksize=2, stop_func=stop_func))
+    chunk-0: 2 items
+    chunk-1: 1 items
+    [1, 2, 3]
+    """
+    if backend not in _EXECUTORS:
+        raise ValueError(f"Unknown parallel backend '{backend}'")
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = auto_chunksize(len(iterable) if hasattr(iterable, '__len__') else None, max_workers, backend)
+    max_inflight = max_inflight or 2 * max_workers
+    if executor is not None:
+        return _map(executor, func, iterable, chunksize, ordered, max_inflight, stop_func)
+    return _map_with_executor(_EXECUTORS[backend], max_workers, func, iterable, chunksize, ordered,
+                              max_inflight, stop_func)
+
+
+def _map_with_executor(executor_class, max_workers, *args):
+    with executor_class(max_workers) as executor:
+        yield from _map(executor, *args)
+
+
+def _map(executor, func, iterable, chunksize, ordered, max_inflight, stop_func):
+    chunks = enumerate(_chunks(iterable, chunksize))
+    pending = collections.deque() if ordered else set()
+    submit = pending.append if ordered else pending.add
+    try:
+        for index, chunk in itertools.islice(chunks, max_inflight):
+            submit(executor.submit(_run_chunk, func, chunk, index))
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                pending.difference_update(done)
+            for future in done:
+                timer, results = future.result()
+                if stop_func:
+                    stop_func(timer, f'{len(results)} items')
+                for index, chunk in itertools.islice(chunks, 1):
+                    submit(executor.submit(_run_chunk, func, chunk, index))
+                yield from results
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,7 +1,138 @@
 """Tools for implementing plugin architecture in Python applicaitons."""
 
+import bisect
+import collections
+import concurrent.futures
+import threading
 import typing
 
+from pygems.core.timer import Timer
+
+DEFAULT_HISTOGRAM_BOUNDS = (0.0001, 0.001, 0.01, 0.1, 1.0)
+"""Upper bounds in seconds of the latency histogram buckets, an overflow bucket follows"""
+
+
+def listener_name(listener) -> str:
+    """Readable name of a plugin used in reports
+
+    >>> listener_name(print)
+    'print'
+    >>> listener_name(BaseEventListener())
+    'BaseEventListener'
+    """
+    name = getattr(listener, '__qualname__', None)
+    if name is None:
+        name = type(listener).__qualname__
+    return name
+
+
+class ListenerSnapshot(typing.NamedTuple):
+    """Latency statistics of one plugin returned by :meth:`PluginCollection.listener_stats`
+
+    Percentiles, mean and histogram describe the rolling window of recent calls,
+    the counters describe all calls since the stats were reset.
+    """
+    name: str
+    calls: int
+    errors: int
+    over_budget: int
+    mean: float
+    p50: float
+    p99: float
+    max: float
+    histogram: typing.Tuple[typing.Tuple[float, int], ...]
+    slow: bool
+    quarantined: bool
+
+
+class ListenerStats:
+    """Rolling latency statistics of one plugin, used as the ``stop_func`` of a :class:`Timer`
+
+    >>> stats = ListenerStats('load', window=3, budget=0.5)
+    >>> for elapsed in [0.2, 0.3, 0.9, 1.0]:
+    ...     stats.add(elapsed)
+    >>> snapshot = stats.snapshot()
+    >>> snapshot.calls, snapshot.over_budget, snapshot.p50, snapshot.slow
+    (4, 2, 0.9, True)
+    >>> snapshot.histogram[-2:]
+    ((1.0, 3), (inf, 0))
+    """
+    name: str
+    calls: int
+    errors: int
+    over_budget: int
+    max: float
+    quarantined: bool
+
+    def __init__(self, name: str, window: int = 1024, budget: typing.Optional[float] = None,
+                 bounds: typing.Sequence[float] = DEFAULT_HISTOGRAM_BOUNDS):
+        self.name = name
+        self.budget = budget
+        self._bounds = tuple(bounds) + (float('inf'),)
+        self._recent = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.quarantined = False
+        self.reset()
+
+    def reset(self):
+        """Forget all measured calls"""
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.over_budget = 0
+            self.max = 0.0
+            self._recent.clear()
+            self._recent_total = 0.0
+            self._buckets = [0] * len(self._bounds)
+
+    def __call__(self, timer: Timer, *args):
+        self.add(timer.elapsed)
+
+    def add(self, elapsed: float):
+        """Add latency of one call in seconds"""
+        with self._lock:
+            recent = self._recent
+            if len(recent) == recent.maxlen:
+                evicted = recent[0]
+                self._recent_total -= evicted
+                self._buckets[bisect.bisect_left(self._bounds, evicted)] -= 1
+            recent.append(elapsed)
+            self._recent_total += elapsed
+            self._buckets[bisect.bisect_left(self._bounds, elapsed)] += 1
+            self.calls += 1
+            if elapsed > self.max:
+                self.max = elapsed
+            if self.budget is not None and elapsed > self.budget:
+                self.over_budget += 1
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    @property
+    def slow(self) -> bool:
+        """True when the mean latency of the rolling window exceeds the budget"""
+        recent = self._recent
+        return self.budget is not None and bool(recent) and self._recent_total / len(recent) > self.budget
+
+    def snapshot(self) -> ListenerSnapshot:
+        with self._lock:
+            recent = sorted(self._recent)
+            histogram = tuple(zip(self._bounds, self._buckets))
+            mean = self._recent_total / len(recent) if recent else 0.0
+            return ListenerSnapshot(
+                self.name, self.calls, self.errors, self.over_budget, mean,
+                _percentile(recent, 50), _percentile(recent, 99), self.max, histogram,
+                self.slow, self.quarantined)
+
+
+def _percentile(ordered: list, percent: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
 class BaseEventListener:
     _callback_name_template:str = 'on_{event}'
 
@@ -85,6 +216,7 @@ class PluginCollection:
     """
     _plugins: list
     _plugin_class: typing.Any
+    _instrumentation: typing.Optional['_Instrumentation']
 
     def __init__(self, plugin_class=None):
         """Create and initialize PluginCollection object
@@ -97,6 +229,23 @@ class PluginCollection:
         """
         self._plugins = []
         self._plugin_class = plugin_class
+        self._instrumentation = None
+
+    def __iter__(self):
+        """Iterate over the plugins in notification order
+
+        >>> list(PluginCollection().append(print, dir))
+        [<built-in function print>, <built-in function dir>]
+        """
+        return iter(self._plugins)
+
+    def __len__(self):
+        """Number of plugins in the collection
+
+        >>> len(PluginCollection().append(print, dir))
+        2
+        """
+        return len(self._plugins)
 
     def _is_plugin_ok_to_add(self, plugin):
         assert callable(plugin), 'plugin argument should be callable'
@@ -192,6 +341,8 @@ class PluginCollection:
         """
         for plugin in plugins:
             self._plugins.remove(plugin)
+            if self._instrumentation is not None:
+                self._instrumentation.forget(plugin)
         return self
 
     def notify(self, *args, **kwargs):
@@ -208,6 +359,135 @@ class PluginCollection:
             plugin(*args, **kwargs)
         return self
 
+    def instrument(self, budget: typing.Optional[float] = None, window: int = 1024, quarantine: bool = False,
+                   min_calls: int = 16, executor: typing.Optional[concurrent.futures.Executor] = None,
+                   time_func=None, bounds: typing.Sequence[float] = DEFAULT_HISTOGRAM_BOUNDS):
+        """Measure latency of each plugin in :meth:`notify`
+
+        Arguments:
+            budget (float): Latency budget in seconds. Plugins whose mean latency over
+                the rolling window exceeds it are flagged as slow. Default: no budget
+            window (int): Number of recent calls kept for each plugin. Default: 1024
+            quarantine (bool): Run slow plugins in a background thread, so they don't
+                delay the other plugins and the caller of :meth:`notify`. Default: False
+            min_calls (int): Number of measured calls before a plugin can be quarantined.
+                Default: 16
+            executor (Executor): Executor running quarantined plugins. Default: a single
+                thread owned by the collection, which keeps the order of notifications
+            time_func (Callable): Clock passed to the :class:`Timer`. Default: :func:`timeit.default_timer`
+            bounds (Sequence[float]): Upper bounds of the histogram buckets in seconds.
+
+        Instrumentation replaces :meth:`notify` of this collection, so collections
+        which are not instrumented pay nothing. Quarantined plugins receive the
+        notifications later and their exceptions are counted instead of raised.
+
+        >>> plugins = PluginCollection().append(print).instrument(budget=0.5)
+        >>> _ = plugins.notify('load')
+        load
+        >>> [(stats.name, stats.calls, stats.slow) for stats in plugins.listener_stats()]
+        [('print', 1, False)]
+        """
+        self.uninstrument()
+        self._instrumentation = _Instrumentation(budget, window, quarantine, min_calls, executor,
+                                                 time_func, bounds)
+        self.notify = self._notify_instrumented
+        return self
+
+    def uninstrument(self):
+        """Stop measuring latency and wait for quarantined notifications"""
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            self.__dict__.pop('notify', None)
+            self._instrumentation = None
+            instrumentation.close()
+        return self
+
+    def _notify_instrumented(self, *args, **kwargs):
+        instrumentation = self._instrumentation
+        for plugin in self._plugins:
+            stats = instrumentation.stats_for(plugin)
+            if stats.quarantined:
+                instrumentation.submit(plugin, stats, args, kwargs)
+                continue
+            try:
+                with Timer(time_func=instrumentation.time_func, stop_func=stats):
+                    plugin(*args, **kwargs)
+            except Exception:
+                stats.add_error()
+                raise
+            if instrumentation.quarantine and stats.calls >= instrumentation.min_calls and stats.slow:
+                stats.quarantined = True
+        return self
+
+    def listener_stats(self) -> typing.List[ListenerSnapshot]:
+        """Latency statistics of the plugins in notification order
+
+        Returns empty list when the collection is not instrumented.
+        """
+        instrumentation = self._instrumentation
+        if instrumentation is None:
+            return []
+        return [instrumentation.stats_for(plugin).snapshot() for plugin in self._plugins]
+
+    def reset_stats(self, release: bool = False):
+        """Reset latency statistics. Quarantined plugins are moved back when ``release`` is true."""
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            for stats in instrumentation.stats.values():
+                stats.reset()
+                if release:
+                    stats.quarantined = False
+        return self
+
+
+class _Instrumentation:
+    def __init__(self, budget, window, quarantine, min_calls, executor, time_func, bounds):
+        self.budget = budget
+        self.window = window
+        self.quarantine = quarantine
+        self.min_calls = min_calls
+        self.time_func = time_func
+        self.bounds = bounds
+        self.stats = {}  # by id, plugins may be unhashable
+        self._plugins = {}  # keeps the plugins alive, so their ids are not reused
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._lock = threading.Lock()
+
+    def stats_for(self, plugin) -> ListenerStats:
+        stats = self.stats.get(id(plugin))
+        if stats is None:
+            with self._lock:
+                stats = self.stats.get(id(plugin))
+                if stats is None:
+                    stats = self.stats[id(plugin)] = ListenerStats(listener_name(plugin), self.window, self.budget,
+                                                                   self.bounds)
+                    self._plugins[id(plugin)] = plugin
+        return stats
+
+    def forget(self, plugin):
+        with self._lock:
+            self.stats.pop(id(plugin), None)
+            self._plugins.pop(id(plugin), None)
+
+    def submit(self, plugin, stats: ListenerStats, args: tuple, kwargs: dict):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='quarantine')
+        self._executor.submit(self._run, plugin, stats, args, kwargs)
+
+    def _run(self, plugin, stats: ListenerStats, args: tuple, kwargs: dict):
+        try:
+            with Timer(time_func=self.time_func, stop_func=stats):
+                plugin(*args, **kwargs)
+        except Exception:
+            stats.add_error()
+
+    def close(self):
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True)
+
 if __name__ == "__main__": # pragma: no cover
     import doctest
     doctest.testmod()
@@ -0,0 +1,168 @@
+"""Dispatch plugin notifications to worker processes through shared memory."""
+import concurrent.futures
+import threading
+from multiprocessing import shared_memory
+from typing import Any, List, Optional
+
+from pygems.core.plugin import PluginCollection
+
+DEFAULT_MIN_SHARED_SIZE = 64 * 1024
+
+
+class SharedBuffer:
+    """Reference to a buffer placed in shared memory, sent to workers instead of the data"""
+    __slots__ = ('name', 'nbytes', 'format', 'shape')
+
+    def __init__(self, name: str, nbytes: int, format: str, shape: tuple):
+        self.name = name
+        self.nbytes = nbytes
+        self.format = format
+        self.shape = shape
+
+    def __getstate__(self):
+        return self.name, self.nbytes, self.format, self.shape
+
+    def __setstate__(self, state):
+        self.name, self.nbytes, self.format, self.shape = state
+
+    def __repr__(self):
+        return f'<SharedBuffer {self.name} {self.nbytes} bytes>'
+
+
+class _Segment:
+    """Shared memory segment released when all listeners are done"""
+
+    def __init__(self, data: memoryview):
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+        self.memory.buf[:data.nbytes] = data.cast('B')
+        self.buffer = SharedBuffer(self.memory.name, data.nbytes, data.format, data.shape)
+        self.references = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int):
+        with self._lock:
+            self.references += count
+
+    def release(self, *args):
+        with self._lock:
+            self.references -= 1
+            if self.references:
+                return
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _attach(value: Any, attached: list):
+    if not isinstance(value, SharedBuffer):
+        return value
+    memory = shared_memory.SharedMemory(name=value.name)
+    view = memory.buf[:value.nbytes].toreadonly()
+    if value.format != 'B' or len(value.shape) != 1:
+        view = view.cast(value.format, value.shape)
+    attached.append((memory, view))
+    return view
+
+
+def _invoke(listener, args: tuple, kwargs: dict):
+    attached = []
+    try:
+        args = tuple(_attach(arg, attached) for arg in args)
+        kwargs = {key: _attach(value, attached) for key, value in kwargs.items()}
+        return listener(*args, **kwargs)
+    finally:
+        del args, kwargs
+        for memory, view in attached:
+            try:
+                view.release()
+                memory.close()
+            except BufferError:  # pragma: no cover - listener kept a reference, closed when collected
+                pass
+
+
+class SharedMemoryDispatcher:
+    """Notify plugins in worker processes, passing large buffers through shared memory
+
+    Each notification runs every plugin of the collection as a separate task in a
+    process pool. Positional and keyword arguments supporting the buffer protocol,
+    e.g. ``bytes``, ``bytearray``, ``array.array`` or NumPy arrays, which are
+    C-contiguous and at least ``min_shared_size`` bytes, are copied once into a
+    :class:`~multiprocessing.shared_memory.SharedMemory` segment instead of being
+    pickled for each plugin. Plugins receive read-only :class:`memoryview` objects
+    with the original format and shape. A segment is unlinked when all plugins
+    notified with it have finished.
+
+    Plugins must be picklable, e.g. module level functions or instances of module level
+    classes. They must not keep the memoryviews after they return.
+
+    Arguments:
+        plugins (PluginCollection): Plugins to notify.
+        executor (Executor): Process pool to use. Default: a new
+            :class:`~concurrent.futures.ProcessPoolExecutor` owned by the dispatcher
+        max_workers (int): Number of workers of the owned process pool.
+        min_shared_size (int): Minimum size in bytes of the buffers placed in shared memory.
+            Default: 64KiB
+
+    Example::
+
+        with SharedMemoryDispatcher(plugins) as dispatcher:
+            futures = dispatcher.notify('frame', frame_bytes)
+            concurrent.futures.wait(futures)
+    """
+    plugins: PluginCollection
+    min_shared_size: int
+
+    def __init__(self, plugins: PluginCollection, executor: Optional[concurrent.futures.Executor] = None,
+                 max_workers: Optional[int] = None, min_shared_size: int = DEFAULT_MIN_SHARED_SIZE):
+        self.plugins = plugins
+        self.min_shared_size = min_shared_size
+        self._owns_executor = executor is None
+        self._executor = executor or concurrent.futures.ProcessPoolExecutor(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Wait for running notifications and shut down the owned process pool"""
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def _share(self, value: Any, segments: List[_Segment]) -> Any:
+        try:
+            data = memoryview(value)
+        except TypeError:
+            return value
+        if data.nbytes < self.min_shared_size or not data.c_contiguous:
+            return value
+        segment = _Segment(data)
+        segments.append(segment)
+        return segment.buffer
+
+    def notify(self, *args, **kwargs) -> List[concurrent.futures.Future]:
+        """Submit notification of all plugins. Returns a future for each plugin."""
+        listeners = list(self.plugins)
+        segments = []
+        args = tuple(self._share(arg, segments) for arg in args)
+        kwargs = {key: self._share(value, segments) for key, value in kwargs.items()}
+        for segment in segments:
+            segment.acquire(1)
+        futures = []
+        try:
+            for listener in listeners:
+                for segment in segments:
+                    segment.acquire(1)
+                try:
+                    future = self._executor.submit(_invoke, listener, args, kwargs)
+                except BaseException:
+                    for segment in segments:
+                        segment.release()
+                    raise
+                for segment in segments:
+                    future.add_done_callback(segment.release)
+                futures.append(future)
+        finally:
+            for segment in segments:
+                segment.release()
+        return futures
@@ -1,12 +1,25 @@
 """Various functions"""
 
+import collections
 import functools
-from typing import Any, Union
+from typing import Any, Iterable, Iterator, Union
 
+MISSING = object()
+"""Sentinel for arguments which are not specified. Allows ``None`` to be used as a value."""
+_NOT_FOUND = object()
+
+
+def _normalize_fields(fields:Union[str,Iterable]) -> tuple:
+    return (fields,) if isinstance(fields, str) else tuple(fields)
 
 def drop_fields(representation:dict, fields:Union[str,list], error_handler=None):
     """Remove one or more keys from a dictionary"""
-    fields = (fields,) if type(fields) == str else fields
+    fields = _normalize_fields(fields)
+    if isinstance(error_handler, ErrorPolicy):
+        for field_name in fields:
+            if representation.pop(field_name, MISSING) is MISSING:
+                error_handler.record(KeyError, field_name)
+        return representation
     for field_name in fields:
         try:
             representation.pop(field_name)
@@ -17,18 +30,221 @@ def drop_fields(representation:dict, fields:Union[str,list], error_handler=None)
                 raise
     return representation
 
-def getattr_nested(obj: Any, attr:str, default=None):
-    """Retrieve attribute from nested objects using dot notation"""
-    try:
+DROP_INPLACE = 'inplace'
+DROP_COPY = 'copy'
+DROP_PROJECT = 'project'
+
+def drop_fields_bulk(records:Iterable[dict], fields:Union[str,list], error_handler=None,
+                     mode:str=DROP_INPLACE) -> Iterator[dict]:
+    """Remove one or more keys from each dictionary in a stream of records
+
+    Fields are normalized and de-duplicated once for the whole stream. Records are consumed and
+    produced lazily, so the function can be chained with other generators.
+
+    Supported modes:
+
+    * ``'inplace'`` - remove keys from the records and yield the same objects
+    * ``'copy'`` - yield shallow copies, leaving the input records unchanged
+    * ``'project'`` - build new dictionaries with the kept keys only. Faster than
+      ``'copy'`` when most of the keys are dropped.
+
+    >>> records = [{'name': 'John', 'age': 32}, {'name': 'Jane', 'age': 23}]
+    >>> list(drop_fields_bulk(records, 'age', mode='project'))
+    [{'name': 'John'}, {'name': 'Jane'}]
+    >>> records
+    [{'name': 'John', 'age': 32}, {'name': 'Jane', 'age': 23}]
+
+    Missing fields raise ``KeyError`` unless ``error_handler`` is given:
+
+    >>> list(drop_fields_bulk([{'name': 'John'}], 'age'))
+    Traceback (most recent call last):
+    ...
+    KeyError: 'age'
+    """
+    fields = tuple(dict.fromkeys(_normalize_fields(fields)))
+    if mode == DROP_INPLACE:
+        return _drop_fields_inplace(records, fields, error_handler)
+    if mode == DROP_COPY:
+        return _drop_fields_inplace((dict(record) for record in records), fields, error_handler)
+    if mode == DROP_PROJECT:
+        return _drop_fields_project(records, fields, error_handler)
+    raise ValueError(f"Unknown drop mode '{mode}'")
+
+def _drop_fields_inplace(records, fields, error_handler):
+    for record in records:
+        for field_name in fields:
+            if record.pop(field_name, MISSING) is MISSING:
+                _handle_missing_field(field_name, error_handler)
+        yield record
+
+def _drop_fields_project(records, fields, error_handler):
+    field_set = frozenset(fields)
+    for record in records:
+        projection = {key: value for key, value in record.items() if key not in field_set}
+        if len(projection) + len(field_set) != len(record):
+            for field_name in fields:
+                if field_name not in record:
+                    _handle_missing_field(field_name, error_handler)
+        yield projection
+
+def _handle_missing_field(field_name, error_handler):
+    if isinstance(error_handler, ErrorPolicy):
+        error_handler.record(KeyError, field_name)
+        return
+    error = KeyError(field_name)
+    if error_handler:
+        error_handler(error)
+    else:
+        raise error
+
+def getattr_nested(obj: Any, attr:str, default=MISSING):
+    """Retrieve attribute from nested objects using dot notation
+
+    >>> class Obj: pass
+    >>> user = Obj(); user.address = Obj(); user.address.city = 'Sofia'
+    >>> getattr_nested(user, 'address.city')
+    'Sofia'
+
+    When ``default`` is given, any value including ``None`` is returned for
+    missing attributes. The lookup walks the path without raising and catching
+    exceptions, which keeps the miss path cheap:
+
+    >>> getattr_nested(user, 'address.zip', None) is None
+    True
+    """
+    if default is MISSING:
         return functools.reduce(getattr, attr.split('.'), obj)
-    except AttributeError as error:
-        if default is None:
-            raise error
-        return default
+    for name in attr.split('.'):
+        obj = getattr(obj, name, MISSING)
+        if obj is MISSING:
+            return default
+    return obj
+
+def hasattr_nested(obj: Any, attr:str) -> bool:
+    """Check if nested attribute exists using dot notation, without raising exceptions
+
+    >>> hasattr_nested('john', 'upper.__name__')
+    True
+    >>> hasattr_nested('john', 'address.city')
+    False
+    """
+    return getattr_nested(obj, attr, _NOT_FOUND) is not _NOT_FOUND
+
+def _normalize_errors(errors) -> tuple:
+    errors = (errors,) if isinstance(errors, type) else tuple(errors)
+    for error_class in errors:
+        if not (isinstance(error_class, type) and issubclass(error_class, BaseException)):
+            raise TypeError(f'Expecting exception class, got {error_class!r}')
+    return errors
+
+def get_ignore_errors(errors:Union[type,Iterable[type]]):
+    """Return error handler which ignores error from one or more classes and raises other errors
+
+    ``errors`` could be an exception class or an iterable of exception classes:
 
-def get_ignore_errors(errors:list):
-    """Return error handler which ignores error from one or more classes and raises other errors"""
+    >>> handler = get_ignore_errors([KeyError, IndexError])
+    >>> handler(KeyError('age'))
+    """
+    errors = _normalize_errors(errors)
     def error_handler(error:Exception):
         if not isinstance(error, errors):
             raise error
     return error_handler
+
+
+class ErrorPolicy:
+    """Reusable error handler which ignores, collects, counts or raises errors
+
+    Arguments:
+        errors: Exception class or iterable of exception classes handled by the policy.
+            Validated and normalized to a tuple on creation. Other errors are always raised.
+        action (str): One of ``'ignore'``, ``'count'``, ``'collect'`` or ``'raise'``. Default: ``'count'``
+
+    Policy instances could be used wherever an ``error_handler`` callback is accepted.
+    :func:`drop_fields` and :func:`drop_fields_bulk` recognize policies and report
+    missing keys through :meth:`record`, without constructing exceptions:
+
+    >>> policy = ErrorPolicy(KeyError)
+    >>> records = [{'name': 'John'}, {'name': 'Jane', 'age': 23}, {'name': 'Joe'}]
+    >>> _ = list(drop_fields_bulk(records, 'age', policy))
+    >>> policy.total
+    2
+    >>> policy.summary()
+    '2 KeyError'
+
+    ``'collect'`` keeps the errors in :attr:`errors_seen`:
+
+    >>> policy = ErrorPolicy(KeyError, 'collect')
+    >>> _ = drop_fields({'name': 'John'}, 'age', policy)
+    >>> policy.errors_seen
+    [KeyError('age')]
+
+    Errors not matching the policy classes are raised:
+
+    >>> ErrorPolicy(KeyError)(ValueError('bad value'))
+    Traceback (most recent call last):
+    ...
+    ValueError: bad value
+    """
+    IGNORE = 'ignore'
+    COUNT = 'count'
+    COLLECT = 'collect'
+    RAISE = 'raise'
+    ACTIONS = (IGNORE, COUNT, COLLECT, RAISE)
+
+    errors: tuple
+    """Exception classes handled by the policy"""
+
+    action: str
+    """Action taken for handled errors"""
+
+    counts: collections.Counter
+    """Number of handled errors by exception class"""
+
+    errors_seen: list
+    """Errors collected by the ``'collect'`` action"""
+
+    def __init__(self, errors:Union[type,Iterable[type]]=Exception, action:str=COUNT):
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown error policy action '{action}'")
+        self.errors = _normalize_errors(errors)
+        self.action = action
+        self.counts = collections.Counter()
+        self.errors_seen = []
+
+    def __call__(self, error:BaseException):
+        """Handle an error instance. Compatible with ``error_handler`` callbacks."""
+        if self.action == self.RAISE or not isinstance(error, self.errors):
+            raise error
+        if self.action == self.IGNORE:
+            return
+        self.counts[error.__class__] += 1
+        if self.action == self.COLLECT:
+            self.errors_seen.append(error)
+
+    def record(self, error_class:type, detail:Any=None, count:int=1):
+        """Handle ``count`` errors of ``error_class`` without requiring exception instances.
+
+        An exception is constructed only when it has to be raised or collected.
+        """
+        if self.action == self.IGNORE and issubclass(error_class, self.errors):
+            return
+        if self.action == self.COUNT and issubclass(error_class, self.errors):
+            self.counts[error_class] += count
+            return
+        for _ in range(count):
+            self(error_class(detail))
+
+    @property
+    def total(self) -> int:
+        """Total number of handled errors"""
+        return sum(self.counts.values())
+
+    def summary(self) -> str:
+        """Human readable summary of the handled errors, e.g. ``'3 KeyError'``"""
+        return ', '.join(f'{count} {error_class.__name__}' for error_class, count in self.counts.items())
+
+    def reset(self):
+        """Clear counters and collected errors"""
+        self.counts.clear()
+        self.errors_seen.clear()
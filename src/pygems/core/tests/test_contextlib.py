@@ -1,5 +1,8 @@
+import asyncio
+import operator
+import threading
 import pytest
-from pygems.core.contextlib import on_exit
+from pygems.core.contextlib import on_exit, async_on_exit, on_exit_group, CleanupError, ResourcePool
 
 class Exitable:
     exited: False
@@ -23,3 +26,324 @@ class TestOnExit:
         with pytest.raises(AttributeError):
             with on_exit(object(), "some_exit_work"):
                 pass
+
+
+class AsyncResource:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        await asyncio.sleep(0)
+        self.closed = True
+
+
+class TestAsyncOnExit:
+    def test_awaits_coroutine_method(self):
+        obj = AsyncResource()
+
+        async def work():
+            async with async_on_exit(obj) as actual:
+                assert actual is obj
+
+        asyncio.run(work())
+        assert obj.closed
+
+    def test_calls_plain_method(self):
+        obj = Exitable()
+
+        async def work():
+            async with async_on_exit(obj, "exit"):
+                pass
+
+        asyncio.run(work())
+        assert obj.exited
+
+    def test_raises_attributeerror_if_method_not_found(self):
+        with pytest.raises(AttributeError):
+            async_on_exit(object())
+
+
+class TestOnExitGroup:
+    def test_closes_all_pushed_objects(self):
+        things = [Resource() for _ in range(5)]
+        with on_exit_group() as group:
+            for thing in things:
+                assert group.push(thing) is thing
+        assert all(thing.closed for thing in things)
+
+    def test_runs_cleanups_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        with on_exit_group(max_workers=3) as group:
+            for _ in range(3):
+                group.callback(barrier.wait)
+
+    def test_runs_coroutine_cleanups_in_sync_block(self):
+        thing = AsyncResource()
+        with on_exit_group() as group:
+            group.push(thing, "aclose")
+        assert thing.closed
+
+    def test_aggregates_errors(self):
+        thing = Resource()
+        with pytest.raises(CleanupError) as error_info:
+            with on_exit_group() as group:
+                group.callback(int, 'x')
+                group.push(thing)
+                group.callback(operator.truediv, 1, 0)
+        assert thing.closed
+        assert sorted(type(error).__name__ for error in error_info.value.errors) == ['ValueError', 'ZeroDivisionError']
+
+    def test_cleanup_error_keeps_block_error(self):
+        with pytest.raises(CleanupError) as error_info:
+            with on_exit_group() as group:
+                group.callback(int, 'x')
+                raise KeyError('body')
+        assert error_info.value.body_error.args == ('body',)
+        assert error_info.value.__context__ is error_info.value.body_error
+        assert error_info.value.errors[0].__class__ is ValueError
+
+    def test_callback_raises_type_error_for_not_callable(self):
+        with pytest.raises(TypeError):
+            on_exit_group().callback(3)
+
+    def test_async_block_gathers_cleanups(self):
+        things = [AsyncResource(), Resource()]
+
+        async def work():
+            async with on_exit_group() as group:
+                group.push(things[0], "aclose")
+                group.push(things[1])
+
+        asyncio.run(work())
+        assert all(thing.closed for thing in things)
+
+    def test_async_block_aggregates_errors(self):
+        async def fail():
+            raise ValueError()
+
+        async def work():
+            async with on_exit_group() as group:
+                group.callback(fail)
+                group.callback(int, 'x')
+
+        with pytest.raises(CleanupError) as error_info:
+            asyncio.run(work())
+        assert len(error_info.value.errors) == 2
+
+    def test_async_cleanup_error_keeps_block_error(self):
+        async def work():
+            async with on_exit_group() as group:
+                group.callback(int, 'x')
+                raise KeyError('body')
+
+        with pytest.raises(CleanupError) as error_info:
+            asyncio.run(work())
+        assert isinstance(error_info.value.body_error, KeyError)
+        assert error_info.value.__context__ is error_info.value.body_error
+
+
+class Resource:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResourcePool:
+    def test_creates_min_size_objects(self):
+        pool = ResourcePool(Resource, min_size=2)
+        assert (pool.size, pool.idle) == (2, 2)
+
+    def test_reuses_object_across_blocks(self):
+        pool = ResourcePool(Resource)
+        with pool.checkout() as first:
+            pass
+        with pool.checkout() as second:
+            pass
+        assert first is second
+        assert not first.closed
+
+    def test_raises_attributeerror_if_method_not_found(self):
+        pool = ResourcePool(object, "some_exit_work")
+        with pytest.raises(AttributeError):
+            pool.acquire()
+        assert pool.size == 0
+
+    def test_raises_value_error_for_invalid_sizes(self):
+        with pytest.raises(ValueError):
+            ResourcePool(Resource, min_size=3, max_size=2)
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = ResourcePool(Resource, max_size=1)
+        pool.acquire()
+        with pytest.raises(TimeoutError):
+            pool.acquire(timeout=0.01)
+
+    def test_acquire_waits_for_release(self):
+        pool = ResourcePool(Resource, max_size=1)
+        thing = pool.acquire()
+        threading.Timer(0.01, pool.release, [thing]).start()
+        assert pool.acquire(timeout=5) is thing
+
+    def test_replaces_unhealthy_objects(self):
+        pool = ResourcePool(Resource, health_check=lambda thing: thing is not first)
+        with pool.checkout() as first:
+            pass
+        with pool.checkout() as second:
+            pass
+        assert second is not first
+        assert first.closed
+        assert pool.size == 1
+
+    def test_failing_health_check_frees_the_slot(self):
+        failures = [ValueError('check failed')]
+
+        def health_check(thing):
+            if failures:
+                raise failures.pop()
+            return True
+
+        pool = ResourcePool(Resource, max_size=1, health_check=health_check)
+        first = pool.acquire()
+        pool.release(first)
+        with pytest.raises(ValueError, match='check failed'):
+            pool.acquire(timeout=0.2)
+        assert first.closed
+        assert (pool.size, pool.idle) == (0, 0)
+        assert not pool.acquire(timeout=0.2).closed
+
+    def test_failing_close_of_expired_object_frees_the_slot(self):
+        class Broken(Resource):
+            def close(self):
+                raise OSError('close failed')
+
+        clock = FakeClock()
+        pool = ResourcePool(Broken, max_size=1, idle_timeout=10, time_func=clock)
+        pool.release(pool.acquire())
+        clock.now = 20
+        with pytest.raises(OSError, match='close failed'):
+            pool.acquire(timeout=0.2)
+        assert (pool.size, pool.idle) == (0, 0)
+        assert isinstance(pool.acquire(timeout=0.2), Broken)
+
+    def test_evicts_idle_objects_above_min_size(self):
+        clock = FakeClock()
+        pool = ResourcePool(Resource, min_size=1, idle_timeout=10, time_func=clock)
+        things = [pool.acquire(), pool.acquire()]
+        for thing in things:
+            pool.release(thing)
+        clock.now = 11
+        pool.evict_idle()
+        assert (pool.size, [thing.closed for thing in things]) == (1, [True, False])
+
+    def test_close_closes_idle_and_released_objects(self):
+        with ResourcePool(Resource) as pool:
+            idle = pool.acquire()
+            busy = pool.acquire()
+            pool.release(idle)
+        assert idle.closed and not busy.closed
+        pool.release(busy)
+        assert busy.closed
+        assert pool.size == 0
+
+    def test_acquire_from_closed_pool_raises_runtime_error(self):
+        pool = ResourcePool(Resource)
+        pool.close()
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+
+    def test_max_size_is_respected_by_threads(self):
+        pool = ResourcePool(Resource, max_size=3)
+        seen = set()
+
+        def work():
+            for _ in range(20):
+                with pool.checkout() as thing:
+                    seen.add(id(thing))
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert pool.size <= 3
+        assert len(seen) <= 3
+
+    def test_acheckout_reuses_object(self):
+        pool = ResourcePool(Resource, max_size=1)
+
+        async def work():
+            async with pool.acheckout() as first:
+                pass
+            async with pool.acheckout() as second:
+                pass
+            return first, second
+
+        first, second = asyncio.run(work())
+        assert first is second
+
+    def test_aacquire_waits_on_event_loop(self):
+        pool = ResourcePool(Resource, max_size=1)
+        busy = pool.acquire()
+
+        async def work():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, threading.Thread(target=pool.release, args=(busy,)).start)
+            return await pool.aacquire(timeout=5)
+
+        assert asyncio.run(work()) is busy
+
+    def test_aacquire_timeout(self):
+        pool = ResourcePool(Resource, max_size=1)
+        pool.acquire()
+        with pytest.raises(TimeoutError):
+            asyncio.run(pool.aacquire(timeout=0.01))
+        assert not pool._waiters
+
+    def test_cancelled_waiter_does_not_leak(self):
+        pool = ResourcePool(Resource, max_size=1)
+        busy = pool.acquire()
+
+        async def work():
+            task = asyncio.ensure_future(pool.aacquire())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            pool.release(busy)
+            return await pool.aacquire(timeout=1)
+
+        assert asyncio.run(work()) is busy
+        assert (pool.size, pool.idle) == (1, 0)
+        assert not pool._waiters
+
+    def test_object_created_for_cancelled_coroutine_returns_to_pool(self):
+        created = threading.Event()
+        proceed = threading.Event()
+
+        def factory():
+            created.set()
+            proceed.wait(5)
+            return Resource()
+
+        pool = ResourcePool(factory, max_size=1)
+
+        async def work():
+            task = asyncio.ensure_future(pool.aacquire())
+            await asyncio.get_running_loop().run_in_executor(None, created.wait, 5)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            proceed.set()
+            return await pool.aacquire(timeout=5)
+
+        thing = asyncio.run(work())
+        assert isinstance(thing, Resource) and not thing.closed
+        assert (pool.size, pool.idle) == (1, 0)
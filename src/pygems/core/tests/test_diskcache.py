@@ -0,0 +1,184 @@
+import multiprocessing
+import os
+import pytest
+from unittest import mock
+from pygems.core.diskcache import DiskCache, disk_memoize, make_digest, MISSING
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with DiskCache(str(tmp_path), initial_capacity=8) as cache:
+        yield cache
+
+
+def fill_cache(path, worker):
+    with DiskCache(path) as cache:
+        for index in range(50):
+            cache.set((worker, index), [worker] * index)
+        return all(cache.get((worker, index)) == [worker] * index for index in range(50))
+
+
+def fill_inherited_cache(cache, worker):
+    mismatches = 0
+    for index in range(300):
+        cache.set((worker, index), index)
+        mismatches += cache.get((worker, index)) != index
+    os._exit(min(mismatches, 100))
+
+
+class TestDiskCache:
+    def test_returns_stored_value(self, cache):
+        cache.set('key', {'value': 1})
+        assert cache.get('key') == {'value': 1}
+
+    def test_stores_none(self, cache):
+        cache.set('key', None)
+        assert cache.get('key', 'default') is None
+
+    def test_returns_default_for_missing_key(self, cache):
+        assert cache.get('missing') is MISSING
+        assert cache.get('missing', 'default') == 'default'
+
+    def test_overwrites_value(self, cache):
+        cache.set('key', 1)
+        cache.set('key', 2)
+        assert (cache.get('key'), len(cache)) == (2, 1)
+
+    def test_grows_index(self, cache):
+        for index in range(100):
+            cache.set(index, index)
+        assert len(cache) == 100
+        assert [cache.get(index) for index in range(100)] == list(range(100))
+
+    def test_delete_removes_value(self, cache):
+        cache.set('key', 1)
+        assert cache.delete('key')
+        assert not cache.delete('key')
+        assert (cache.get('key'), len(cache)) == (MISSING, 0)
+
+    def test_persists_between_instances(self, tmp_path):
+        with DiskCache(str(tmp_path)) as cache:
+            cache.set('key', 'value')
+        with DiskCache(str(tmp_path)) as cache:
+            assert cache.get('key') == 'value'
+
+    def test_compact_drops_overwritten_values(self, cache):
+        cache.set('key', 'x' * 1000)
+        cache.set('key', 'y')
+        size = cache.data_size
+        cache.compact()
+        assert cache.data_size < size
+        assert cache.get('key') == 'y'
+
+    def test_compact_evicts_least_recently_used(self, cache):
+        for index in range(10):
+            cache.set(index, 'x' * 100)
+        cache.get(0)
+        cache.compact(500)
+        assert cache.data_size <= 500
+        assert cache.get(0) == 'x' * 100
+        assert cache.get(1) is MISSING
+
+    def test_evicts_when_over_max_bytes(self, tmp_path):
+        with DiskCache(str(tmp_path), max_bytes=1000) as cache:
+            for index in range(50):
+                cache.set(index, 'x' * 100)
+            assert cache.data_size <= 1000
+            assert cache.get(49) == 'x' * 100
+
+    def test_does_not_store_values_over_max_bytes(self, tmp_path):
+        with DiskCache(str(tmp_path), max_bytes=100) as cache:
+            cache.set('key', 'x' * 1000)
+            assert cache.get('key') is MISSING
+
+    def test_clear_removes_all_values(self, cache):
+        cache.set('key', 1)
+        cache.clear()
+        assert (len(cache), cache.data_size) == (0, 0)
+
+    def test_instances_see_changes_of_each_other(self, tmp_path):
+        with DiskCache(str(tmp_path), initial_capacity=8) as first, DiskCache(str(tmp_path)) as second:
+            first.set('key', 1)
+            assert second.get('key') == 1
+            for index in range(20):
+                second.set(index, index)
+            second.compact()
+            assert first.get(19) == 19
+
+    def test_processes_write_concurrently(self, tmp_path):
+        with multiprocessing.Pool(3) as pool:
+            results = pool.starmap(fill_cache, [(str(tmp_path), worker) for worker in range(3)])
+        assert results == [True] * 3
+        with DiskCache(str(tmp_path)) as cache:
+            assert len(cache) == 150
+
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork')
+    def test_forked_processes_write_concurrently(self, tmp_path):
+        with DiskCache(str(tmp_path), initial_capacity=8) as cache:
+            cache.set('parent', 1)
+            context = multiprocessing.get_context('fork')
+            workers = [context.Process(target=fill_inherited_cache, args=(cache, worker)) for worker in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            assert [worker.exitcode for worker in workers] == [0] * 4
+            assert len(cache) == 1201
+
+    def test_equal_keys_have_equal_digests(self):
+        name = 'key'
+        other = ''.join(['k', 'ey'])
+        assert make_digest((name, name)) == make_digest((name, other))
+        assert make_digest([1, (2.0, None)]) == make_digest([1, (2.0, None)])
+        assert make_digest(frozenset({'a', 'b'})) == make_digest(frozenset({'b', 'a'}))
+        assert len({make_digest(key) for key in [1, 1.0, True, '1', b'1', (1,), [1]]}) == 7
+
+    def test_close_is_idempotent(self, tmp_path):
+        cache = DiskCache(str(tmp_path))
+        cache.get('key')
+        cache.close()
+        cache.close()
+        with pytest.raises(ValueError, match='closed'):
+            cache.get('key')
+
+    def test_access_times_are_written_on_close(self, tmp_path):
+        with DiskCache(str(tmp_path)) as cache:
+            for index in range(10):
+                cache.set(index, 'x' * 100)
+        with DiskCache(str(tmp_path)) as cache:
+            cache.get(0)
+        with DiskCache(str(tmp_path)) as cache:
+            cache.compact(500)
+            assert cache.get(0) == 'x' * 100
+
+    def test_rejects_foreign_index(self, tmp_path):
+        (tmp_path / 'index').write_bytes(b'x' * 100)
+        with pytest.raises(ValueError):
+            DiskCache(str(tmp_path))
+
+
+class TestDiskMemoize:
+    def test_caches_results_on_disk(self, tmp_path):
+        func = mock.Mock(return_value=42, __name__='func', __qualname__='func')
+        memoized = disk_memoize(str(tmp_path))(func)
+        assert (memoized(1, b=2), memoized(1, b=2), memoized(2)) == (42, 42, 42)
+        assert func.call_count == 2
+        assert len(memoized.get_cache()) == 2
+
+    def test_separates_functions_sharing_directory(self, tmp_path):
+        @disk_memoize(str(tmp_path))
+        def first(x):
+            return 'first'
+
+        @disk_memoize(str(tmp_path))
+        def second(x):
+            return 'second'
+
+        assert (first(1), second(1)) == ('first', 'second')
+
+    def test_uses_key_func(self, tmp_path):
+        func = mock.Mock(side_effect=lambda x, verbose=False: x, __name__='func', __qualname__='func')
+        memoized = disk_memoize(str(tmp_path), key_func=lambda x, verbose=False: x)(func)
+        memoized(1)
+        memoized(1, verbose=True)
+        func.assert_called_once()
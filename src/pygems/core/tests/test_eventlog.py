@@ -0,0 +1,116 @@
+import io
+
+import pytest
+from unittest import mock
+from pygems.core.eventlog import EventRecorder, RecordedEvent, read_events, replay
+from pygems.core.plugin import PluginCollection
+
+
+class Clock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def slow_listener(clock, seconds):
+    def listener(*args, **kwargs):
+        clock.now += seconds
+    return listener
+
+
+class TestEventRecorder:
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_records_notifications(self, tmp_path, compress):
+        path = str(tmp_path / 'events.log')
+        timestamps = iter([1.0, 2.5])
+        with EventRecorder(path, compress=compress, time_func=lambda: next(timestamps)) as recorder:
+            PluginCollection().append(recorder).notify('load', 'a.txt').notify('save', size=3)
+        assert recorder.count == 2
+        assert list(read_events(path)) == [
+            RecordedEvent(1.0, ('load', 'a.txt'), {}),
+            RecordedEvent(2.5, ('save',), {'size': 3}),
+        ]
+
+    def test_compresses_log(self, tmp_path):
+        events = [('event', 'x' * 100)] * 100
+        sizes = []
+        for compress in [False, True]:
+            path = tmp_path / f'events-{compress}.log'
+            with EventRecorder(str(path), compress=compress) as recorder:
+                for args in events:
+                    recorder(*args)
+            sizes.append(path.stat().st_size)
+        assert sizes[1] * 10 < sizes[0]
+
+    def test_leaves_stream_open(self):
+        stream = io.BytesIO()
+        with EventRecorder(stream, compress=True) as recorder:
+            recorder('load')
+        assert not stream.closed
+        stream.seek(0)
+        assert [event.args for event in read_events(stream)] == [('load',)]
+
+    def test_rejects_other_files(self):
+        with pytest.raises(ValueError, match='Not an event log'):
+            list(read_events(io.BytesIO(b'something else')))
+
+    def test_detects_truncated_log(self):
+        stream = io.BytesIO()
+        with EventRecorder(stream) as recorder:
+            recorder('load', 'a.txt')
+        with pytest.raises(EOFError, match='Truncated event log'):
+            list(read_events(io.BytesIO(stream.getvalue()[:-2])))
+
+
+class TestReplay:
+    def test_replays_at_recorded_speed(self):
+        clock = Clock(100.0)
+        listener = mock.Mock()
+        events = [RecordedEvent(10.0, ('a',), {}), RecordedEvent(11.0, ('b',), {'x': 1}), RecordedEvent(13.0, ('c',), {})]
+        report = replay(events, PluginCollection().append(listener), speed=2.0, time_func=clock, sleep_func=clock.sleep)
+        assert listener.call_args_list == [mock.call('a'), mock.call('b', x=1), mock.call('c')]
+        assert report.events == 3
+        assert report.elapsed == 1.5
+
+    def test_replays_at_max_speed(self):
+        clock = Clock()
+        sleep = mock.Mock()
+        events = [RecordedEvent(0.0, ('a',), {}), RecordedEvent(60.0, ('b',), {})]
+        report = replay(events, PluginCollection().append(slow_listener(clock, 0.5)), speed=None,
+                        time_func=clock, sleep_func=sleep)
+        sleep.assert_not_called()
+        assert report.elapsed == 1.0
+
+    def test_catches_up_after_slow_listeners(self):
+        clock = Clock()
+        sleep = mock.Mock(side_effect=clock.sleep)
+        events = [RecordedEvent(float(second), ('tick',), {}) for second in range(4)]
+        replay(events, PluginCollection().append(slow_listener(clock, 2.5)), time_func=clock, sleep_func=sleep)
+        sleep.assert_not_called()
+
+    def test_reports_latency_per_listener(self):
+        clock = Clock()
+        fast, slow = slow_listener(clock, 0.001), slow_listener(clock, 0.01)
+        fast.__qualname__, slow.__qualname__ = 'fast', 'slow'
+        events = [RecordedEvent(0.0, ('tick',), {})] * 4
+        report = replay(events, PluginCollection().append(fast, slow), speed=None, time_func=clock)
+        assert list(report.listeners) == ['fast', 'slow']
+        assert report.listeners['fast'].count == 4
+        assert report.listeners['slow'].mean == pytest.approx(0.01)
+        assert report.listeners['slow'].percentile(99) == pytest.approx(0.01)
+        assert 'slow' in report.format()
+
+    def test_replays_log_file_without_recorders(self, tmp_path):
+        path = str(tmp_path / 'events.log')
+        listener = mock.Mock()
+        with EventRecorder(path, compress=True) as recorder:
+            plugins = PluginCollection().append(recorder, listener).notify('load')
+        report = replay(path, plugins, speed=None)
+        assert recorder.count == 1
+        assert list(report.listeners) == ['Mock']
+        assert listener.call_count == 2
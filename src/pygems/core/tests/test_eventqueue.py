@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+from unittest import mock
+from pygems.core.eventqueue import EventQueue
+from pygems.core.plugin import PluginCollection
+from pygems.core.shortcuts import ErrorPolicy
+
+
+class Gate:
+    """Listener which blocks the worker until opened"""
+
+    def __init__(self):
+        self.opened = threading.Event()
+        self.entered = threading.Event()
+        self.events = []
+
+    def __call__(self, *args, **kwargs):
+        self.entered.set()
+        self.opened.wait(5)
+        self.events.append(args)
+
+
+def blocked_queue(gate, **options):
+    queue = EventQueue(PluginCollection().append(gate), **options)
+    queue.notify('first')
+    assert gate.entered.wait(5)
+    return queue
+
+
+class TestEventQueue:
+    def test_delivers_events_in_order(self):
+        listener = mock.Mock()
+        with EventQueue(PluginCollection().append(listener)) as queue:
+            for index in range(100):
+                queue.notify('event', index, flag=True)
+        assert listener.call_args_list == [mock.call('event', index, flag=True) for index in range(100)]
+        stats = queue.stats()
+        assert (stats.enqueued, stats.delivered, stats.dropped, stats.depth) == (100, 100, 0, 0)
+
+    def test_multiple_workers(self):
+        listener = mock.Mock()
+        with EventQueue(PluginCollection().append(listener), workers=4) as queue:
+            for index in range(100):
+                queue.notify(index)
+        assert sorted(call.args[0] for call in listener.call_args_list) == list(range(100))
+
+    @pytest.mark.parametrize('overflow, expected', [
+        ('drop_oldest', [('first',), (3,), (4,)]),
+        ('drop_newest', [('first',), (0,), (1,)]),
+    ])
+    def test_drop_policies(self, overflow, expected):
+        gate = Gate()
+        queue = blocked_queue(gate, maxsize=2, overflow=overflow)
+        accepted = [queue.notify(index) for index in range(5)]
+        assert queue.depth == 2
+        gate.opened.set()
+        queue.close()
+        assert gate.events == expected
+        assert queue.stats().dropped == 3
+        assert queue.stats().max_depth == 2
+        assert accepted == ([True] * 5 if overflow == 'drop_oldest' else [True, True, False, False, False])
+
+    def test_sample_policy_keeps_every_nth_event(self):
+        gate = Gate()
+        queue = blocked_queue(gate, maxsize=2, overflow='sample', sample_every=3)
+        for index in range(11):
+            queue.notify(index)
+        gate.opened.set()
+        queue.close()
+        assert gate.events == [('first',), (7,), (10,)]
+        assert queue.stats().dropped == 9
+
+    def test_block_policy_times_out(self):
+        gate = Gate()
+        queue = blocked_queue(gate, maxsize=1, timeout=0.01)
+        assert queue.notify(1)
+        assert not queue.notify(2)
+        gate.opened.set()
+        queue.close()
+        assert gate.events == [('first',), (1,)]
+        assert queue.stats().dropped == 1
+
+    def test_block_policy_waits_for_space(self):
+        gate = Gate()
+        queue = blocked_queue(gate, maxsize=1)
+        queue.notify(1)
+        producer = threading.Thread(target=queue.notify, args=(2,))
+        producer.start()
+        producer.join(0.05)
+        assert producer.is_alive()
+        gate.opened.set()
+        producer.join(5)
+        queue.close()
+        assert gate.events == [('first',), (1,), (2,)]
+
+    def test_block_policy_raises_when_closed_while_waiting(self):
+        gate = Gate()
+        queue = blocked_queue(gate, maxsize=1)
+        queue.notify(1)
+        errors = []
+
+        def produce():
+            try:
+                queue.notify(2)
+            except RuntimeError as error:
+                errors.append(error)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        producer.join(0.05)
+        closer = threading.Thread(target=queue.close, kwargs={'drain': False})
+        closer.start()
+        producer.join(5)
+        gate.opened.set()
+        closer.join(5)
+        assert [str(error) for error in errors] == ['Event queue is closed']
+        assert gate.events == [('first',)]
+
+    def test_join_waits_for_delivery(self):
+        listener = mock.Mock()
+        queue = EventQueue(PluginCollection().append(listener))
+        for index in range(10):
+            queue.notify(index)
+        assert queue.join(5)
+        assert listener.call_count == 10
+        queue.close()
+
+    def test_counts_errors(self):
+        policy = ErrorPolicy(ValueError)
+
+        def fail(*args):
+            raise ValueError('failed')
+
+        with EventQueue(PluginCollection().append(fail), error_handler=policy) as queue:
+            queue.notify(1)
+            queue.notify(2)
+        assert queue.stats().errors == 2
+        assert policy.total == 2
+
+    def test_close_without_draining(self):
+        gate = Gate()
+        queue = blocked_queue(gate, maxsize=10)
+        for index in range(5):
+            queue.notify(index)
+        gate.opened.set()
+        queue.close(drain=False)
+        assert queue.stats().dropped + len(gate.events) == 6
+        with pytest.raises(RuntimeError, match='closed'):
+            queue.notify(6)
+
+    @pytest.mark.parametrize('workers', [0, -1])
+    def test_rejects_no_workers(self, workers):
+        with pytest.raises(ValueError, match='workers must be at least 1'):
+            EventQueue(PluginCollection(), workers=workers)
+
+    def test_rejects_unknown_policy(self):
+        with pytest.raises(ValueError, match="Unknown overflow policy 'spill'"):
+            EventQueue(PluginCollection(), overflow='spill')
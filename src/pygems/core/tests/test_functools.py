@@ -1,6 +1,10 @@
+import asyncio
+import collections.abc
+import threading
+import typing
 import pytest
 from unittest import mock
-from pygems.core.functools import multimethod
+from pygems.core.functools import multimethod, memoize, vectorized, MemoCache, MultiMethod
 
 @pytest.fixture(scope="session")   # We cannot use the same function signature multiple times in the same session
 def given_int_version():
@@ -41,3 +45,409 @@ def test_calling_multimethod_with_unregistered_signature_results_in_type_error()
 
     with pytest.raises(TypeError):
         empty_signature_only(22)
+
+
+
+def is_empty(value):
+    return not value
+
+
+def is_negative(value):
+    return value < 0
+
+
+class TestPredicateDispatch:
+    def test_guarded_rules_take_priority_over_types(self):
+        mm = MultiMethod('describe')
+        mm.register((list,), lambda items: 'list')
+        mm.register((list,), lambda items: 'empty list', when=is_empty)
+        assert mm([]) == 'empty list'
+        assert mm([1]) == 'list'
+
+    def test_predicate_slots_match_any_class(self):
+        mm = MultiMethod('describe')
+        mm.register((is_empty,), lambda value: 'empty')
+        mm.register((int,), lambda value: 'int')
+        assert mm('') == 'empty'
+        assert mm(()) == 'empty'
+        assert mm(0) == 'empty'
+        assert mm(5) == 'int'
+        with pytest.raises(TypeError, match='no match'):
+            mm('x')
+
+    def test_rules_are_tried_in_registration_order(self):
+        mm = MultiMethod('sign')
+        mm.register((int,), lambda value: 'negative', when=is_negative)
+        mm.register((int,), lambda value: 'small', when=lambda value: value < 10)
+        mm.register((int,), lambda value: 'large')
+        assert [mm(-5), mm(5), mm(50)] == ['negative', 'small', 'large']
+
+    def test_guard_receives_all_arguments(self):
+        mm = MultiMethod('compare')
+        mm.register((int, int), lambda left, right: 'equal', when=lambda left, right: left == right)
+        mm.register((int, int), lambda left, right: 'different')
+        mm.register((int, str), lambda left, right: 'mixed')
+        assert [mm(1, 1), mm(1, 2), mm(1, '1')] == ['equal', 'different', 'mixed']
+
+    def test_shared_predicate_is_evaluated_once(self):
+        calls = []
+
+        def counted(value):
+            calls.append(value)
+            return value > 100
+
+        mm = MultiMethod('ranges')
+        for limit in range(30):
+            mm.register((int,), lambda value, limit=limit: limit, when=lambda value, limit=limit: value == limit)
+            mm.register((counted,), lambda value, limit=limit: -limit, when=lambda value, limit=limit: value == -limit)
+        mm.register((int,), lambda value: 'other')
+        assert mm(7) == 7
+        assert mm(500) == 'other'
+        assert calls == [7, 500]
+
+    def test_registration_invalidates_compiled_tree(self):
+        mm = MultiMethod('describe')
+        mm.register((str,), lambda value: 'str')
+        mm.register((str,), lambda value: 'long', when=lambda value: len(value) > 3)
+        assert mm('ab') == 'str'
+        mm.register((str,), lambda value: 'short', when=lambda value: len(value) < 3)
+        assert mm('ab') == 'short'
+
+    def test_duplicate_rules(self):
+        mm = MultiMethod('describe')
+        mm.register((is_empty,), print)
+        with pytest.raises(TypeError, match='duplicate registration'):
+            mm.register((is_empty,), repr)
+
+    def test_rejects_invalid_slots(self):
+        with pytest.raises(TypeError, match='expecting class or predicate, got 3'):
+            MultiMethod('describe').register((is_empty, 3), print)
+        with pytest.raises(TypeError, match='expecting class or predicate'):
+            MultiMethod('describe').register((int, 'str'), print)
+
+    @pytest.mark.parametrize('slot', [typing.List[int], typing.Any, typing.Optional[int], typing.Union[int, str]])
+    def test_rejects_typing_constructs(self, slot):
+        with pytest.raises(TypeError, match='typing constructs are not supported'):
+            MultiMethod('describe').register((slot,), print)
+        with pytest.raises(TypeError, match='registered for classes'):
+            MultiMethod('describe').register_vectorized((slot,), print)
+
+    def test_abstract_classes_are_classes(self):
+        mm = MultiMethod('describe')
+        mm.register((collections.abc.Sized,), print)
+        assert mm.typemap == {(collections.abc.Sized,): print}
+        assert mm.rules == []
+
+    def test_decorator_accepts_guard(self):
+        @multimethod(int, when=is_negative)
+        def guarded_abs(value):
+            return -value
+
+        @multimethod(int)
+        def guarded_abs(value):
+            return value
+
+        assert guarded_abs(-3) == guarded_abs(3) == 3
+
+
+
+class TestBatchDispatch:
+    def test_map_resolves_once_per_type_signature(self):
+        lookups = []
+
+        class Typemap(dict):
+            def get(self, types, default=None):
+                lookups.append(types)
+                return super().get(types, default)
+
+        mm = MultiMethod('describe')
+        mm.register((int,), lambda value: f'int {value}')
+        mm.register((str,), lambda value: f'str {value}')
+        mm.typemap = Typemap(mm.typemap)
+        assert mm.map([1, 'a', 2, 'b', 3]) == ['int 1', 'str a', 'int 2', 'str b', 'int 3']
+        assert lookups == [(int,), (str,)]
+
+    def test_starmap_preserves_order(self):
+        mm = MultiMethod('combine')
+        mm.register((int, int), lambda left, right: left + right)
+        mm.register((str, int), lambda left, right: left * right)
+        assert mm.starmap([(1, 2), ('a', 3), (4, 5)]) == [3, 'aaa', 9]
+
+    def test_vectorized_receives_groups(self):
+        calls = []
+
+        def add(left, right):
+            calls.append((left, right))
+            return [a + b for a, b in zip(left, right)]
+
+        mm = MultiMethod('combine')
+        mm.register((int, int), lambda left, right: left + right)
+        mm.register((str, str), lambda left, right: left + right)
+        mm.register_vectorized((int, int), add)
+        assert mm.starmap([(1, 2), ('a', 'b'), (3, 4)]) == [3, 'ab', 7]
+        assert calls == [([1, 3], [2, 4])]
+        assert mm(1, 2) == 3
+        assert len(calls) == 1
+
+    def test_vectorized_without_scalar_implementation(self):
+        mm = MultiMethod('double')
+        mm.register_vectorized((int,), lambda values: [value * 2 for value in values])
+        assert mm(4) == 8
+        assert mm.map([1, 2]) == [2, 4]
+
+    def test_predicates_are_resolved_per_call(self):
+        batches = []
+        mm = MultiMethod('sign')
+        mm.register((int,), lambda value: 'negative', when=is_negative)
+        mm.register((int,), lambda value: 'positive')
+        mm.register_vectorized((int,), lambda values: batches.append(values) or ['positive'] * len(values))
+        assert mm.map([1, -1, 2, -2]) == ['positive', 'negative', 'positive', 'negative']
+        assert batches == [[1, 2]]
+
+    def test_no_match(self):
+        mm = MultiMethod('describe')
+        mm.register((int,), str)
+        with pytest.raises(TypeError, match='no match'):
+            mm.map([1, 'a'])
+        mm.register((str,), str, when=is_empty)
+        with pytest.raises(TypeError, match='no match'):
+            mm.map(['a'])
+
+    def test_vectorized_result_length_is_checked(self):
+        mm = MultiMethod('broken')
+        mm.register_vectorized((int,), lambda values: values[:1])
+        with pytest.raises(ValueError, match='returned 1 results for 2 calls'):
+            mm.map([1, 2])
+
+    def test_vectorized_is_registered_for_classes(self):
+        mm = MultiMethod('broken')
+        with pytest.raises(TypeError, match='registered for classes'):
+            mm.register_vectorized((is_empty,), print)
+        mm.register_vectorized((int,), print)
+        with pytest.raises(TypeError, match='duplicate registration'):
+            mm.register_vectorized((int,), print)
+
+    def test_vectorized_decorator(self):
+        @multimethod(int)
+        def batch_square(value):
+            return value * value
+
+        @vectorized(int)
+        def batch_square(values):
+            return [value * value for value in values]
+
+        assert batch_square.map(range(5)) == [0, 1, 4, 9, 16]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoCache:
+    def test_lru_evicts_least_recently_used(self):
+        cache = MemoCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    def test_lfu_evicts_least_frequently_used(self):
+        cache = MemoCache(maxsize=2, policy='lfu')
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+        cache.set('c', 3)
+        assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = MemoCache(ttl=10, time_func=clock)
+        cache.set('a', 1)
+        clock.now = 9
+        assert cache.get('a') == 1
+        clock.now = 10
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_respects_maxbytes(self):
+        cache = MemoCache(maxsize=None, maxbytes=10, sizeof=len)
+        cache.set('a', 'x' * 4)
+        cache.set('b', 'x' * 4)
+        cache.set('c', 'x' * 4)
+        cache.set('d', 'x' * 11)
+        info = cache.info()
+        assert (info.currsize, info.currbytes, info.evictions) == (2, 8, 1)
+        assert cache.get('d') is None
+
+    def test_counts_hits_and_misses(self):
+        cache = MemoCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        info = cache.info()
+        assert (info.hits, info.misses) == (1, 1)
+
+    def test_clear_removes_entries(self):
+        cache = MemoCache(policy='lfu')
+        cache.set('a', 1)
+        cache.clear()
+        assert cache.info() == (0, 0, 0, 128, 0, None, 0)
+
+    def test_raises_value_error_for_unknown_policy(self):
+        with pytest.raises(ValueError):
+            MemoCache(policy='fifo')
+
+
+class TestMemoize:
+    def test_caches_results(self):
+        func = mock.Mock(return_value=42)
+        memoized = memoize(func)
+        assert (memoized(1), memoized(1), memoized(key=2)) == (42, 42, 42)
+        assert func.call_count == 2
+
+    def test_typed_caches_types_separately(self):
+        memoized = memoize(typed=True)(lambda x: type(x))
+        assert (memoized(1), memoized(1.0)) == (int, float)
+
+    def test_does_not_cache_errors(self):
+        func = mock.Mock(side_effect=[ValueError(), 1])
+        memoized = memoize(func)
+        with pytest.raises(ValueError):
+            memoized()
+        assert memoized() == 1
+
+    def test_works_on_methods(self):
+        class Calculator:
+            calls = 0
+
+            @memoize
+            def double(self, x):
+                self.calls += 1
+                return 2 * x
+
+        calculator = Calculator()
+        assert (calculator.double(2), calculator.double(2)) == (4, 4)
+        assert calculator.calls == 1
+
+    def test_concurrent_callers_compute_once(self):
+        calls = []
+        started = threading.Event()
+
+        @memoize
+        def slow(x):
+            calls.append(x)
+            started.wait(5)
+            return x
+
+        threads = [threading.Thread(target=slow, args=(1,)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        assert calls == [1]
+
+    def test_concurrent_callers_receive_error(self):
+        errors = []
+        started = threading.Event()
+
+        @memoize
+        def failing():
+            started.wait(5)
+            raise ValueError()
+
+        def call():
+            try:
+                failing()
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 3
+
+    def test_async_function_awaits_once(self):
+        calls = []
+
+        @memoize(ttl=60)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return x * 2
+
+        async def work():
+            return await asyncio.gather(*[fetch(3) for _ in range(5)]) + [await fetch(3)]
+
+        assert asyncio.run(work()) == [6] * 6
+        assert calls == [3]
+
+    def test_follower_computes_when_leader_is_cancelled(self):
+        calls = []
+
+        @memoize
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return x * 2
+
+        async def work():
+            leader = asyncio.ensure_future(fetch(3))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(fetch(3))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower, leader.cancelled()
+
+        assert asyncio.run(work()) == (6, True)
+        assert calls == [3, 3]
+
+    def test_recursive_call_with_same_arguments_raises(self):
+        @memoize
+        def recurse(x):
+            return recurse(x)
+
+        with pytest.raises(RuntimeError, match='called recursively'):
+            recurse(1)
+
+    def test_async_recursive_call_with_same_arguments_raises(self):
+        @memoize
+        async def recurse(x):
+            return await recurse(x)
+
+        with pytest.raises(RuntimeError, match='called recursively'):
+            asyncio.run(recurse(1))
+
+    def test_async_function_propagates_errors(self):
+        @memoize
+        async def failing():
+            await asyncio.sleep(0)
+            raise ValueError()
+
+        async def work():
+            return await asyncio.gather(failing(), failing(), return_exceptions=True)
+
+        assert [type(error) for error in asyncio.run(work())] == [ValueError, ValueError]
+
+    def test_memoizes_multimethod(self):
+        func = mock.Mock(return_value='int')
+
+        @memoize
+        @multimethod(int)
+        def memoized_multimethod(x):
+            return func(x)
+
+        assert memoized_multimethod(1) == memoized_multimethod(1) == 'int'
+        func.assert_called_once_with(1)
+        with pytest.raises(TypeError):
+            memoized_multimethod('x')
@@ -0,0 +1,121 @@
+import io
+import json
+import operator
+import pickle
+
+import pytest
+from pygems.core import jsonl
+from pygems.core.namespace import Namespace, ShapedNamespace, shape_of
+from pygems.core.shortcuts import ErrorPolicy
+
+RECORDS = [{'id': index, 'name': f'user{index}', 'age': index % 90} for index in range(500)]
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'records.jsonl'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in RECORDS))
+    return str(path)
+
+
+def asdicts(records):
+    return [record.asdict() for record in records]
+
+
+class TestReadJsonl:
+    @pytest.mark.parametrize('use_mmap', [True, False])
+    def test_reads_file(self, path, use_mmap):
+        records = list(jsonl.read_jsonl(path, use_mmap=use_mmap, chunk_size=100))
+        assert all(isinstance(record, Namespace) for record in records)
+        assert asdicts(records) == RECORDS
+
+    def test_reads_file_object_in_chunks(self, path):
+        with open(path, 'rb') as file:
+            assert asdicts(jsonl.read_jsonl(file, chunk_size=7)) == RECORDS
+
+    def test_last_line_without_newline_and_blank_lines(self):
+        source = io.BytesIO(b'\n{"a": 1}\r\n  \n{"a": 2}')
+        assert asdicts(jsonl.read_jsonl(source)) == [{'a': 1}, {'a': 2}]
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / 'empty.jsonl'
+        path.write_bytes(b'')
+        assert list(jsonl.read_jsonl(str(path))) == []
+
+    def test_namespace_class(self, path):
+        records = list(jsonl.read_jsonl(path, namespace_class=ShapedNamespace))
+        assert all(shape_of(record) is shape_of(records[0]) for record in records)
+        assert asdicts(records) == RECORDS
+
+    def test_projection(self, path):
+        records = jsonl.read_jsonl(path, fields=['name', 'age', 'missing'], drop='age')
+        assert asdicts(records)[:2] == [{'name': 'user0'}, {'name': 'user1'}]
+
+    def test_drop_reports_missing_fields(self):
+        policy = ErrorPolicy(KeyError)
+        source = io.BytesIO(b'{"a": 1, "b": 2}\n{"a": 3}\n')
+        assert asdicts(jsonl.read_jsonl(source, drop='b', error_handler=policy)) == [{'a': 1}, {'a': 3}]
+        assert policy.summary() == '1 KeyError'
+
+    def test_invalid_lines_raise(self):
+        source = io.BytesIO(b'{"a": 1}\n{"a": \n')
+        with pytest.raises(ValueError, match='Invalid JSON on line 2'):
+            list(jsonl.read_jsonl(source))
+
+    def test_invalid_lines_are_skipped_by_error_handler(self):
+        policy = ErrorPolicy(ValueError, 'collect')
+        source = io.BytesIO(b'{"a": 1}\n[1, 2]\nnot json\n{"a": 2}\n')
+        assert asdicts(jsonl.read_jsonl(source, error_handler=policy)) == [{'a': 1}, {'a': 2}]
+        assert [str(error) for error in policy.errors_seen] == [
+            'Expecting JSON object on line 2, got list',
+            'Invalid JSON on line 3: Expecting value: line 1 column 1 (char 0)',
+        ]
+
+    def test_lazy_views(self, path):
+        views = list(jsonl.read_jsonl(path, lazy=True, fields=['name']))
+        assert all(isinstance(view, jsonl.NamespaceView) for view in views)
+        assert 'not parsed' in repr(views[1])
+        assert views[1].name == 'user1'
+        assert 'parsed' in repr(views[1])
+        assert views[1].asdict() == {'name': 'user1'}
+        with pytest.raises(AttributeError):
+            views[1].age
+
+    def test_lazy_view_of_invalid_line(self):
+        view, = jsonl.read_jsonl(io.BytesIO(b'{oops}\n'), lazy=True)
+        with pytest.raises(ValueError, match='Invalid JSON on line 1'):
+            view.name
+
+    def test_lazy_views_are_picklable(self):
+        view = pickle.loads(pickle.dumps(jsonl.NamespaceView(b'{"a": 1}')))
+        assert view.a == 1
+
+
+class TestSplitLines:
+    def test_ranges_end_at_line_boundaries(self, path):
+        ranges = list(jsonl.split_lines(path, 1000))
+        assert len(ranges) > 1
+        with open(path, 'rb') as file:
+            data = file.read()
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert data[end - 1:end] == b'\n'
+
+
+class TestReadJsonlParallel:
+    def test_reads_records_in_order(self, path):
+        records = list(jsonl.read_jsonl_parallel(path, max_workers=2, range_size=1000))
+        assert asdicts(records) == RECORDS
+
+    def test_applies_function_in_workers(self, path):
+        ages = jsonl.read_jsonl_parallel(path, operator.attrgetter('age'), fields=['age'], max_workers=2,
+                                         range_size=1000, ordered=False)
+        assert sum(ages) == sum(record['age'] for record in RECORDS)
+
+    def test_reports_offset_of_invalid_lines(self, tmp_path):
+        path = tmp_path / 'invalid.jsonl'
+        path.write_bytes(b'{"a": 1}\n{"a": \n')
+        with pytest.raises(ValueError, match='Invalid JSON on byte offset 9'):
+            list(jsonl.read_jsonl_parallel(str(path), max_workers=1))
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+from pygems.core import lazy
+
+
+@pytest.fixture
+def fake_package(monkeypatch):
+    package = types.ModuleType('fake_lazy_package')
+    submodule = types.ModuleType('fake_lazy_package.sub')
+    submodule.value = 42
+    monkeypatch.setitem(sys.modules, 'fake_lazy_package', package)
+    monkeypatch.setitem(sys.modules, 'fake_lazy_package.sub', submodule)
+    package.__getattr__, package.__dir__ = lazy.lazy_getattr(
+        'fake_lazy_package', ['sub', 'missing'], {'answer': 'fake_lazy_package.sub:value'})
+    yield package
+    for target in ['fake_lazy_package.sub', 'fake_lazy_package.missing', 'fake_lazy_package.sub:value']:
+        lazy._records.pop(target, None)
+
+
+class TestLazyImport:
+    def test_returns_imported_module(self):
+        assert lazy.lazy_import('sys') is sys
+
+    def test_imports_on_attribute_access(self, monkeypatch):
+        module = types.ModuleType('fake_lazy_module')
+        module.value = 1
+        proxy = lazy.lazy_import('fake_lazy_module')
+        assert isinstance(proxy, lazy.LazyModule)
+        monkeypatch.setitem(sys.modules, 'fake_lazy_module', module)
+        proxy.other = 2
+        assert proxy.value == 1
+        assert module.other == 2
+        record, = [record for record in lazy.lazy_report() if record.target == 'fake_lazy_module']
+        assert record.triggered
+        assert record.trigger == 'other'
+        assert record.importer == __name__
+        lazy._records.pop('fake_lazy_module')
+
+    def test_forwards_module_attributes(self, monkeypatch):
+        module = types.ModuleType('fake_lazy_module', 'Fake module')
+        proxy = lazy.lazy_import('fake_lazy_module')
+        monkeypatch.setitem(sys.modules, 'fake_lazy_module', module)
+        assert proxy.__doc__ == 'Fake module'
+        assert proxy.__spec__ is module.__spec__
+        assert 'first attribute access' in lazy.LazyModule.__doc__
+        lazy._records.pop('fake_lazy_module')
+
+
+class TestLazyGetattr:
+    def test_imports_submodule_and_caches_it(self, fake_package):
+        assert fake_package.sub is sys.modules['fake_lazy_package.sub']
+        assert vars(fake_package)['sub'] is fake_package.sub
+
+    def test_imports_attribute(self, fake_package):
+        assert fake_package.answer == 42
+
+    def test_unknown_attribute(self, fake_package):
+        with pytest.raises(AttributeError, match="module 'fake_lazy_package' has no attribute 'other'"):
+            fake_package.other
+
+    def test_dir_lists_lazy_names(self, fake_package):
+        assert {'sub', 'missing', 'answer'} <= set(fake_package.__dir__())
+
+    def test_report(self, fake_package):
+        fake_package.sub
+        triggered = [record.target for record in lazy.lazy_report(triggered=True)]
+        not_triggered = [record.target for record in lazy.lazy_report(triggered=False)]
+        assert 'fake_lazy_package.sub' in triggered
+        assert 'fake_lazy_package.missing' in not_triggered
+        report = lazy.format_lazy_report()
+        assert 'fake_lazy_package.sub' in report
+        assert 'imported on .sub in' in report
+        assert 'fake_lazy_package.missing' in report
+
+
+def test_core_submodules_are_lazy():
+    code = '\n'.join([
+        'import sys',
+        'import pygems.core',
+        'assert "timer" in dir(pygems.core)',
+        'assert "pygems.core.timer" not in sys.modules, "imported eagerly"',
+        'assert "typing" not in sys.modules, "typing imported eagerly"',
+        'timer = pygems.core.timer',
+        'assert timer is sys.modules["pygems.core.timer"]',
+    ])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
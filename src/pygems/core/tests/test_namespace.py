@@ -0,0 +1,229 @@
+import pickle
+import sys
+
+import pytest
+from pygems.core import namespace
+from pygems.core.namespace import Namespace, NamespaceTable
+
+BACKENDS = ['array', pytest.param('numpy', marks=pytest.mark.skipif(namespace.numpy is None,
+                                                                     reason='NumPy is not installed'))]
+
+RECORDS = [
+    {'city': 'Sofia', 'year': 2020, 'sales': 10.0, 'online': True},
+    {'city': 'Varna', 'year': 2021, 'sales': 2.5, 'online': False},
+    {'city': 'Sofia', 'year': 2021, 'sales': 4.0, 'online': True},
+    {'city': 'Burgas', 'year': 2020, 'sales': 1.0, 'online': True},
+]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def table(backend):
+    return NamespaceTable(RECORDS, backend=backend)
+
+
+class TestNamespaceTable:
+    def test_infers_column_kinds(self, table):
+        assert table.kinds == {'city': 'object', 'year': 'int', 'sales': 'float', 'online': 'bool'}
+        assert len(table) == 4
+
+    def test_keeps_values_which_do_not_fit_typed_columns(self, backend):
+        table = NamespaceTable([{'value': 1}, {'value': 1.5}, {'value': 2 ** 70}], backend=backend)
+        assert table.kinds == {'value': 'object'}
+        assert [row.value for row in table] == [1, 1.5, 2 ** 70]
+
+    def test_rows_act_like_namespaces(self, table):
+        row = table[-1]
+        assert row.city == 'Burgas'
+        assert type(row.year) is int
+        assert type(row.online) is bool
+        assert row.asdict(sorted_keys=True) == dict(sorted(RECORDS[-1].items()))
+        assert repr(table[0]) == "NamespaceRow(city='Sofia', year=2020, sales=10.0, online=True)"
+        with pytest.raises(AttributeError):
+            row.missing
+        with pytest.raises(IndexError):
+            table[4]
+
+    def test_accepts_namespaces(self, backend):
+        table = NamespaceTable([Namespace(record) for record in RECORDS], backend=backend)
+        assert table.columns == ('city', 'year', 'sales', 'online')
+
+    def test_round_trip(self, table):
+        assert [ns.asdict() for ns in table.to_namespaces()] == RECORDS
+        assert all(type(ns.online) is bool for ns in table.to_namespaces())
+
+    def test_requires_same_keys(self, backend):
+        with pytest.raises(ValueError, match="Record 1 has no key 'b'"):
+            NamespaceTable([{'a': 1, 'b': 2}, {'a': 3}], backend=backend)
+
+    def test_selected_columns(self, backend):
+        table = NamespaceTable(RECORDS, columns=['year', 'city'], backend=backend)
+        assert table[0].asdict() == {'year': 2020, 'city': 'Sofia'}
+
+    def test_empty(self, backend):
+        table = NamespaceTable([], backend=backend)
+        assert len(table) == 0
+        assert table.to_namespaces() == []
+
+    def test_filter(self, table):
+        filtered = table.filter([False, True, True, False])
+        assert [row.city for row in filtered] == ['Varna', 'Sofia']
+        assert filtered.kinds == table.kinds
+        with pytest.raises(ValueError, match='Mask has 1 items, table has 4 rows'):
+            table.filter([True])
+
+    @pytest.mark.parametrize('key, op, value, expected', [
+        ('city', '==', 'Sofia', [0, 2]),
+        ('city', '!=', 'Sofia', [1, 3]),
+        ('year', '<', 2021, [0, 3]),
+        ('sales', '>=', 4.0, [0, 2]),
+        ('online', '==', False, [1]),
+    ])
+    def test_where(self, table, key, op, value, expected):
+        assert [row.asdict() for row in table.where(key, op, value)] == [RECORDS[index] for index in expected]
+
+    def test_where_rejects_unknown_operator(self, table):
+        with pytest.raises(ValueError, match="Unknown comparison operator 'in'"):
+            table.where('city', 'in', 'Sofia')
+
+    def test_select(self, table):
+        selected = table.select('sales', 'city')
+        assert selected.columns == ('sales', 'city')
+        assert selected.column('sales') is table.column('sales')
+        with pytest.raises(KeyError):
+            table.select('missing')
+
+    def test_groupby_sum(self, table):
+        totals = table.groupby_sum('city', 'sales', 'year', 'online')
+        assert [row.asdict() for row in totals] == [
+            {'city': 'Burgas', 'sales': 1.0, 'year': 2020, 'online': 1},
+            {'city': 'Sofia', 'sales': 14.0, 'year': 4041, 'online': 2},
+            {'city': 'Varna', 'sales': 2.5, 'year': 2021, 'online': 0},
+        ]
+        assert totals.kinds == {'city': 'object', 'sales': 'float', 'year': 'int', 'online': 'int'}
+
+    def test_groupby_sum_by_bool(self, table):
+        totals = table.groupby_sum('online', 'sales')
+        assert [row.asdict() for row in totals] == [{'online': False, 'sales': 2.5}, {'online': True, 'sales': 15.0}]
+
+    def test_groupby_sum_with_none_keys(self, backend):
+        table = NamespaceTable([{'city': None, 'n': 1}, {'city': 'Sofia', 'n': 2}, {'city': None, 'n': 3}],
+                               backend=backend)
+        totals = table.groupby_sum('city', 'n')
+        assert [row.asdict() for row in totals] == [{'city': 'Sofia', 'n': 2}, {'city': None, 'n': 4}]
+
+    def test_groupby_sum_with_incomparable_keys(self, backend):
+        table = NamespaceTable([{'key': 'a', 'n': 1}, {'key': 1, 'n': 2}, {'key': 'a', 'n': 3}], backend=backend)
+        assert [row.asdict() for row in table.groupby_sum('key', 'n')] == [{'key': 'a', 'n': 4}, {'key': 1, 'n': 2}]
+
+    def test_groupby_sum_does_not_overflow(self, backend):
+        big = 2 ** 62
+        table = NamespaceTable([{'key': 1, 'n': big}, {'key': 1, 'n': big}, {'key': 2, 'n': -big}], backend=backend)
+        totals = table.groupby_sum('key', 'n')
+        assert [row.asdict() for row in totals] == [{'key': 1, 'n': 2 ** 63}, {'key': 2, 'n': -big}]
+        assert totals.kinds['n'] == 'object'
+
+
+def test_rejects_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown table backend 'arrow'"):
+        NamespaceTable([], backend='arrow')
+
+
+class TestShapedNamespace:
+    def test_shares_interned_keys(self):
+        key = ''.join(['na', 'me'])
+        first = namespace.ShapedNamespace({key: 'John', 'age': 32})
+        second = namespace.ShapedNamespace(name='Jane', age=23)
+        assert namespace.shape_of(first) is namespace.shape_of(second)
+        assert namespace.shape_of(first).keys[0] is sys.intern('name')
+
+    def test_shares_shape_whatever_the_key_order(self):
+        first = namespace.ShapedNamespace({'a': 1, 'b': 2})
+        second = namespace.ShapedNamespace({'b': 3, 'a': 4})
+        assert namespace.shape_of(first) is namespace.shape_of(second)
+        assert (second.a, second.b) == (4, 3)
+        assert second.asdict() == {'a': 4, 'b': 3}
+
+    def test_transitions(self):
+        record = namespace.ShapedNamespace(name='John')
+        record.age = 32
+        assert namespace.shape_of(record) is namespace.shape_for(['name', 'age'])
+        record.age = 33
+        assert record.asdict() == {'name': 'John', 'age': 33}
+        del record.name
+        assert namespace.shape_of(record) is namespace.shape_for(['age'])
+        assert record.asdict() == {'age': 33}
+        with pytest.raises(AttributeError):
+            del record.name
+        with pytest.raises(AttributeError, match="has no attribute 'name'"):
+            record.name
+
+    def test_transition_to_shape_with_other_key_order(self):
+        namespace.ShapedNamespace({'y': 1, 'x': 2})
+        record = namespace.ShapedNamespace(x=3)
+        record.y = 4
+        assert namespace.shape_of(record).keys == ('y', 'x')
+        assert (record.x, record.y) == (3, 4)
+
+    def test_fields_hide_methods(self):
+        data = {'shape': 'circle', 'update': 5, 'asdict': True}
+        shaped, plain = namespace.ShapedNamespace(data), Namespace(data)
+        assert (shaped.shape, shaped.update, shaped.asdict) == (plain.shape, plain.update, plain.asdict)
+        assert namespace.ShapedNamespace.asdict(shaped) == data
+        assert namespace.shape_of(shaped).keys == ('shape', 'update', 'asdict')
+        assert pickle.loads(pickle.dumps(shaped)).shape == 'circle'
+
+    def test_non_string_keys(self):
+        record = namespace.ShapedNamespace({1: 'one'})
+        record.update({2: 'two'})
+        assert record.asdict() == {1: 'one', 2: 'two'}
+
+    def test_registry_is_deterministic(self):
+        count = namespace.shape_count()
+        for index in range(100):
+            namespace.ShapedNamespace({'id': index, 'value': index})
+        namespace.shape_for(['id', 'value'])
+        assert namespace.shape_count() <= count + 2
+
+    def test_registry_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(namespace, 'MAX_SHAPES', 10)
+        for index in range(100):
+            namespace.ShapedNamespace({f'key{index}': index})
+        assert namespace.shape_count() <= 10
+        record = namespace.ShapedNamespace(key0=0)
+        assert namespace.shape_of(record) is namespace.shape_for(['key0'])
+
+    def test_api_matches_namespace(self):
+        data = {'name': 'John', 'city': 'Sofia'}
+        shaped, plain = namespace.ShapedNamespace(data, age=32), Namespace(data, age=32)
+        assert shaped.asdict(sorted_keys=True) == plain.asdict(sorted_keys=True)
+        shaped.update({'age': 33}, zip='1000')
+        assert shaped.asdict() == {'name': 'John', 'city': 'Sofia', 'age': 33, 'zip': '1000'}
+        assert repr(namespace.ShapedNamespace(a=1)) == 'ShapedNamespace(a=1)'
+
+    def test_pickle(self):
+        record = pickle.loads(pickle.dumps(namespace.ShapedNamespace(name='John', age=32)))
+        assert record.asdict() == {'name': 'John', 'age': 32}
+        assert namespace.shape_of(record) is namespace.shape_for(['name', 'age'])
+
+
+class TestMemoryUsage:
+    def test_counts_shared_objects_once(self):
+        rows = [{'name': f'user{index}', 'age': index} for index in range(200)]
+        plain = namespace.memory_usage([Namespace(row) for row in rows])
+        shaped = namespace.memory_usage(namespace.ShapedNamespace(row) for row in rows)
+        assert plain.records == shaped.records == 200
+        assert 0 < shaped.bytes_per_record < plain.bytes_per_record
+
+    def test_values_are_counted_on_request(self):
+        records = [namespace.ShapedNamespace(name='x' * 1000)]
+        without_values = namespace.memory_usage(records)
+        with_values = namespace.memory_usage(records, include_values=True)
+        assert with_values.total_bytes - without_values.total_bytes >= 1000
+
+    def test_empty(self):
+        assert namespace.memory_usage([]).bytes_per_record == 0.0
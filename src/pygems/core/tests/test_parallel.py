@@ -0,0 +1,58 @@
+import pytest
+from unittest import mock
+from pygems.core import parallel
+from pygems.core.timer import Timer
+
+
+def square(x):
+    return x * x
+
+
+class TestParallelMap:
+    @pytest.mark.parametrize('backend', ['thread', 'process'])
+    def test_returns_results_in_order(self, backend):
+        result = parallel.parallel_map(square, range(100), backend=backend, max_workers=2)
+        assert list(result) == [x * x for x in range(100)]
+
+    def test_returns_results_as_completed(self):
+        result = parallel.parallel_map(square, range(100), ordered=False, chunksize=7, max_workers=3)
+        assert sorted(result) == [x * x for x in range(100)]
+
+    def test_consumes_generators(self):
+        result = parallel.parallel_map(square, (x for x in range(10)), backend='process', max_workers=2)
+        assert list(result) == [x * x for x in range(10)]
+
+    def test_reports_chunk_timers(self):
+        stop_func = mock.Mock()
+        list(parallel.parallel_map(square, range(10), chunksize=4, stop_func=stop_func))
+        timers = [call.args[0] for call in stop_func.call_args_list]
+        assert [call.args[1:] for call in stop_func.call_args_list] == [('4 items',), ('4 items',), ('2 items',)]
+        assert [timer.name for timer in timers] == ['chunk-0', 'chunk-1', 'chunk-2']
+        assert all(isinstance(timer, Timer) and timer.stopped_at is not None for timer in timers)
+
+    def test_bounds_inflight_chunks(self):
+        submitted = []
+        consumed = []
+
+        def items():
+            for index in range(20):
+                submitted.append(index)
+                yield index
+
+        for value in parallel.parallel_map(square, items(), chunksize=1, max_inflight=3):
+            consumed.append(value)
+            assert len(submitted) - len(consumed) <= 3
+
+    def test_uses_given_executor(self):
+        executor = mock.Mock(wraps=parallel.concurrent.futures.ThreadPoolExecutor(2))
+        assert list(parallel.parallel_map(square, [1, 2], executor=executor)) == [1, 4]
+        executor.submit.assert_called()
+        executor.shutdown.assert_not_called()
+
+    def test_propagates_errors(self):
+        with pytest.raises(ZeroDivisionError):
+            list(parallel.parallel_map(lambda x: 1 / x, [1, 0]))
+
+    def test_raises_value_error_for_unknown_backend(self):
+        with pytest.raises(ValueError):
+            parallel.parallel_map(square, [], backend='gpu')
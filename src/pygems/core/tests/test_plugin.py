@@ -0,0 +1,150 @@
+import concurrent.futures
+import threading
+
+import pytest
+from pygems.core.plugin import ListenerStats, PluginCollection
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def listener(clock, seconds, name):
+    def listener(*args, **kwargs):
+        clock.now += seconds
+    listener.__qualname__ = name
+    return listener
+
+
+class TestListenerStats:
+    def test_rolling_window(self):
+        stats = ListenerStats('load', window=2, bounds=(0.01,))
+        for elapsed in [0.001, 0.1, 0.2]:
+            stats.add(elapsed)
+        snapshot = stats.snapshot()
+        assert snapshot.calls == 3
+        assert snapshot.max == 0.2
+        assert snapshot.mean == pytest.approx(0.15)
+        assert snapshot.histogram == ((0.01, 0), (float('inf'), 2))
+
+    def test_not_slow_without_budget(self):
+        stats = ListenerStats('load')
+        stats.add(100.0)
+        assert not stats.slow
+        assert stats.snapshot().over_budget == 0
+
+    def test_reset(self):
+        stats = ListenerStats('load', budget=0.1)
+        stats.add(1.0)
+        stats.reset()
+        snapshot = stats.snapshot()
+        assert (snapshot.calls, snapshot.over_budget, snapshot.max, snapshot.slow) == (0, 0, 0.0, False)
+        assert sum(count for bound, count in snapshot.histogram) == 0
+
+
+class TestInstrumentation:
+    def test_notify_is_not_replaced_by_default(self):
+        plugins = PluginCollection()
+        assert 'notify' not in vars(plugins)
+        assert plugins.listener_stats() == []
+
+    def test_measures_each_listener(self):
+        clock = Clock()
+        plugins = PluginCollection().append(listener(clock, 0.001, 'fast'), listener(clock, 0.05, 'slow'))
+        plugins.instrument(budget=0.01, time_func=clock)
+        for _ in range(3):
+            plugins.notify('load')
+        fast, slow = plugins.listener_stats()
+        assert (fast.name, fast.calls, fast.slow, fast.over_budget) == ('fast', 3, False, 0)
+        assert (slow.name, slow.calls, slow.slow, slow.over_budget) == ('slow', 3, True, 3)
+        assert slow.p99 == pytest.approx(0.05)
+        assert not slow.quarantined
+
+    def test_measures_unhashable_listeners(self):
+        class Listener:
+            def __init__(self):
+                self.calls = 0
+
+            def __eq__(self, other):
+                return self is other
+
+            def __call__(self, *args):
+                self.calls += 1
+
+        first, second = Listener(), Listener()
+        plugins = PluginCollection().append(first, second).instrument()
+        plugins.notify('load')
+        assert [stats.calls for stats in plugins.listener_stats()] == [1, 1]
+        assert (first.calls, second.calls) == (1, 1)
+
+    def test_counts_errors_and_raises(self):
+        def fail(*args):
+            raise ValueError('failed')
+        plugins = PluginCollection().append(fail).instrument()
+        with pytest.raises(ValueError):
+            plugins.notify('load')
+        assert plugins.listener_stats()[0].errors == 1
+
+    def test_quarantines_slow_listeners(self):
+        clock = Clock()
+        calls = []
+        main_thread = threading.current_thread()
+
+        def slow(*args):
+            calls.append(threading.current_thread() is main_thread)
+            clock.now += 1.0
+
+        plugins = PluginCollection().append(slow).instrument(budget=0.5, quarantine=True, min_calls=2,
+                                                            time_func=clock)
+        for _ in range(4):
+            plugins.notify('load')
+        plugins.uninstrument()
+        assert calls == [True, True, False, False]
+
+    def test_quarantined_errors_are_counted(self):
+        executor = concurrent.futures.ThreadPoolExecutor(1)
+        clock = Clock()
+        main_thread = threading.current_thread()
+
+        def slow_failing(*args):
+            clock.now += 1.0
+            if threading.current_thread() is not main_thread:
+                raise ValueError('failed')
+
+        plugins = PluginCollection().append(slow_failing)
+        plugins.instrument(budget=0.5, quarantine=True, min_calls=1, executor=executor, time_func=clock)
+        plugins.notify('load').notify('load')
+        executor.shutdown(wait=True)
+        snapshot, = plugins.listener_stats()
+        assert snapshot.quarantined
+        assert snapshot.errors == 1
+
+    def test_reset_releases_quarantined_listeners(self):
+        clock = Clock()
+        plugins = PluginCollection().append(listener(clock, 1.0, 'slow'))
+        plugins.instrument(budget=0.5, quarantine=True, min_calls=1, time_func=clock).notify('load')
+        assert plugins.listener_stats()[0].quarantined
+        plugins.reset_stats(release=True)
+        assert plugins.listener_stats()[0].calls == 0
+        assert not plugins.listener_stats()[0].quarantined
+        plugins.uninstrument()
+
+    def test_uninstrument_restores_notify(self):
+        plugins = PluginCollection().append(print).instrument().uninstrument()
+        assert 'notify' not in vars(plugins)
+        assert plugins.listener_stats() == []
+
+    def test_remove_forgets_listener_stats(self):
+        clock = Clock()
+        slow = listener(clock, 1.0, 'slow')
+        plugins = PluginCollection().append(slow).instrument(budget=0.5, time_func=clock)
+        plugins.notify('load')
+        plugins.remove(slow)
+        assert plugins._instrumentation.stats == {}
+        plugins.append(slow)
+        assert plugins.listener_stats()[0].calls == 0
+        plugins.uninstrument()
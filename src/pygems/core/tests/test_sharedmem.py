@@ -0,0 +1,97 @@
+import array
+import concurrent.futures
+import pytest
+import threading
+from multiprocessing import shared_memory
+from unittest import mock
+from pygems.core.plugin import PluginCollection
+from pygems.core.sharedmem import SharedMemoryDispatcher, SharedBuffer, _Segment
+
+
+def describe(event, payload, **kwargs):
+    extra = kwargs.get('extra')
+    return (event, type(payload).__name__, bytes(payload[:3]) if isinstance(payload, memoryview) else payload,
+            None if extra is None else (extra.format, extra.shape, extra.tolist()[:2]))
+
+
+def checksum(event, payload, **kwargs):
+    return sum(payload)
+
+
+def fail(*args, **kwargs):
+    raise ValueError('listener failed')
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        yield executor
+
+
+def results(futures):
+    return [future.result() for future in futures]
+
+
+class TestSharedMemoryDispatcher:
+    def test_passes_large_buffers_as_memoryviews(self, executor):
+        dispatcher = SharedMemoryDispatcher(PluginCollection().append(describe, checksum), executor,
+                                            min_shared_size=10)
+        payload = bytes(range(100))
+        assert results(dispatcher.notify('frame', payload)) == [
+            ('frame', 'memoryview', bytes([0, 1, 2]), None),
+            sum(payload),
+        ]
+
+    def test_passes_small_arguments_by_pickling(self, executor):
+        dispatcher = SharedMemoryDispatcher(PluginCollection().append(describe), executor)
+        assert results(dispatcher.notify('frame', b'abc')) == [('frame', 'bytes', b'abc', None)]
+
+    def test_preserves_format_and_shape(self, executor):
+        dispatcher = SharedMemoryDispatcher(PluginCollection().append(describe), executor, min_shared_size=10)
+        extra = array.array('d', [1.5, 2.5, 3.5])
+        assert results(dispatcher.notify('frame', 'text', extra=extra)) == [
+            ('frame', 'str', 'text', ('d', (3,), [1.5, 2.5]))]
+
+    def test_unlinks_segments_when_listeners_finish(self, executor):
+        created = []
+        unlinked = threading.Event()
+        original = shared_memory.SharedMemory
+        original_release = _Segment.release
+
+        def track(*args, **kwargs):
+            memory = original(*args, **kwargs)
+            created.append(memory.name)
+            return memory
+
+        # wait() may return before the done callbacks releasing the segment run
+        def release(segment, *args):
+            original_release(segment, *args)
+            if not segment.references:
+                unlinked.set()
+
+        dispatcher = SharedMemoryDispatcher(PluginCollection().append(checksum, fail), executor, min_shared_size=10)
+        with mock.patch.object(shared_memory, 'SharedMemory', side_effect=track), \
+                mock.patch.object(_Segment, 'release', release):
+            futures = dispatcher.notify('frame', bytes(100))
+            concurrent.futures.wait(futures)
+            assert unlinked.wait(5)
+        with pytest.raises(ValueError):
+            futures[1].result()
+        assert len(created) == 1
+        with pytest.raises(FileNotFoundError):
+            original(name=created[0])
+
+    def test_without_listeners_releases_segments(self, executor):
+        dispatcher = SharedMemoryDispatcher(PluginCollection(), executor, min_shared_size=10)
+        assert dispatcher.notify('frame', bytes(100)) == []
+
+    def test_owns_executor(self):
+        with SharedMemoryDispatcher(PluginCollection().append(checksum), max_workers=1, min_shared_size=10) as dispatcher:
+            assert results(dispatcher.notify('frame', bytearray(b'\x01' * 20))) == [20]
+
+
+class TestSharedBuffer:
+    def test_pickles(self):
+        import pickle
+        buffer = pickle.loads(pickle.dumps(SharedBuffer('name', 10, 'B', (10,))))
+        assert (buffer.name, buffer.nbytes, buffer.format, buffer.shape) == ('name', 10, 'B', (10,))
@@ -29,6 +29,49 @@ class TestDropFields:
         shortcuts.drop_fields(data, 'age', fake_handler)
         fake_handler.assert_called_once()
 
+class TestDropFieldsBulk:
+    def test_returns_generator(self):
+        result = shortcuts.drop_fields_bulk([], 'age')
+        assert iter(result) is result
+
+    def test_inplace_modifies_records(self):
+        data = [{ 'name': 'John', 'age': 32 }]
+        result = list(shortcuts.drop_fields_bulk(data, 'age'))
+        assert result[0] is data[0]
+        assert data == [{ 'name': 'John' }]
+
+    @pytest.mark.parametrize('mode', ['copy', 'project'])
+    def test_copy_modes_keep_records(self, mode):
+        data = [{ 'name': 'John', 'age': 32, 'sex': 'male' }, { 'name': 'Jane', 'age': 23 }]
+        result = list(shortcuts.drop_fields_bulk(data, ('age', 'sex'), error_handler=mock.Mock(), mode=mode))
+        assert result == [{ 'name': 'John' }, { 'name': 'Jane' }]
+        assert data[0] == { 'name': 'John', 'age': 32, 'sex': 'male' }
+
+    @pytest.mark.parametrize('mode', ['inplace', 'copy', 'project'])
+    def test_raises_key_error_missing_field(self, mode):
+        data = [{ 'name': 'John' }]
+        with pytest.raises(KeyError):
+            list(shortcuts.drop_fields_bulk(data, 'age', mode=mode))
+
+    @pytest.mark.parametrize('mode', ['inplace', 'copy', 'project'])
+    def test_calls_error_handler_for_each_miss(self, mode):
+        data = [{ 'name': 'John' }, { 'name': 'Jane', 'age': 23 }, { 'name': 'Joe' }]
+        fake_handler = mock.Mock()
+        list(shortcuts.drop_fields_bulk(data, 'age', fake_handler, mode=mode))
+        assert fake_handler.call_count == 2
+
+    @pytest.mark.parametrize('mode', ['inplace', 'copy', 'project'])
+    def test_duplicate_fields_are_dropped_once(self, mode):
+        data = [{ 'name': 'John', 'age': 32 }, { 'name': 'Jane' }]
+        fake_handler = mock.Mock()
+        result = list(shortcuts.drop_fields_bulk(data, ('age', 'age'), fake_handler, mode=mode))
+        assert result == [{ 'name': 'John' }, { 'name': 'Jane' }]
+        assert fake_handler.call_count == 1
+
+    def test_raises_value_error_for_unknown_mode(self):
+        with pytest.raises(ValueError):
+            shortcuts.drop_fields_bulk([], 'age', mode='unknown')
+
 class TestGetIgnoreErrors:
     def test_returns_callable(self):
         handler = shortcuts.get_ignore_errors(KeyError)
@@ -39,6 +82,68 @@ class TestGetIgnoreErrors:
         with pytest.raises(KeyError):
             handler(KeyError())
 
+    def test_accepts_list_of_errors(self):
+        handler = shortcuts.get_ignore_errors([KeyError, ArithmeticError])
+        handler(ZeroDivisionError())
+
+    def test_raises_type_error_for_non_exception_class(self):
+        with pytest.raises(TypeError):
+            shortcuts.get_ignore_errors(['KeyError'])
+
+class TestErrorPolicy:
+    def test_normalizes_errors_to_tuple(self):
+        policy = shortcuts.ErrorPolicy([KeyError, IndexError])
+        assert policy.errors == (KeyError, IndexError)
+
+    def test_raises_type_error_for_non_exception_class(self):
+        with pytest.raises(TypeError):
+            shortcuts.ErrorPolicy(str)
+
+    def test_raises_value_error_for_unknown_action(self):
+        with pytest.raises(ValueError):
+            shortcuts.ErrorPolicy(KeyError, 'log')
+
+    def test_count_counts_errors(self):
+        policy = shortcuts.ErrorPolicy(KeyError, 'count')
+        policy(KeyError('a'))
+        policy.record(KeyError, 'b', count=3)
+        assert policy.counts == {KeyError: 4}
+        assert policy.errors_seen == []
+
+    def test_ignore_does_not_count(self):
+        policy = shortcuts.ErrorPolicy(KeyError, 'ignore')
+        policy(KeyError('a'))
+        policy.record(KeyError, 'b')
+        assert policy.total == 0
+
+    def test_collect_keeps_errors(self):
+        policy = shortcuts.ErrorPolicy(KeyError, 'collect')
+        policy.record(KeyError, 'a', count=2)
+        assert [error.args for error in policy.errors_seen] == [('a',), ('a',)]
+        assert policy.total == 2
+
+    def test_raise_raises_handled_errors(self):
+        policy = shortcuts.ErrorPolicy(KeyError, 'raise')
+        with pytest.raises(KeyError):
+            policy.record(KeyError, 'a')
+
+    def test_raises_unhandled_errors(self):
+        policy = shortcuts.ErrorPolicy(KeyError)
+        with pytest.raises(IndexError):
+            policy.record(IndexError, 0)
+
+    def test_drop_fields_reports_missing_keys(self):
+        policy = shortcuts.ErrorPolicy(KeyError)
+        result = shortcuts.drop_fields({ 'name': 'John', 'age': 32 }, ('age', 'sex', 'city'), policy)
+        assert result == { 'name': 'John' }
+        assert policy.summary() == '2 KeyError'
+
+    def test_reset_clears_counters(self):
+        policy = shortcuts.ErrorPolicy(KeyError, 'collect')
+        policy(KeyError('a'))
+        policy.reset()
+        assert (policy.total, policy.errors_seen) == (0, [])
+
 
 class TestGetattrNested:
 
@@ -58,3 +163,29 @@ class TestGetattrNested:
         with pytest.raises(AttributeError):
             shortcuts.getattr_nested(user, 'address.city')
 
+    def test_returns_none_default_when_attribute_is_missing(self):
+        user = 'john'
+        actual = shortcuts.getattr_nested(user, 'address.city', None)
+        assert actual is None
+
+    def test_returns_default_when_intermediate_attribute_is_none(self):
+        user = mock.Mock(address=None)
+        actual = shortcuts.getattr_nested(user, 'address.city', 'Mexico')
+        assert 'Mexico' == actual
+
+    def test_returns_attribute_when_default_is_specified(self):
+        user = mock.MagicMock()
+        user.address.city = 'Sofia'
+        actual = shortcuts.getattr_nested(user, 'address.city', None)
+        assert 'Sofia' == actual
+
+
+class TestHasattrNested:
+
+    def test_returns_true_when_attribute_exists(self):
+        user = mock.MagicMock()
+        user.address.city = 'Sofia'
+        assert shortcuts.hasattr_nested(user, 'address.city')
+
+    def test_returns_false_when_attribute_is_missing(self):
+        assert not shortcuts.hasattr_nested('john', 'address.city')
@@ -1,7 +1,12 @@
 from unittest import mock
 from functools import partial
+import io
+import os
+import pstats
 import pytest
+import signal
 import timeit
+import tracemalloc
 from pygems.core import timer
 
 @pytest.fixture(scope='function')
@@ -125,3 +130,130 @@ class TestTimerDecorator:
         some_func()
         assert isinstance(m.timer, timer.Timer)
         assert m.timer.stopped_at == 9.5   # time_func is called 3 times by constructor, __call__ and stop()
+
+
+class TestHotPathProfiler:
+
+    @pytest.fixture
+    def profiler(self):
+        return timer.HotPathProfiler()
+
+    def test_without_profile_function_is_not_profiled(self, profiler):
+        @timer.Timer()
+        def work():
+            pass
+        work()
+        assert profiler.stats == {}
+        assert timer.profiler.stats.get(timer.profile_key(work)) is None
+
+    def test_profile_true_uses_module_profiler(self):
+        @timer.Timer(profile=True)
+        def work():
+            pass
+        work()
+        assert timer.profiler.stats[timer.profile_key(work)].calls == 1
+
+    def test_profiled_function_is_timed(self, profiler, stop_func):
+        @timer.Timer(stop_func=stop_func, profile=profiler)
+        def work(x):
+            return x
+        assert work(5) == 5
+        stop_func.assert_called_once()
+
+    def test_collects_self_and_cumulative_time(self, profiler):
+        @timer.Timer(profile=profiler)
+        def inner():
+            sum(range(10000))
+
+        @timer.Timer(profile=profiler)
+        def outer():
+            inner()
+            inner()
+
+        outer()
+        inner_stats = profiler.stats[timer.profile_key(inner)]
+        outer_stats = profiler.stats[timer.profile_key(outer)]
+        assert (inner_stats.calls, outer_stats.calls) == (2, 1)
+        assert outer_stats.cumulative_time >= inner_stats.cumulative_time
+        assert outer_stats.self_time == pytest.approx(outer_stats.cumulative_time - inner_stats.cumulative_time)
+        assert inner_stats.callers[timer.profile_key(outer)][:2] == [2, 2]
+
+    def test_counts_recursive_calls(self, profiler):
+        @timer.Timer(profile=profiler)
+        def countdown(n):
+            if n:
+                countdown(n - 1)
+
+        countdown(3)
+        stats = profiler.stats[timer.profile_key(countdown)]
+        assert (stats.calls, stats.primitive_calls) == (4, 1)
+
+    def test_collects_memory_statistics(self, profiler):
+        @timer.Timer(profile=profiler)
+        def allocate():
+            data = [object() for _ in range(1000)]
+            return len(data)
+
+        profiler.start_tracing()
+        try:
+            allocate()
+        finally:
+            tracemalloc.stop()
+        stats = profiler.stats[timer.profile_key(allocate)]
+        assert stats.peak_memory > 1000 * 16
+
+    def test_dumps_pstats_file(self, profiler, tmp_path):
+        @timer.Timer(profile=profiler)
+        def work():
+            pass
+        work()
+        path = str(tmp_path / 'work.prof')
+        profiler.dump_stats(path)
+        stats = pstats.Stats(path)
+        assert stats.stats[timer.profile_key(work)][:2] == (1, 1)
+
+    def test_report_lists_functions(self, profiler):
+        @timer.Timer(profile=profiler)
+        def work():
+            pass
+        work()
+        work()
+        report = profiler.report(sort='calls', limit=1).splitlines()
+        assert len(report) == 2
+        assert report[1].split()[0] == '2'
+        assert 'work' in report[1]
+
+    def test_dumps_report_on_signal(self, profiler):
+        @timer.Timer(profile=profiler)
+        def work():
+            pass
+        work()
+        stream = io.StringIO()
+        previous = profiler.install_signal_handler(signal.SIGUSR1, stream=stream)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert 'work' in stream.getvalue()
+
+    def test_signal_handler_does_not_deadlock_while_updating_statistics(self, profiler, tmp_path):
+        @timer.Timer(profile=profiler)
+        def work():
+            pass
+        work()
+        path = str(tmp_path / 'work.prof')
+        previous = profiler.install_signal_handler(signal.SIGUSR1, path=path)
+        try:
+            with profiler._lock:
+                os.kill(os.getpid(), signal.SIGUSR1)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert pstats.Stats(path).stats[timer.profile_key(work)][:2] == (1, 1)
+
+    def test_reset_discards_statistics(self, profiler):
+        @timer.Timer(profile=profiler)
+        def work():
+            pass
+        work()
+        profiler.reset()
+        assert profiler.stats == {}